@@ -33,7 +33,7 @@ setup(
     url="https://github.com/tobegit3hub/tfmodel",
     install_requires=["coloredlogs", "prettytable", "tensorflow"],
     description="Command-line tool to inspect TensorFlow models",
-    packages=find_packages(),
+    packages=find_packages(exclude=["tests"]),
     zip_safe=False,
     entry_points={
         "console_scripts": [
@@ -4,6 +4,27 @@ set -e
 set -x
 
 tfmodel validate ./examples/model
+tfmodel validate --structural ./examples/model
+tfmodel validate --repository --structural ./examples
 tfmodel inspect ./examples/model
 tfmodel benchmark ./examples/model
 tfmodel tensorboard ./examples/model
+tfmodel profile ./examples/model
+tfmodel estimate ./examples/model
+tfmodel coldstart ./examples/model --batch_sizes 1 10 --repeats 2
+tfmodel optimize ./examples/model --output_version optimized --batch_sizes 1 10
+rm -rf ./examples/model/optimized
+tfmodel quantize ./examples/model --batch_sizes 1 10 --input_type random
+tfmodel serve ./examples/model --port 8500 --duration 30 &
+sleep 10
+tfmodel loadgen ./examples/model --url http://localhost:8500 --requests 100
+wait
+tfmodel soak ./examples/model --duration 30 --window_seconds 5
+python -c "import numpy as np; np.savez('/tmp/tfmodel_inputs.npz', keys=np.arange(1000, dtype=np.int32).reshape(-1, 1), features=np.ones((1000, 9), dtype=np.float32))"
+tfmodel predict ./examples/model /tmp/tfmodel_inputs.npz /tmp/tfmodel_predictions.jsonl --batch_size 100
+tfmodel verify ./examples/model --input_type random --seed 1 --split_sizes 1 7 --intra_op_threads 1 4 --tolerance 1e-5
+tfmodel checkpoint ./examples/model --top_number 10
+tfmodel parallelism ./examples/model
+tfmodel parallelism ./examples/model --cost_source profile --batch_size 10
+tfmodel prefetch ./examples/model --model_versions 1 2 --cache_path /tmp/tfmodel_cache --prefetch_threads 4
+tfmodel validate ./examples/model + benchmark ./examples/model --batch_sizes 1 + profile ./examples/model
@@ -0,0 +1,78 @@
+import os
+import unittest
+import numpy as np
+
+from tfmodel.checkpoint_reader import CheckpointReader
+
+EXAMPLE_CHECKPOINT_PREFIX = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "examples", "model", "1",
+    "variables", "variables")
+
+
+class CheckpointReaderTest(unittest.TestCase):
+
+  def test_decompress_snappy(self):
+    # The literal "abc" and the overlapping copy of 6 bytes at the offset 3
+    buffer = bytearray([9, 0x08]) + bytearray(b"abc") + bytearray([0x09, 0x03])
+
+    self.assertEqual(
+        bytes(CheckpointReader.decompress_snappy(buffer)), b"abcabcabc")
+
+  def test_decompress_snappy_invalid_length(self):
+    buffer = bytearray([4, 0x08]) + bytearray(b"abc")
+
+    with self.assertRaises(ValueError):
+      CheckpointReader.decompress_snappy(buffer)
+
+  def test_decode_slice_key(self):
+    # The OrderedCode of 0, the name, 2 dims and the extents of the slice
+    key = b"\x00dense/kernel\x00\x01\x02\x80\x82\x80\x84"
+
+    self.assertEqual(CheckpointReader.decode_slice_key(key), "dense/kernel")
+
+  def test_decode_escaped_slice_key(self):
+    key = b"\x00a\x00\xffb\x00\x01\x01\x80\x82"
+
+    self.assertEqual(CheckpointReader.decode_slice_key(key), "a\x00b")
+
+  def test_decode_invalid_slice_key(self):
+    with self.assertRaises(ValueError):
+      CheckpointReader.decode_slice_key(b"\x00dense/kernel")
+
+  def test_read_variables(self):
+    checkpoint_reader = CheckpointReader(EXAMPLE_CHECKPOINT_PREFIX)
+
+    self.assertEqual(checkpoint_reader.shard_number, 1)
+    self.assertEqual(len(checkpoint_reader.variable_entry_map), 17)
+
+    entry = checkpoint_reader.variable_entry_map["layer0/weights"]
+    self.assertEqual(entry.shape, [128, 32])
+    self.assertEqual(entry.size, 128 * 32 * 4)
+    self.assertFalse(entry.is_sliced)
+
+  def test_get_variable_stats(self):
+    # Read by small chunks to merge the stats of the chunks
+    checkpoint_reader = CheckpointReader(
+        EXAMPLE_CHECKPOINT_PREFIX, chunk_size=100)
+
+    array = np.asarray(checkpoint_reader.get_variable_array("layer0/weights"))
+    stats = checkpoint_reader.get_variable_stats("layer0/weights")
+
+    self.assertEqual(stats["dtype"], "float32")
+    self.assertEqual(stats["value_number"], 128 * 32)
+    self.assertEqual(stats["min_value"], float(array.min()))
+    self.assertEqual(stats["max_value"], float(array.max()))
+    self.assertEqual(stats["nan_number"], 0)
+
+  def test_analyze(self):
+    variable_stats_list = CheckpointReader(EXAMPLE_CHECKPOINT_PREFIX).analyze(3)
+
+    self.assertEqual(len(variable_stats_list), 17)
+    self.assertEqual(
+        sum(stats["bytes"] for stats in variable_stats_list), 45524)
+    # Sorted by the bytes
+    self.assertEqual(variable_stats_list[0]["bytes"], 16384)
+
+
+if __name__ == "__main__":
+  unittest.main()
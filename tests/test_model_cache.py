@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from tfmodel.model_cache import LocalFileSystem, ModelCache, is_remote_path, join_path
+
+EXAMPLE_MODEL_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "examples", "model")
+
+
+class ModelCacheTest(unittest.TestCase):
+
+  def setUp(self):
+    self.temp_path = tempfile.mkdtemp(prefix="tfmodel_test_")
+    # Fake the remote storage, example: "fake://bucket/model" -> "<temp>/remote/bucket/model"
+    shutil.copytree(EXAMPLE_MODEL_PATH,
+                    os.path.join(self.temp_path, "remote", "bucket", "model"))
+    self.file_system = LocalFileSystem(os.path.join(self.temp_path, "remote"))
+    self.model_cache = ModelCache(
+        os.path.join(self.temp_path, "cache"),
+        thread_number=2,
+        file_system=self.file_system)
+
+    # Count the copied files of the data shards
+    self.copied_uris = []
+    copy_file = self.model_cache.copy_file
+
+    def count_copy_file(uri, local_path, expected_size):
+      self.copied_uris.append(uri)
+      return copy_file(uri, local_path, expected_size)
+
+    self.model_cache.copy_file = count_copy_file
+
+  def tearDown(self):
+    shutil.rmtree(self.temp_path, ignore_errors=True)
+
+  def test_path_helpers(self):
+    self.assertTrue(is_remote_path("gs://bucket/model"))
+    self.assertFalse(is_remote_path("./model"))
+    self.assertEqual(join_path("gs://bucket/model/", "1"), "gs://bucket/model/1")
+
+  def test_list_files(self):
+    file_records = self.model_cache.list_files("fake://bucket/model/1")
+
+    self.assertEqual([record[0] for record in file_records], [
+        "saved_model.pb", "variables/variables.data-00000-of-00001",
+        "variables/variables.index"
+    ])
+    for relative_path, size in file_records:
+      self.assertEqual(
+          size,
+          os.path.getsize(os.path.join(EXAMPLE_MODEL_PATH, "1", relative_path)))
+
+  def test_stage(self):
+    local_path = self.model_cache.stage("fake://bucket/model/1")
+
+    self.assertEqual(os.path.basename(local_path), "1")
+    for relative_path in [
+        "saved_model.pb", "variables/variables.index",
+        "variables/variables.data-00000-of-00001"
+    ]:
+      with open(os.path.join(local_path, relative_path), "rb") as f:
+        with open(os.path.join(EXAMPLE_MODEL_PATH, "1", relative_path),
+                  "rb") as expected_f:
+          self.assertEqual(f.read(), expected_f.read())
+
+    # The fingerprint files are written directly and only the data shard is copied
+    self.assertEqual(self.copied_uris, [
+        "fake://bucket/model/1/variables/variables.data-00000-of-00001"
+    ])
+
+  def test_stage_reuses_cache(self):
+    first_local_path = self.model_cache.stage("fake://bucket/model/1")
+    second_local_path = self.model_cache.stage("fake://bucket/model/1")
+
+    self.assertEqual(first_local_path, second_local_path)
+    self.assertEqual(len(self.copied_uris), 1)
+
+  def test_stage_versions_separately(self):
+    # The versions with the same files are still cached in their own directories
+    first_local_path = self.model_cache.stage("fake://bucket/model/1")
+    second_local_path = self.model_cache.stage("fake://bucket/model/2")
+
+    self.assertNotEqual(
+        os.path.dirname(first_local_path), os.path.dirname(second_local_path))
+    self.assertEqual(os.path.basename(second_local_path), "2")
+
+  def test_stage_empty_version(self):
+    os.makedirs(os.path.join(self.temp_path, "remote", "bucket", "model", "3"))
+
+    with self.assertRaises(IOError):
+      self.model_cache.stage("fake://bucket/model/3")
+
+
+if __name__ == "__main__":
+  unittest.main()
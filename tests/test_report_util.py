@@ -0,0 +1,91 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from tfmodel.report_util import ReportUtil
+
+
+class ReportUtilTest(unittest.TestCase):
+
+  def setUp(self):
+    self.temp_path = tempfile.mkdtemp(prefix="tfmodel_test_")
+
+  def tearDown(self):
+    shutil.rmtree(self.temp_path, ignore_errors=True)
+
+  def write_records(self, filename, records):
+    report_path = os.path.join(self.temp_path, filename)
+    ReportUtil.write_report(
+        ReportUtil.construct_report("benchmark", "./model", records),
+        report_path)
+    return report_path
+
+  def test_incomplete_beta(self):
+    self.assertAlmostEqual(ReportUtil.incomplete_beta(1, 1, 0.3), 0.3)
+    self.assertAlmostEqual(ReportUtil.incomplete_beta(2, 3, 0.4), 0.5248)
+    self.assertEqual(ReportUtil.incomplete_beta(2, 3, 0), 0.0)
+    self.assertEqual(ReportUtil.incomplete_beta(2, 3, 1), 1.0)
+
+  def test_welch_t_test(self):
+    # The standard error is 1 and the t of 1.96 with many freedoms is about p 0.05
+    stddev = (1000 * 0.5)**0.5
+    p_value = ReportUtil.welch_t_test(1.96, stddev, 1001, 0.0, stddev, 1001)
+    self.assertAlmostEqual(p_value, 0.05, places=3)
+
+    self.assertEqual(ReportUtil.welch_t_test(1.0, 0.1, 1, 2.0, 0.1, 10), 1.0)
+    self.assertEqual(ReportUtil.welch_t_test(1.0, 0.0, 10, 2.0, 0.0, 10), 0.0)
+
+  def test_linear_trend(self):
+    slope, intercept, p_value = ReportUtil.linear_trend([1.0, 2.0, 3.0, 4.0])
+    self.assertAlmostEqual(slope, 1.0)
+    self.assertAlmostEqual(intercept, 1.0)
+    self.assertEqual(p_value, 0.0)
+
+    self.assertEqual(ReportUtil.linear_trend([1.0, 2.0])[2], 1.0)
+
+  def test_read_records(self):
+    records = [{"batch_size": 1, "mean_latency": 0.01}]
+
+    for filename in ["report.json", "report.csv"]:
+      read_records = ReportUtil.read_records(
+          self.write_records(filename, records))
+      self.assertEqual(read_records[0]["batch_size"], 1)
+      self.assertEqual(read_records[0]["mean_latency"], 0.01)
+
+  def test_compare_reports(self):
+    baseline_record = {
+        "signature_name": "serving_default",
+        "batch_size": 1,
+        "mean_latency": 0.01,
+        "stddev_latency": 0.001,
+        "iterations": 100,
+        "throughput": 100.0
+    }
+    regressed_record = dict(baseline_record)
+    regressed_record.update({"mean_latency": 0.02, "throughput": 50.0})
+
+    baseline_path = self.write_records("baseline.json", [baseline_record])
+
+    self.assertEqual(
+        ReportUtil.compare_reports(
+            baseline_path,
+            self.write_records("same.json", [baseline_record])), [])
+    self.assertEqual(
+        len(
+            ReportUtil.compare_reports(
+                baseline_path,
+                self.write_records("regressed.json", [regressed_record]))), 1)
+
+  def test_compare_reports_without_stats(self):
+    record = {"signature_name": "serving_default", "batch_size": 1}
+    baseline_path = self.write_records("baseline.json", [record])
+    candidate_path = self.write_records("candidate.json", [record])
+
+    self.assertEqual(ReportUtil.compare_reports(baseline_path, candidate_path),
+                     [])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,135 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from tfmodel.savedmodel_reader import SavedmodelReader
+
+EXAMPLE_MODEL_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "examples", "model")
+
+
+def encode_length_delimited(field_number, buffer):
+  # The field tag and the length fit in one byte for the short test buffers
+  return bytearray([field_number << 3 | 2, len(buffer)]) + bytearray(buffer)
+
+
+class SavedmodelReaderTest(unittest.TestCase):
+
+  def test_read_varint(self):
+    self.assertEqual(SavedmodelReader.read_varint(bytearray([0x01]), 0), (1, 1))
+    self.assertEqual(
+        SavedmodelReader.read_varint(bytearray([0xac, 0x02]), 0), (300, 2))
+
+  def test_iterate_fields(self):
+    # The varint field 1 of 150 and the string field 2 of "ab"
+    buffer = bytearray([0x08, 0x96, 0x01]) + encode_length_delimited(2, b"ab")
+
+    fields = list(SavedmodelReader.iterate_fields(buffer, 0, len(buffer)))
+
+    self.assertEqual(fields[0], (1, 0, 150))
+    self.assertEqual(fields[1][:2], (2, 2))
+    self.assertEqual(SavedmodelReader.decode_string(buffer, fields[1][2]), "ab")
+
+  def test_sort_model_versions(self):
+    self.assertEqual(
+        SavedmodelReader.sort_model_versions(["10", "2", "1"]), ["1", "2", "10"])
+
+  def test_parse_tensor_info(self):
+    buffer = encode_length_delimited(1, b"Placeholder:0") + bytearray(
+        [0x10, 0x01])
+
+    tensor_info = SavedmodelReader.parse_tensor_info(buffer, 0, len(buffer))
+
+    self.assertEqual(tensor_info.name, "Placeholder:0")
+    self.assertEqual(tensor_info.dtype, 1)
+    self.assertEqual(
+        SavedmodelReader.get_tensor_names(tensor_info), ["Placeholder:0"])
+
+  def test_parse_sparse_tensor_info(self):
+    coo_sparse = encode_length_delimited(1, b"values:0") + encode_length_delimited(
+        2, b"indices:0") + encode_length_delimited(3, b"shape:0")
+    buffer = encode_length_delimited(4, coo_sparse)
+
+    tensor_info = SavedmodelReader.parse_tensor_info(buffer, 0, len(buffer))
+
+    self.assertEqual(tensor_info.name, "")
+    self.assertEqual(
+        SavedmodelReader.get_tensor_names(tensor_info),
+        ["values:0", "indices:0", "shape:0"])
+
+  def test_parse_composite_tensor_info(self):
+    composite_tensor = encode_length_delimited(
+        2, encode_length_delimited(1, b"values:0")) + encode_length_delimited(
+            2, encode_length_delimited(1, b"row_splits:0"))
+    buffer = encode_length_delimited(5, composite_tensor)
+
+    tensor_info = SavedmodelReader.parse_tensor_info(buffer, 0, len(buffer))
+
+    self.assertEqual(
+        SavedmodelReader.get_tensor_names(tensor_info),
+        ["values:0", "row_splits:0"])
+
+  def test_read_model(self):
+    savedmodel = SavedmodelReader(EXAMPLE_MODEL_PATH)
+
+    self.assertTrue(savedmodel.model_file_exist)
+    self.assertEqual(savedmodel.model_version_list, ["1", "2"])
+    self.assertEqual(os.path.basename(savedmodel.model_version_path), "2")
+
+    meta_graph = savedmodel.read_meta_graph()
+    signature_def = meta_graph.signature_def["serving_default"]
+    self.assertEqual(signature_def.inputs["features"].name, "Placeholder:0")
+    self.assertEqual(
+        [dim.size for dim in signature_def.inputs["features"].tensor_shape.dim],
+        [-1, 9])
+    self.assertEqual(
+        sorted(signature_def.outputs.keys()), ["keys", "prediction", "softmax"])
+
+  def test_validate_structure(self):
+    savedmodel = SavedmodelReader(EXAMPLE_MODEL_PATH)
+
+    self.assertEqual(savedmodel.validate_structure(), [])
+
+  def test_inspect_model(self):
+    tensor_records = SavedmodelReader(EXAMPLE_MODEL_PATH).inspect_model()
+
+    dtype_map = dict((record["name"], record["dtype"])
+                     for record in tensor_records
+                     if record["tensor_type"] == "input")
+    self.assertEqual(dtype_map, {"features": "DT_FLOAT", "keys": "DT_INT32"})
+
+  def test_missing_model(self):
+    savedmodel = SavedmodelReader(
+        os.path.join(EXAMPLE_MODEL_PATH, "not_exist"))
+
+    self.assertFalse(savedmodel.model_file_exist)
+    self.assertEqual(len(savedmodel.validate_structure()), 1)
+
+  def test_empty_model(self):
+    model_path = tempfile.mkdtemp(prefix="tfmodel_test_")
+    try:
+      savedmodel = SavedmodelReader(model_path)
+    finally:
+      shutil.rmtree(model_path, ignore_errors=True)
+
+    self.assertFalse(savedmodel.model_file_exist)
+    self.assertEqual(savedmodel.model_version_list, [])
+
+  def test_text_format_model(self):
+    model_path = tempfile.mkdtemp(prefix="tfmodel_test_")
+    try:
+      os.makedirs(os.path.join(model_path, "1"))
+      with open(os.path.join(model_path, "1", "saved_model.pbtxt"), "w") as f:
+        f.write("saved_model_schema_version: 1\n")
+
+      savedmodel = SavedmodelReader(model_path)
+      self.assertFalse(savedmodel.is_binary_format())
+      with self.assertRaises(ValueError):
+        savedmodel.read_meta_graph()
+    finally:
+      shutil.rmtree(model_path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,378 @@
+import csv
+import json
+import logging
+import threading
+import numpy as np
+import tensorflow as tf
+
+try:
+  import queue
+except ImportError:
+  import Queue as queue
+
+from tfmodel.benchmark_engine import timer
+from tfmodel.input_source import NumpyInputSource, TfrecordInputSource
+from tfmodel.utils import ModelUtil
+
+
+class CsvBatchReader(object):
+  """
+  The reader to stream the rows of the CSV file with the header by batch.
+
+  The column of the input name has the value, or the values separated by
+  spaces for the input with more than one value in each row. The columns
+  like "features_0" and "features_1" are also supported.
+  """
+
+  def __init__(self, data_path, input_items, batch_size=1):
+    self.data_path = data_path
+    self.input_items = list(input_items)
+    self.batch_size = batch_size
+
+  def get_row_values(self, row, name, value_number):
+    """
+    Get the values of the input in the CSV row, example: ["1.0", "2.0"].
+    """
+
+    if name in row:
+      if value_number == 1:
+        return [row[name]]
+      return row[name].split()
+
+    return [row["{}_{}".format(name, i)] for i in range(value_number)]
+
+  def get_feed_dict(self, rows):
+    feed_dict_map = {}
+
+    for name, tensor_info in self.input_items:
+      shape = ModelUtil.get_shape_with_batch(tensor_info, len(rows))
+      numpy_dtype = ModelUtil.get_numpy_dtype(tensor_info.dtype)
+      value_number = int(np.prod(shape[1:]))
+
+      values = []
+      for row in rows:
+        values.extend(self.get_row_values(row, name, value_number))
+
+      if tensor_info.dtype == int(tf.string):
+        array = np.array([value.encode("utf-8") for value in values],
+                         dtype=object)
+      elif tensor_info.dtype == int(tf.bool):
+        array = np.array([value.lower() in ["true", "1"] for value in values])
+      else:
+        array = np.array(values).astype(numpy_dtype)
+
+      feed_dict_map[tensor_info.name] = array.reshape(shape)
+
+    return feed_dict_map
+
+  def __iter__(self):
+    # Example: ({"Placeholder:0": np.ndarray}, 32)
+    with open(self.data_path) as f:
+      rows = []
+      for row in csv.DictReader(f):
+        rows.append(row)
+        if len(rows) == self.batch_size:
+          yield self.get_feed_dict(rows), len(rows)
+          rows = []
+
+      if rows:
+        yield self.get_feed_dict(rows), len(rows)
+
+
+class NumpyBatchReader(object):
+  """
+  The reader to slice the memory-mapped .npy or .npz file by batch.
+  """
+
+  def __init__(self, data_path, input_items, batch_size=1):
+    self.data_path = data_path
+    self.input_items = list(input_items)
+    self.batch_size = batch_size
+
+    if data_path.endswith(".npz"):
+      self.array_map = NumpyInputSource.load_npz_with_mmap(data_path)
+    else:
+      self.array_map = {None: np.load(data_path, mmap_mode="r")}
+
+    if None in self.array_map and len(self.input_items) > 1:
+      raise ValueError(
+          "The .npy file is for one input but the signature has {}, use the .npz file with the input names as keys: {}".
+          format(len(self.input_items), data_path))
+
+    # The rows of the inputs are paired by index, so no row is dropped silently
+    row_numbers = set(len(array) for array in self.array_map.values())
+    if len(row_numbers) > 1:
+      raise ValueError("The arrays have different row numbers {} in: {}".format(
+          sorted(row_numbers), data_path))
+
+    self.row_number = row_numbers.pop() if row_numbers else 0
+
+  def __iter__(self):
+    for start_row in range(0, self.row_number, self.batch_size):
+      end_row = min(start_row + self.batch_size, self.row_number)
+
+      feed_dict_map = {}
+      for name, tensor_info in self.input_items:
+        array = self.array_map.get(name, self.array_map.get(None))
+        if array is None:
+          raise ValueError("The input {} is not in the data file: {}".format(
+              name, self.data_path))
+
+        # Only the rows of this batch are read from the file
+        feed_dict_map[tensor_info.name] = np.asarray(
+            array[start_row:end_row],
+            dtype=ModelUtil.get_numpy_dtype(tensor_info.dtype))
+
+      yield feed_dict_map, end_row - start_row
+
+
+class TfrecordBatchReader(object):
+  """
+  The reader to stream the tf.Example records of the TFRecord file by batch.
+  """
+
+  def __init__(self, data_path, input_items, batch_size=1,
+               compression_type=None):
+    self.data_path = data_path
+    self.input_items = list(input_items)
+    self.batch_size = batch_size
+    self.options = TfrecordInputSource.get_options(compression_type)
+
+  def __iter__(self):
+    records = []
+
+    for record in tf.python_io.tf_record_iterator(
+        self.data_path, options=self.options):
+      records.append(record)
+      if len(records) == self.batch_size:
+        yield TfrecordInputSource.parse_records(self.input_items,
+                                                records), len(records)
+        records = []
+
+    if records:
+      yield TfrecordInputSource.parse_records(self.input_items,
+                                              records), len(records)
+
+
+class CsvPredictionWriter(object):
+  """
+  The writer to append the output rows to the CSV file, the values of each row are separated by spaces.
+  """
+
+  def __init__(self, predictions_path, output_names):
+    self.output_names = output_names
+    self.file = open(predictions_path, "w")
+    self.writer = csv.writer(self.file)
+    self.writer.writerow(output_names)
+
+  @staticmethod
+  def format_value(value):
+    if isinstance(value, bytes):
+      return value.decode("utf-8", "replace")
+    elif isinstance(value, np.ndarray):
+      return " ".join(
+          CsvPredictionWriter.format_value(item) for item in value.flatten())
+    return str(value)
+
+  def write(self, outputs, row_number):
+    for row in range(row_number):
+      self.writer.writerow(
+          [self.format_value(output[row]) for output in outputs])
+
+  def close(self):
+    self.file.close()
+
+
+class JsonPredictionWriter(object):
+  """
+  The writer to append one JSON object of each row to the JSON Lines file.
+  """
+
+  def __init__(self, predictions_path, output_names):
+    self.output_names = output_names
+    self.file = open(predictions_path, "w")
+
+  @staticmethod
+  def format_value(value):
+    if isinstance(value, bytes):
+      return value.decode("utf-8", "replace")
+    elif isinstance(value, np.ndarray):
+      return [JsonPredictionWriter.format_value(item) for item in value]
+    elif isinstance(value, np.generic):
+      return value.item()
+    return value
+
+  def write(self, outputs, row_number):
+    for row in range(row_number):
+      self.file.write(
+          json.dumps(
+              dict((name, self.format_value(output[row]))
+                   for name, output in zip(self.output_names, outputs))) +
+          "\n")
+
+  def close(self):
+    self.file.close()
+
+
+def create_batch_reader(data_path,
+                        input_items,
+                        batch_size=1,
+                        compression_type=None):
+  """
+  Create the reader with the extension, example: ".csv", ".npy", ".npz" or the TFRecord file.
+  """
+
+  if data_path.endswith(".csv"):
+    return CsvBatchReader(data_path, input_items, batch_size)
+  elif data_path.endswith(".npy") or data_path.endswith(".npz"):
+    return NumpyBatchReader(data_path, input_items, batch_size)
+  else:
+    return TfrecordBatchReader(data_path, input_items, batch_size,
+                               compression_type)
+
+
+def create_prediction_writer(predictions_path, output_names):
+  """
+  Create the writer with the extension, example: ".csv" or ".jsonl".
+  """
+
+  if predictions_path.endswith(".csv"):
+    return CsvPredictionWriter(predictions_path, output_names)
+  else:
+    return JsonPredictionWriter(predictions_path, output_names)
+
+
+class BatchPredictor(object):
+  """
+  The pipeline to read, run and write the batches in three overlapped stages.
+
+  The stages are connected by the bounded queues, so at most queue_size
+  batches are in memory between two stages no matter how large the input is.
+  """
+
+  def __init__(self,
+               session,
+               model_graph_signature,
+               queue_size=4,
+               log_interval=10.0):
+    self.session = session
+    self.queue_size = queue_size
+    self.log_interval = log_interval
+
+    # Example: [("scores", TensorInfo)]
+    self.output_items = sorted(model_graph_signature.outputs.items())
+    self.output_names = [item[0] for item in self.output_items]
+    self.output_tensor_names = [item[1].name for item in self.output_items]
+
+    # The seconds spent in each stage, the slowest one bounds the throughput
+    self.stage_time_map = {"read": 0.0, "run": 0.0, "write": 0.0}
+
+  def run_reader(self, batch_reader, input_queue, stop_event, errors):
+    try:
+      batch_iterator = iter(batch_reader)
+      while not stop_event.is_set():
+        start_time = timer()
+        try:
+          batch = next(batch_iterator)
+        except StopIteration:
+          break
+        self.stage_time_map["read"] += timer() - start_time
+
+        input_queue.put(batch)
+    except Exception as e:
+      errors.append(e)
+    finally:
+      input_queue.put(None)
+
+  def run_writer(self, prediction_writer, output_queue, errors):
+    try:
+      while True:
+        item = output_queue.get()
+        if item is None:
+          return
+
+        start_time = timer()
+        prediction_writer.write(*item)
+        self.stage_time_map["write"] += timer() - start_time
+    except Exception as e:
+      errors.append(e)
+      # Drain the queue so the inference stage is not blocked
+      while output_queue.get() is not None:
+        pass
+
+  def predict(self, batch_reader, prediction_writer):
+    """
+    Run all the batches of the reader and return the stats, example: {"rows": 1000, ...}.
+    """
+
+    self.stage_time_map = {"read": 0.0, "run": 0.0, "write": 0.0}
+
+    input_queue = queue.Queue(self.queue_size)
+    output_queue = queue.Queue(self.queue_size)
+    stop_event = threading.Event()
+    errors = []
+
+    reader_thread = threading.Thread(
+        target=self.run_reader,
+        args=(batch_reader, input_queue, stop_event, errors))
+    writer_thread = threading.Thread(
+        target=self.run_writer, args=(prediction_writer, output_queue, errors))
+    reader_thread.daemon = True
+    writer_thread.daemon = True
+    reader_thread.start()
+    writer_thread.start()
+
+    row_number = 0
+    batch_number = 0
+    start_time = timer()
+    last_log_time = start_time
+
+    try:
+      while True:
+        batch = input_queue.get()
+        if batch is None or errors:
+          break
+        feed_dict_map, batch_row_number = batch
+
+        run_start_time = timer()
+        outputs = self.session.run(
+            self.output_tensor_names, feed_dict=feed_dict_map)
+        self.stage_time_map["run"] += timer() - run_start_time
+
+        output_queue.put((outputs, batch_row_number))
+
+        row_number += batch_row_number
+        batch_number += 1
+
+        if timer() - last_log_time >= self.log_interval:
+          last_log_time = timer()
+          logging.info("Predict {} rows, {} rows/s".format(
+              row_number, round(row_number / (last_log_time - start_time),
+                                2)))
+
+    finally:
+      stop_event.set()
+      # Unblock the reader if it waits for the full queue
+      while reader_thread.is_alive():
+        try:
+          input_queue.get(timeout=0.1)
+        except queue.Empty:
+          pass
+      output_queue.put(None)
+      writer_thread.join()
+      prediction_writer.close()
+
+    if errors:
+      raise errors[0]
+
+    elapsed_time = timer() - start_time
+
+    return {
+        "rows": row_number,
+        "batches": batch_number,
+        "elapsed_time": elapsed_time,
+        "rows_per_second": row_number / max(elapsed_time, 1e-9),
+        "read_time": self.stage_time_map["read"],
+        "run_time": self.stage_time_map["run"],
+        "write_time": self.stage_time_map["write"]
+    }
@@ -0,0 +1,466 @@
+import logging
+import threading
+import time
+import numpy as np
+from prettytable import PrettyTable
+
+from tfmodel.utils import MemoryUtil
+
+try:
+  import queue
+except ImportError:
+  import Queue as queue
+
+# Use the high resolution clock if possible, Python 2 does not have perf_counter
+timer = getattr(time, "perf_counter", time.time)
+
+# The p99 of fewer latencies is only the max, so it is reported as None
+MIN_P99_ITERATIONS = 100
+
+
+class BenchmarkResult(object):
+  """
+  The latency and throughput statistics of one benchmark run.
+  """
+
+  def __init__(self, batch_size, latencies, elapsed_time, warmup_iterations):
+    # Set by the caller who knows the model, example: "1" and "serving_default"
+    self.model_version = None
+    self.signature_name = None
+
+    self.batch_size = batch_size
+    self.warmup_iterations = warmup_iterations
+    self.iterations = len(latencies)
+    self.elapsed_time = elapsed_time
+
+    # Example: [0.0012, 0.0011, 0.0013]
+    self.latencies = np.asarray(latencies, dtype=np.float64)
+
+    self.mean_latency = float(np.mean(self.latencies))
+    self.stddev_latency = float(np.std(self.latencies))
+    self.p50_latency = float(np.percentile(self.latencies, 50))
+    self.p90_latency = float(np.percentile(self.latencies, 90))
+    self.p99_latency = BenchmarkEngine.get_p99(self.latencies)
+    self.max_latency = float(np.max(self.latencies))
+    self.cv = BenchmarkEngine.coefficient_of_variation(self.latencies)
+    self.rse = BenchmarkEngine.relative_standard_error(self.latencies)
+
+    # The p99 to check the latency budget, or the max without enough iterations
+    self.tail_latency = self.p99_latency
+    if self.tail_latency is None:
+      self.tail_latency = self.max_latency
+
+    # The requests per second and the examples per second
+    self.qps = self.iterations / elapsed_time
+    self.throughput = batch_size * self.iterations / elapsed_time
+
+    # The p50 latency of the framework without the model compute, set by the caller
+    self.overhead_latency = None
+    self.compute_latency = None
+
+    # The process memory after the runs and the peak of the TensorFlow allocators
+    self.rss_bytes = None
+    self.peak_rss_bytes = None
+    self.allocator_peak_bytes = None
+
+    # The memory of the model load, example: {"variable_bytes": 72, ...}
+    self.load_memory = {}
+
+  def to_dict(self):
+    result_dict = {
+        "model_version": self.model_version,
+        "signature_name": self.signature_name,
+        "batch_size": self.batch_size,
+        "warmup_iterations": self.warmup_iterations,
+        "iterations": self.iterations,
+        "elapsed_time": self.elapsed_time,
+        "mean_latency": self.mean_latency,
+        "stddev_latency": self.stddev_latency,
+        "p50_latency": self.p50_latency,
+        "p90_latency": self.p90_latency,
+        "p99_latency": self.p99_latency,
+        "max_latency": self.max_latency,
+        "cv": self.cv,
+        "rse": self.rse,
+        "tail_latency": self.tail_latency,
+        "qps": self.qps,
+        "throughput": self.throughput,
+        "overhead_latency": self.overhead_latency,
+        "compute_latency": self.compute_latency,
+        "rss_bytes": self.rss_bytes,
+        "peak_rss_bytes": self.peak_rss_bytes,
+        "allocator_peak_bytes": self.allocator_peak_bytes
+    }
+    result_dict.update(self.load_memory)
+    return result_dict
+
+
+class ConcurrentBenchmarkResult(BenchmarkResult):
+  """
+  The statistics of the concurrent benchmark run with queueing delays.
+  """
+
+  def __init__(self, batch_size, latencies, service_latencies, queueing_delays,
+               elapsed_time, warmup_iterations, concurrency, target_qps,
+               error_number=0):
+    super(ConcurrentBenchmarkResult, self).__init__(
+        batch_size, latencies, elapsed_time, warmup_iterations)
+
+    self.concurrency = concurrency
+    self.target_qps = target_qps
+    # The failed requests are not in the latencies
+    self.error_number = error_number
+
+    # The time in session.run and the time waiting for a free worker
+    self.service_latencies = np.asarray(service_latencies, dtype=np.float64)
+    self.queueing_delays = np.asarray(queueing_delays, dtype=np.float64)
+
+    self.p50_service_latency = float(np.percentile(self.service_latencies, 50))
+    self.p99_service_latency = BenchmarkEngine.get_p99(self.service_latencies)
+    self.p50_queueing_delay = float(np.percentile(self.queueing_delays, 50))
+    self.p99_queueing_delay = BenchmarkEngine.get_p99(self.queueing_delays)
+
+  def to_dict(self):
+    result_dict = super(ConcurrentBenchmarkResult, self).to_dict()
+    result_dict.update({
+        "concurrency": self.concurrency,
+        "target_qps": self.target_qps,
+        "error_number": self.error_number,
+        "p50_service_latency": self.p50_service_latency,
+        "p99_service_latency": self.p99_service_latency,
+        "p50_queueing_delay": self.p50_queueing_delay,
+        "p99_queueing_delay": self.p99_queueing_delay
+    })
+    return result_dict
+
+
+class BenchmarkEngine(object):
+  """
+  The engine to run the function repeatedly and measure the latencies.
+  """
+
+  def __init__(self,
+               warmup_iterations=5,
+               min_iterations=10,
+               max_iterations=100,
+               rse_threshold=0.01,
+               input_pool_size=4,
+               use_callable=False,
+               trace_memory=False):
+    """
+    Set warmup iterations and the early stopping of the timed iterations.
+
+    The timed iterations stop after min_iterations once the relative standard
+    error of the mean latency is below rse_threshold, or at max_iterations.
+    The spread of the latencies does not shrink with more iterations but the
+    error of their mean does, so the noisy model runs longer to be precise.
+    The input_pool_size batches are staged before timing and reused, or 0 to
+    get the batch from the input source in each iteration. The use_callable
+    runs with session.make_callable to cut the per-call overhead. The
+    trace_memory adds one traced run after timing for the allocator peak.
+    """
+
+    if min_iterations < 1 or max_iterations < min_iterations:
+      raise ValueError(
+          "Invalid iterations, min: {}, max: {}".format(
+              min_iterations, max_iterations))
+
+    self.warmup_iterations = warmup_iterations
+    self.min_iterations = min_iterations
+    self.max_iterations = max_iterations
+    self.rse_threshold = rse_threshold
+    self.input_pool_size = input_pool_size
+    self.use_callable = use_callable
+    self.trace_memory = trace_memory
+
+  @staticmethod
+  def coefficient_of_variation(latencies):
+    mean_latency = np.mean(latencies)
+    if mean_latency == 0:
+      return 0.0
+    return float(np.std(latencies) / mean_latency)
+
+  @staticmethod
+  def relative_standard_error(latencies):
+    """
+    Get the standard error of the mean latency relative to the mean, example: 0.01.
+    """
+
+    if len(latencies) < 2:
+      return float("inf")
+    return BenchmarkEngine.coefficient_of_variation(latencies) / np.sqrt(
+        len(latencies))
+
+  @staticmethod
+  def get_p99(latencies):
+    if len(latencies) < MIN_P99_ITERATIONS:
+      return None
+    return float(np.percentile(latencies, 99))
+
+  @staticmethod
+  def get_milliseconds(latency):
+    """
+    Convert the latency to milliseconds for the tables, example: 0.0012 -> 1.2.
+    """
+
+    if latency is None:
+      return None
+    return round(latency * 1000, 3)
+
+  def run(self, run_function, batch_size=1):
+    """
+    Warm up and run the function, then return the BenchmarkResult.
+    """
+
+    # Exclude the first runs which include the graph optimization cost
+    for i in range(self.warmup_iterations):
+      run_function()
+
+    latencies = []
+    start_time = timer()
+
+    for i in range(self.max_iterations):
+      iteration_start_time = timer()
+      run_function()
+      latencies.append(timer() - iteration_start_time)
+
+      if len(latencies) >= self.min_iterations and \
+          self.relative_standard_error(latencies) < self.rse_threshold:
+        logging.debug("Stop early after {} iterations".format(len(latencies)))
+        break
+
+    elapsed_time = timer() - start_time
+
+    return BenchmarkResult(batch_size, latencies, elapsed_time,
+                           self.warmup_iterations)
+
+  def run_concurrent(self,
+                     run_function,
+                     batch_size=1,
+                     concurrency=1,
+                     target_qps=None):
+    """
+    Run the function from a thread pool and return the ConcurrentBenchmarkResult.
+
+    Without target_qps every worker issues the next request once it finishes
+    the previous one. With target_qps the requests are dispatched at the fixed
+    rate no matter how fast they complete, so the latency includes queueing.
+    """
+
+    for i in range(self.warmup_iterations):
+      run_function()
+
+    # The item is the scheduled time of the request, or None for closed loop
+    request_queue = queue.Queue()
+    stop_request = object()
+
+    # Example: [(scheduled_time, start_time, end_time)]
+    request_records = []
+    # The exceptions of the failed requests, which are excluded from the latencies
+    errors = []
+    records_lock = threading.Lock()
+
+    def worker():
+      while True:
+        scheduled_time = request_queue.get()
+        if scheduled_time is stop_request:
+          return
+
+        request_start_time = timer()
+        if scheduled_time is None:
+          scheduled_time = request_start_time
+
+        try:
+          run_function()
+        except Exception as e:
+          # Keep the worker running for the remaining requests
+          with records_lock:
+            errors.append(e)
+          continue
+        request_end_time = timer()
+
+        with records_lock:
+          request_records.append(
+              (scheduled_time, request_start_time, request_end_time))
+
+    workers = [threading.Thread(target=worker) for i in range(concurrency)]
+    for thread in workers:
+      thread.daemon = True
+      thread.start()
+
+    start_time = timer()
+
+    for i in range(self.max_iterations):
+      if target_qps:
+        # Sleep until the scheduled time of the open loop request
+        scheduled_time = start_time + float(i) / target_qps
+        sleep_time = scheduled_time - timer()
+        if sleep_time > 0:
+          time.sleep(sleep_time)
+        request_queue.put(scheduled_time)
+      else:
+        request_queue.put(None)
+
+    for thread in workers:
+      request_queue.put(stop_request)
+    for thread in workers:
+      thread.join()
+
+    elapsed_time = timer() - start_time
+
+    if errors:
+      if not request_records:
+        # No latency to build the result from
+        raise errors[0]
+      logging.warning("Fail {} requests of {}, the first error: {}".format(
+          len(errors), self.max_iterations, errors[0]))
+
+    latencies = [end - scheduled for scheduled, start, end in request_records]
+    service_latencies = [end - start for _, start, end in request_records]
+    queueing_delays = [start - scheduled for scheduled, start, _ in request_records]
+
+    return ConcurrentBenchmarkResult(
+        batch_size, latencies, service_latencies, queueing_delays,
+        elapsed_time, self.warmup_iterations, concurrency, target_qps,
+        len(errors))
+
+  def run_soak(self,
+               run_function,
+               batch_size=1,
+               duration=None,
+               max_requests=None,
+               window_seconds=60.0,
+               histogram_bounds=None):
+    """
+    Run the function continuously and return the statistics of each time window.
+
+    Stop after the duration in seconds or max_requests, whichever comes
+    first. Each window has the latency percentiles, the latency histogram
+    with the upper bounds in seconds and the process RSS at its end.
+    """
+
+    if duration is None and max_requests is None:
+      raise ValueError("Set the duration or the max requests to stop")
+
+    if histogram_bounds is None:
+      # Example: [0.0001, 0.0002, 0.0004, ..., 419.4304]
+      histogram_bounds = [0.0001 * 2**i for i in range(23)]
+
+    for i in range(self.warmup_iterations):
+      run_function()
+
+    # Example: [{"window": 0, "p50_latency": 0.001, "rss_bytes": 104857600, ...}]
+    window_records = []
+    request_number = 0
+    start_time = timer()
+
+    while True:
+      window_start_time = timer()
+      latencies = []
+
+      while timer() - window_start_time < window_seconds:
+        if duration is not None and timer() - start_time >= duration:
+          break
+        if max_requests is not None and request_number >= max_requests:
+          break
+
+        iteration_start_time = timer()
+        run_function()
+        latencies.append(timer() - iteration_start_time)
+        request_number += 1
+
+      if not latencies:
+        break
+
+      window_elapsed_time = timer() - window_start_time
+      histogram_counts = np.histogram(
+          latencies, bins=[0.0] + histogram_bounds + [float("inf")])[0]
+
+      window_records.append({
+          "window": len(window_records),
+          "start_time": window_start_time - start_time,
+          "elapsed_time": window_elapsed_time,
+          "batch_size": batch_size,
+          "iterations": len(latencies),
+          "mean_latency": float(np.mean(latencies)),
+          "p50_latency": float(np.percentile(latencies, 50)),
+          "p99_latency": float(np.percentile(latencies, 99)),
+          "max_latency": float(np.max(latencies)),
+          "throughput": batch_size * len(latencies) / window_elapsed_time,
+          "rss_bytes": MemoryUtil.get_rss_bytes(),
+          # Example: {"0.0004": 120, "inf": 0}, only the non-empty buckets
+          "latency_histogram": dict(
+              (str(bound), int(count))
+              for bound, count in zip(histogram_bounds + [float("inf")],
+                                      histogram_counts) if count > 0)
+      })
+
+      logging.info(
+          "Soak window {}, requests: {}, p50: {}s, p99: {}s, RSS: {} MB".format(
+              window_records[-1]["window"], len(latencies),
+              window_records[-1]["p50_latency"],
+              window_records[-1]["p99_latency"],
+              MemoryUtil.get_megabytes(window_records[-1]["rss_bytes"])))
+
+    return window_records
+
+  @staticmethod
+  def print_results(benchmark_results):
+    """
+    Print the table of the benchmark results with latencies in milliseconds.
+    """
+
+    table = PrettyTable()
+    table.field_names = [
+        "BatchSize", "Iterations", "P50(ms)", "P90(ms)", "P99(ms)", "Max(ms)",
+        "Overhead(ms)", "CV", "RSE", "QPS", "Examples/s", "PeakRSS(MB)",
+        "AllocatorPeak(MB)"
+    ]
+
+    for result in benchmark_results:
+      table.add_row([
+          result.batch_size, result.iterations,
+          round(result.p50_latency * 1000, 3),
+          round(result.p90_latency * 1000, 3),
+          BenchmarkEngine.get_milliseconds(result.p99_latency),
+          round(result.max_latency * 1000, 3),
+          BenchmarkEngine.get_milliseconds(result.overhead_latency),
+          round(result.cv, 4),
+          round(result.rse, 4),
+          round(result.qps, 2),
+          round(result.throughput, 2),
+          MemoryUtil.get_megabytes(result.peak_rss_bytes),
+          MemoryUtil.get_megabytes(result.allocator_peak_bytes)
+      ])
+
+    print(table)
+
+  @staticmethod
+  def print_concurrent_results(benchmark_results):
+    """
+    Print the table of the concurrent benchmark results in milliseconds.
+    """
+
+    table = PrettyTable()
+    table.field_names = [
+        "BatchSize", "Concurrency", "TargetQPS", "Requests", "Errors", "P50(ms)",
+        "P99(ms)", "ServiceP99(ms)", "QueueP50(ms)", "QueueP99(ms)", "QPS",
+        "Examples/s", "PeakRSS(MB)", "AllocatorPeak(MB)"
+    ]
+
+    for result in benchmark_results:
+      table.add_row([
+          result.batch_size, result.concurrency, result.target_qps,
+          result.iterations, result.error_number,
+          round(result.p50_latency * 1000, 3),
+          BenchmarkEngine.get_milliseconds(result.p99_latency),
+          BenchmarkEngine.get_milliseconds(result.p99_service_latency),
+          round(result.p50_queueing_delay * 1000, 3),
+          BenchmarkEngine.get_milliseconds(result.p99_queueing_delay),
+          round(result.qps, 2),
+          round(result.throughput, 2),
+          MemoryUtil.get_megabytes(result.peak_rss_bytes),
+          MemoryUtil.get_megabytes(result.allocator_peak_bytes)
+      ])
+
+    print(table)
@@ -0,0 +1,373 @@
+import logging
+import struct
+import numpy as np
+from prettytable import PrettyTable
+
+from tfmodel.savedmodel_reader import DTYPE_MAP, SavedmodelReader, WIRE_TYPE_LENGTH_DELIMITED, WIRE_TYPE_VARINT
+
+# The magic number at the end of the table file, refer to tensorflow/core/lib/io/format.h
+TABLE_MAGIC_NUMBER = 0xdb4775248b80fb57
+TABLE_FOOTER_LENGTH = 48
+
+# The block type in the trailer of each table block
+NO_COMPRESSION = 0
+SNAPPY_COMPRESSION = 1
+
+
+class VariableEntry(object):
+  """
+  The BundleEntryProto of the variable with the location of its bytes in the data shard.
+  """
+
+  def __init__(self, name):
+    self.name = name
+    self.dtype = 0
+    self.shape = []
+    self.shard_id = 0
+    self.offset = 0
+    self.size = 0
+    # The partitioned variable has the slices and the bytes in other entries
+    self.is_sliced = False
+    self.slice_number = 0
+
+
+class CheckpointReader(object):
+  """
+  The reader to parse variables.index and memory-map the data shards without TensorFlow.
+
+  The index is the table of the BundleEntryProto of each variable, and the
+  values are read by chunks from the memory-mapped shards so the memory is
+  bounded for the large checkpoints.
+  """
+
+  def __init__(self, checkpoint_prefix, chunk_size=16 * 1024 * 1024):
+    """
+    Parse the index, example: "./model/1/variables/variables".
+    """
+
+    self.checkpoint_prefix = checkpoint_prefix
+    # The number of values to read from the shard at a time
+    self.chunk_size = chunk_size
+
+    with open(checkpoint_prefix + ".index", "rb") as f:
+      self.index_buffer = bytearray(f.read())
+
+    self.shard_number = 1
+    # Example: {"dense/kernel": VariableEntry}
+    self.variable_entry_map = {}
+    slice_entries = []
+
+    for key, value in self.iterate_table():
+      if not key:
+        # The empty key is the BundleHeaderProto
+        for field_number, wire_type, field_value in SavedmodelReader.iterate_fields(
+            value, 0, len(value)):
+          if field_number == 1 and wire_type == WIRE_TYPE_VARINT:
+            self.shard_number = field_value
+      elif key.startswith(b"\x00"):
+        # The slice of the partitioned variable, sorted before the variables
+        slice_entries.append(
+            self.parse_variable_entry(self.decode_slice_key(key), value))
+      else:
+        entry = self.parse_variable_entry(key.decode("utf-8"), value)
+        self.variable_entry_map[entry.name] = entry
+
+    # Count the bytes of the slices in the full variable whose size is 0
+    for slice_entry in slice_entries:
+      entry = self.variable_entry_map.get(slice_entry.name)
+      if entry is None:
+        logging.warning("Skip the slice of the unknown variable: {}".format(
+            slice_entry.name))
+        continue
+      entry.size += slice_entry.size
+      entry.slice_number += 1
+
+  @staticmethod
+  def decompress_snappy(buffer):
+    """
+    Decompress the Snappy raw format, refer to https://github.com/google/snappy/blob/master/format_description.txt.
+    """
+
+    uncompressed_length, position = SavedmodelReader.read_varint(buffer, 0)
+    output = bytearray()
+
+    while position < len(buffer):
+      tag = buffer[position]
+      position += 1
+      element_type = tag & 0x3
+
+      if element_type == 0:
+        # The literal with the length in the tag or the following 1 to 4 bytes
+        length = tag >> 2
+        if length >= 60:
+          byte_number = length - 59
+          length = 0
+          for i in range(byte_number):
+            length |= buffer[position + i] << (8 * i)
+          position += byte_number
+        length += 1
+        output.extend(buffer[position:position + length])
+        position += length
+        continue
+
+      if element_type == 1:
+        length = ((tag >> 2) & 0x7) + 4
+        offset = ((tag >> 5) << 8) | buffer[position]
+        position += 1
+      elif element_type == 2:
+        length = (tag >> 2) + 1
+        offset = buffer[position] | (buffer[position + 1] << 8)
+        position += 2
+      else:
+        length = (tag >> 2) + 1
+        offset = struct.unpack("<I", bytes(buffer[position:position + 4]))[0]
+        position += 4
+
+      # The copy may overlap the bytes it appends
+      start = len(output) - offset
+      for i in range(length):
+        output.append(output[start + i])
+
+    if len(output) != uncompressed_length:
+      raise ValueError("Fail to decompress the block of {} bytes".format(
+          uncompressed_length))
+
+    return output
+
+  def read_block(self, offset, size):
+    """
+    Read the block contents and decompress it with the type in the trailer.
+    """
+
+    block = self.index_buffer[offset:offset + size]
+    block_type = self.index_buffer[offset + size]
+
+    if block_type == SNAPPY_COMPRESSION:
+      return self.decompress_snappy(block)
+    elif block_type == NO_COMPRESSION:
+      return block
+    else:
+      raise ValueError("Unsupported block type: {}".format(block_type))
+
+  @staticmethod
+  def iterate_block(block):
+    """
+    Iterate the prefix-compressed entries of the block, example: (b"dense/kernel", bytearray).
+    """
+
+    # The restart points are at the end of the block and not needed to scan
+    restart_number = struct.unpack("<I", bytes(block[-4:]))[0]
+    end = len(block) - 4 * (restart_number + 1)
+
+    position = 0
+    key = bytearray()
+
+    while position < end:
+      shared_length, position = SavedmodelReader.read_varint(block, position)
+      non_shared_length, position = SavedmodelReader.read_varint(
+          block, position)
+      value_length, position = SavedmodelReader.read_varint(block, position)
+
+      key = key[:shared_length] + block[position:position + non_shared_length]
+      position += non_shared_length
+
+      yield bytes(key), block[position:position + value_length]
+      position += value_length
+
+  def iterate_table(self):
+    """
+    Iterate the entries of all the data blocks in the order of the keys.
+    """
+
+    footer = self.index_buffer[-TABLE_FOOTER_LENGTH:]
+    magic_number = struct.unpack("<Q", bytes(footer[-8:]))[0]
+    if magic_number != TABLE_MAGIC_NUMBER:
+      raise ValueError("Not the checkpoint index file: {}.index".format(
+          self.checkpoint_prefix))
+
+    # Skip the metaindex handle and read the index handle
+    _, position = SavedmodelReader.read_varint(footer, 0)
+    _, position = SavedmodelReader.read_varint(footer, position)
+    index_offset, position = SavedmodelReader.read_varint(footer, position)
+    index_size, position = SavedmodelReader.read_varint(footer, position)
+
+    for _, block_handle in self.iterate_block(
+        self.read_block(index_offset, index_size)):
+      block_offset, position = SavedmodelReader.read_varint(block_handle, 0)
+      block_size, position = SavedmodelReader.read_varint(
+          block_handle, position)
+
+      for key, value in self.iterate_block(
+          self.read_block(block_offset, block_size)):
+        yield key, value
+
+  @staticmethod
+  def decode_slice_key(key):
+    """
+    Get the variable name of the slice key, refer to EncodeTensorNameSlice in tensorflow/core/util/saved_tensor_slice_util.cc.
+
+    The key is the OrderedCode of 0, the name and the slice extents. The name
+    ends with b"\x00\x01", and its b"\x00" and b"\xff" are escaped with the
+    following b"\xff" and b"\x00".
+    """
+
+    key = bytearray(key)
+    name = bytearray()
+    position = 1
+
+    while position + 1 < len(key):
+      if key[position] == 0x00 and key[position + 1] == 0x01:
+        return name.decode("utf-8")
+      elif key[position] in [0x00, 0xff]:
+        name.append(key[position])
+        position += 2
+      else:
+        name.append(key[position])
+        position += 1
+
+    raise ValueError("Invalid slice key: {!r}".format(bytes(key)))
+
+  @staticmethod
+  def parse_variable_entry(name, buffer):
+    entry = VariableEntry(name)
+
+    for field_number, wire_type, value in SavedmodelReader.iterate_fields(
+        buffer, 0, len(buffer)):
+      if field_number == 1 and wire_type == WIRE_TYPE_VARINT:
+        entry.dtype = value
+      elif field_number == 2 and wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+        entry.shape = [
+            dim.size for dim in SavedmodelReader.parse_tensor_shape(
+                buffer, value[0], value[1]).dim
+        ]
+      elif field_number == 3 and wire_type == WIRE_TYPE_VARINT:
+        entry.shard_id = value
+      elif field_number == 4 and wire_type == WIRE_TYPE_VARINT:
+        entry.offset = value
+      elif field_number == 5 and wire_type == WIRE_TYPE_VARINT:
+        entry.size = value
+      elif field_number == 7 and wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+        entry.is_sliced = True
+
+    return entry
+
+  def get_shard_path(self, shard_id):
+    """
+    Get the data file of the shard, example: "./model/1/variables/variables.data-00000-of-00001".
+    """
+
+    return "{}.data-{:05d}-of-{:05d}".format(self.checkpoint_prefix, shard_id,
+                                              self.shard_number)
+
+  def get_variable_array(self, variable_name):
+    """
+    Get the memory-mapped flat array of the variable, or None if the dtype is not numeric.
+    """
+
+    entry = self.variable_entry_map[variable_name]
+    numpy_dtype = DTYPE_MAP.get(entry.dtype, (None, None, None))[2]
+
+    if numpy_dtype is None or entry.is_sliced or entry.size == 0:
+      return None
+
+    return np.memmap(
+        self.get_shard_path(entry.shard_id),
+        dtype=numpy_dtype,
+        mode="r",
+        offset=entry.offset,
+        shape=(entry.size // np.dtype(numpy_dtype).itemsize,))
+
+  def get_variable_stats(self, variable_name):
+    """
+    Get the shape, dtype, bytes, sparsity and range of the variable by chunks.
+    """
+
+    entry = self.variable_entry_map[variable_name]
+
+    stats = {
+        "variable_name": variable_name,
+        "dtype": DTYPE_MAP.get(entry.dtype,
+                               (None, str(entry.dtype), None))[1],
+        "shape": entry.shape,
+        "shard_id": entry.shard_id,
+        "bytes": entry.size,
+        "value_number": int(np.prod(entry.shape)),
+        "slice_number": entry.slice_number,
+        "sparsity": None,
+        "min_value": None,
+        "max_value": None,
+        "nan_number": None
+    }
+
+    array = self.get_variable_array(variable_name)
+    if array is None or len(array) == 0:
+      return stats
+
+    zero_number = 0
+    nan_number = 0
+    min_value = None
+    max_value = None
+    is_numeric = array.dtype.kind in ["i", "u", "f"]
+
+    for start in range(0, len(array), self.chunk_size):
+      # Only this chunk of the shard is paged into memory
+      chunk = np.asarray(array[start:start + self.chunk_size])
+      zero_number += int(np.count_nonzero(chunk == 0))
+
+      if not is_numeric:
+        continue
+
+      if chunk.dtype.kind == "f":
+        nan_mask = np.isnan(chunk)
+        nan_number += int(np.count_nonzero(nan_mask))
+        chunk = chunk[~nan_mask]
+        if len(chunk) == 0:
+          continue
+
+      chunk_min = chunk.min().item()
+      chunk_max = chunk.max().item()
+      min_value = chunk_min if min_value is None else min(min_value, chunk_min)
+      max_value = chunk_max if max_value is None else max(max_value, chunk_max)
+
+    stats["sparsity"] = float(zero_number) / len(array)
+    stats["min_value"] = min_value
+    stats["max_value"] = max_value
+    if is_numeric:
+      stats["nan_number"] = nan_number
+
+    return stats
+
+  def analyze(self, top_number=None):
+    """
+    Print the variables sorted by bytes and return their stats.
+    """
+
+    variable_stats_list = []
+    for variable_name in self.variable_entry_map.keys():
+      variable_stats_list.append(self.get_variable_stats(variable_name))
+
+    variable_stats_list.sort(
+        key=lambda stats: (-stats["bytes"], stats["variable_name"]))
+
+    total_bytes = sum(stats["bytes"] for stats in variable_stats_list)
+
+    table = PrettyTable()
+    table.field_names = [
+        "VariableName", "DType", "Shape", "Bytes", "Percentage", "Sparsity",
+        "Min", "Max"
+    ]
+    for stats in variable_stats_list[:top_number]:
+      table.add_row([
+          stats["variable_name"], stats["dtype"], stats["shape"],
+          stats["bytes"], "{:.2%}".format(
+              float(stats["bytes"]) / max(total_bytes, 1)),
+          None if stats["sparsity"] is None else
+          "{:.2%}".format(stats["sparsity"]), stats["min_value"],
+          stats["max_value"]
+      ])
+    print(table)
+
+    logging.info("Get {} variables of {} bytes in {} shards".format(
+        len(variable_stats_list), total_bytes, self.shard_number))
+
+    return variable_stats_list
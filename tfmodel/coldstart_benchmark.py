@@ -0,0 +1,242 @@
+import logging
+import os
+import time
+import numpy as np
+from prettytable import PrettyTable
+
+from tfmodel.process_worker import run_in_process
+from tfmodel.savedmodel_reader import SERVING_TAG
+
+# Use the high resolution clock if possible, Python 2 does not have perf_counter
+timer = getattr(time, "perf_counter", time.time)
+
+# The startup phases of the fresh process in order, example: ("tf_import_time", "TFImport")
+PHASES = [("tf_import_time", "TFImport"),
+          ("session_create_time", "SessionCreate"),
+          ("graph_import_time", "GraphImport"),
+          ("variable_restore_time", "VariableRestore"),
+          ("init_op_time", "InitOps"), ("load_time", "Load"),
+          ("first_latency", "FirstInference"),
+          ("steady_latency", "SteadyInference"), ("ready_time", "Ready"),
+          ("process_time", "Process")]
+
+
+def run_coldstart_worker(model_version_path,
+                         tags,
+                         batch_size,
+                         steady_iterations=10,
+                         signature_name=None):
+  """
+  Import TensorFlow, load the model and run the inferences in this fresh process.
+
+  Return the time of each phase in seconds. The graph import and variable
+  restore are split with SavedModelLoader, which is only in TensorFlow 1.12+,
+  otherwise they are None and only the whole load is timed.
+  """
+
+  start_time = timer()
+  import tensorflow as tf
+  tf_import_time = timer() - start_time
+
+  from tensorflow.python.saved_model import loader_impl
+  from tfmodel.utils import ModelUtil
+
+  # The session creation initializes the devices, which is the startup cost too
+  start_time = timer()
+  session = tf.Session(graph=tf.Graph())
+  session_create_time = timer() - start_time
+
+  graph_import_time = None
+  variable_restore_time = None
+  init_op_time = None
+
+  start_time = timer()
+
+  if hasattr(loader_impl, "SavedModelLoader"):
+    loader = loader_impl.SavedModelLoader(model_version_path)
+
+    saver = loader.load_graph(session.graph, tags)
+    # The newer TensorFlow returns the saver with the imported elements
+    if isinstance(saver, tuple):
+      saver = saver[0]
+    graph_import_time = timer() - start_time
+
+    phase_start_time = timer()
+    loader.restore_variables(session, saver)
+    variable_restore_time = timer() - phase_start_time
+
+    phase_start_time = timer()
+    loader.run_init_ops(session, tags)
+    init_op_time = timer() - phase_start_time
+
+    meta_graph = loader.get_meta_graph_def_from_tags(tags)
+  else:
+    meta_graph = tf.saved_model.loader.load(session, tags, model_version_path)
+
+  load_time = timer() - start_time
+
+  signature_name, model_graph_signature = ModelUtil.get_signature(
+      meta_graph, signature_name)
+  output_tensor_names = [
+      tensor_info.name
+      for tensor_info in model_graph_signature.outputs.values()
+  ]
+  feed_dict_map = ModelUtil.construct_feed_dict_with_batch(
+      model_graph_signature.inputs.items(), batch_size)
+
+  # The first run includes the graph optimization and the memory allocation
+  start_time = timer()
+  session.run(output_tensor_names, feed_dict=feed_dict_map)
+  first_latency = timer() - start_time
+
+  latencies = []
+  for i in range(steady_iterations):
+    start_time = timer()
+    session.run(output_tensor_names, feed_dict=feed_dict_map)
+    latencies.append(timer() - start_time)
+
+  session.close()
+
+  return {
+      "signature_name": signature_name,
+      "batch_size": batch_size,
+      "tf_import_time": tf_import_time,
+      "session_create_time": session_create_time,
+      "graph_import_time": graph_import_time,
+      "variable_restore_time": variable_restore_time,
+      "init_op_time": init_op_time,
+      "load_time": load_time,
+      "first_latency": first_latency,
+      "steady_latency": float(np.median(latencies)),
+      "ready_time":
+          tf_import_time + session_create_time + load_time + first_latency
+  }
+
+
+class ColdstartBenchmark(object):
+  """
+  The benchmark of the startup cost with the repeated fresh Python processes.
+  """
+
+  def __init__(self,
+               model_version_path,
+               tags=None,
+               signature_name=None,
+               repeats=3,
+               steady_iterations=10):
+    """
+    Set the model version to load, each repeat starts one process for each batch size.
+    """
+
+    if repeats < 1 or steady_iterations < 1:
+      raise ValueError(
+          "Invalid repeats: {} or steady iterations: {}".format(
+              repeats, steady_iterations))
+
+    self.model_version_path = model_version_path
+
+    if tags is None:
+      tags = [SERVING_TAG]
+    self.tags = tags
+
+    self.signature_name = signature_name
+    self.repeats = repeats
+    self.steady_iterations = steady_iterations
+
+  def run_process(self, batch_size):
+    """
+    Run the worker in a fresh Python process and return its timings.
+    """
+
+    start_time = timer()
+    # The TensorFlow logs of the child process are dropped
+    result = run_in_process(
+        "tfmodel.coldstart_benchmark.run_coldstart_worker", {
+            "model_version_path": self.model_version_path,
+            "tags": self.tags,
+            "batch_size": batch_size,
+            "steady_iterations": self.steady_iterations,
+            "signature_name": self.signature_name
+        },
+        quiet=True)
+    result["process_time"] = timer() - start_time
+    return result
+
+  def run(self, batch_size_list=None):
+    """
+    Run the processes and return the records with the mean time of each phase.
+    """
+
+    if batch_size_list is None:
+      batch_size_list = [1, 10, 1000]
+
+    # Example: {1: [{"tf_import_time": 1.2, ...}]}
+    batch_results_map = dict((batch_size, []) for batch_size in batch_size_list)
+
+    for repeat in range(self.repeats):
+      for batch_size in batch_size_list:
+        result = self.run_process(batch_size)
+        logging.info(
+            "Cold start {} of batch size {}, load: {}s, first inference: {}s".
+            format(repeat + 1, batch_size, round(result["load_time"], 3),
+                   round(result["first_latency"], 3)))
+        batch_results_map[batch_size].append(result)
+
+    coldstart_records = []
+
+    for batch_size in batch_size_list:
+      results = batch_results_map[batch_size]
+      record = {
+          "model_version": os.path.basename(self.model_version_path),
+          "signature_name": results[0]["signature_name"],
+          "batch_size": batch_size,
+          "repeats": len(results)
+      }
+
+      for key, _ in PHASES:
+        values = [result[key] for result in results if result[key] is not None]
+        if values:
+          record[key] = float(np.mean(values))
+          record[key + "_max"] = float(np.max(values))
+        else:
+          record[key] = None
+
+      record["warmup_penalty"] = record["first_latency"] - record[
+          "steady_latency"]
+      coldstart_records.append(record)
+
+    return coldstart_records
+
+  @staticmethod
+  def print_records(coldstart_records):
+    """
+    Print the tables of the startup phases and the warmup penalty in milliseconds.
+    """
+
+    table = PrettyTable()
+    table.field_names = ["BatchSize"] + [
+        "{}(ms)".format(phase_name) for _, phase_name in PHASES
+    ]
+    for record in coldstart_records:
+      table.add_row([record["batch_size"]] + [
+          round(record[key] * 1000, 3) if record[key] is not None else None
+          for key, _ in PHASES
+      ])
+    print(table)
+
+    table = PrettyTable()
+    table.field_names = [
+        "BatchSize", "FirstInference(ms)", "SteadyInference(ms)",
+        "WarmupPenalty(ms)", "PenaltyRatio"
+    ]
+    for record in coldstart_records:
+      table.add_row([
+          record["batch_size"],
+          round(record["first_latency"] * 1000, 3),
+          round(record["steady_latency"] * 1000, 3),
+          round(record["warmup_penalty"] * 1000, 3),
+          round(record["first_latency"] / max(record["steady_latency"], 1e-9),
+                2)
+      ])
+    print(table)
+
@@ -17,42 +17,607 @@
 
 import argparse
 import logging
+import os
 import pkg_resources
 import sys
 import coloredlogs
 
-from tfmodel.savedmodel_analyst import SavedmodelAnalyst
+from tfmodel.model_cache import ModelCache, is_remote_path, join_path
+from tfmodel.report_util import ReportUtil
+from tfmodel.repository_validator import RepositoryValidator
+from tfmodel.savedmodel_reader import SavedmodelReader
 
 coloredlogs.install()
 logging.basicConfig(level=logging.DEBUG)
 
+# The analysts shared by the chained subcommands, example: {"./model": SavedmodelAnalyst}
+savedmodel_analyst_map = {}
+
+# The argument to separate the chained subcommands
+CHAIN_SEPARATOR = "+"
+
+
+def get_savedmodel_analyst(model):
+  """
+  Get the analyst of the model and reuse its loaded sessions across subcommands.
+  """
+
+  # Import TensorFlow only for the subcommands which execute the graph
+  from tfmodel.savedmodel_analyst import SavedmodelAnalyst
+
+  if model not in savedmodel_analyst_map:
+    savedmodel_analyst_map[model] = SavedmodelAnalyst(model)
+  return savedmodel_analyst_map[model]
+
+
+def get_savedmodel_reader(model):
+  """
+  Get the reader of the model, the latest remote version is prefetched to the local cache.
+
+  The reader parses the local files only, example: "gs://bucket/model" is
+  read from "~/.cache/tfmodel/<hash>" which has the latest version.
+  """
+
+  if not is_remote_path(model):
+    return SavedmodelReader(model)
+
+  model_cache = ModelCache()
+  try:
+    model_versions = SavedmodelReader.sort_model_versions(
+        model_cache.file_system.list_directory(model))
+    if not model_versions:
+      raise IOError("No model version in: {}".format(model))
+    local_model_version_path = model_cache.stage(
+        join_path(model, model_versions[-1]))
+  except Exception as e:
+    logging.error("Fail to prefetch the model and get error: {}".format(e))
+    # The reader of the remote path does not exist and reports it
+    return SavedmodelReader(model)
+
+  return SavedmodelReader(os.path.dirname(local_model_version_path))
+
+
+def close_savedmodel_analysts():
+  """
+  Close all the analysts and free the loaded sessions.
+  """
+
+  for savedmodel in savedmodel_analyst_map.values():
+    savedmodel.close()
+  savedmodel_analyst_map.clear()
+
+
+def write_output(args, savedmodel, records):
+  """
+  Write the records with the model and config metadata if the output path is set.
+  """
+
+  if args.output_path is None:
+    return
+
+  # Example: {"batch_sizes": [1, 10], "concurrency": 1}
+  config = dict((key, value) for key, value in vars(args).items()
+                if key not in [
+                    "func", "command_group", "model", "output_path",
+                    "output_format"
+                ])
+
+  model_version = None
+  if savedmodel is not None and savedmodel.model_file_exist:
+    model_version = os.path.basename(savedmodel.model_version_path)
+
+  report = ReportUtil.construct_report(args.command_group, args.model, records,
+                                       config, model_version)
+  ReportUtil.write_report(report, args.output_path, args.output_format)
+
+
+def get_input_source(args):
+  """
+  Create the input source of the benchmark from the arguments.
+  """
+
+  from tfmodel.input_source import create_input_source
+
+  return create_input_source(
+      input_type=args.input_type,
+      data_path=args.input_path,
+      seed=args.seed,
+      compression_type=args.compression_type)
+
 
 def validate_model(args):
   logging.info("Try to validate the model: {}".format(args.model))
 
-  savedmodel = SavedmodelAnalyst(args.model)
+  if args.repository:
+    memory_limit = None
+    if args.memory_limit_mb is not None:
+      memory_limit = args.memory_limit_mb * 1024 * 1024
+
+    try:
+      repository_validator = RepositoryValidator(
+          args.model,
+          structural=args.structural,
+          process_number=args.processes,
+          memory_limit=memory_limit,
+          timeout=args.timeout,
+          max_tasks_per_worker=args.max_tasks_per_worker)
+    except ValueError as e:
+      logging.error(e)
+      sys.exit(1)
+
+    results = repository_validator.validate_and_print()
+
+    write_output(args, None, results)
+
+    if not all(result["validated"] for result in results):
+      sys.exit(1)
+    return
+
+  savedmodel = None
+  if args.structural:
+    # Parse the protobuf only without loading the model
+    savedmodel = get_savedmodel_reader(args.model)
+
+    # The text format saved_model.pbtxt can only be validated by loading
+    if savedmodel.model_file_exist and not savedmodel.is_binary_format():
+      logging.info("Load the text format saved_model.pbtxt with TensorFlow")
+      savedmodel = None
+
+  if savedmodel is not None:
+    errors = savedmodel.validate_structure()
+    for error in errors:
+      logging.error(error)
+    is_validated = not errors
+
+  else:
+    savedmodel = get_savedmodel_analyst(args.model)
+
+    is_validated = savedmodel.validate()
 
-  is_validated = savedmodel.validate()
   if is_validated:
     logging.info("Yes, it is the validated model")
   else:
     logging.error("False, it is not validated model")
 
+  write_output(args, savedmodel, [{"validated": is_validated}])
+
 
 def inspect_model(args):
   logging.info("Try to inspect the model: {}".format(args.model))
 
-  savedmodel = SavedmodelAnalyst(args.model)
+  # Parse the signatures from the protobuf without TensorFlow
+  savedmodel = get_savedmodel_reader(args.model)
+
+  if savedmodel.model_file_exist and not savedmodel.is_binary_format():
+    logging.info("Load the text format saved_model.pbtxt with TensorFlow")
+    savedmodel = get_savedmodel_analyst(args.model)
 
-  savedmodel.inspect_model()
+  tensor_records = savedmodel.inspect_model()
+
+  write_output(args, savedmodel, tensor_records or [])
 
 
 def benchmark_model(args):
   logging.info("Try to benchmark the model: {}".format(args.model))
 
-  savedmodel = SavedmodelAnalyst(args.model)
+  from tfmodel.benchmark_engine import BenchmarkEngine
+  from tfmodel.utils import ModelUtil
+
+  savedmodel = get_savedmodel_analyst(args.model)
+
+  input_source = get_input_source(args)
+
+  benchmark_engine = BenchmarkEngine(
+      warmup_iterations=args.warmup_iterations,
+      min_iterations=args.min_iterations,
+      max_iterations=args.max_iterations,
+      rse_threshold=args.rse_threshold,
+      input_pool_size=args.input_pool_size,
+      use_callable=args.use_callable,
+      trace_memory=args.trace_memory)
+
+  if args.versions or args.signatures:
+    if "all" in (args.versions or []):
+      args.versions = None
+
+    version_records = savedmodel.benchmark_model_versions(
+        model_versions=args.versions,
+        signature_names=args.signatures,
+        batch_size_list=args.batch_sizes,
+        benchmark_engine=benchmark_engine,
+        regression_threshold=args.regression_threshold,
+        input_source=input_source)
+
+    write_output(args, savedmodel, version_records or [])
+
+    if version_records is None or any(
+        version_record["regression"] for version_record in version_records):
+      sys.exit(1)
+
+  elif args.search_batch_size:
+    memory_limit = None
+    if args.memory_limit_mb is not None:
+      memory_limit = args.memory_limit_mb * 1024 * 1024
+
+    search_records = savedmodel.search_batch_size(
+        args.latency_budget_ms / 1000.0,
+        memory_limit=memory_limit,
+        max_batch_size=args.max_batch_size,
+        benchmark_engine=benchmark_engine,
+        input_source=input_source)
+
+    write_output(args, savedmodel, search_records or [])
+
+  elif (args.intra_op_threads or args.inter_op_threads or
+      args.optimizer_levels or args.xla_jit):
+    session_configs = ModelUtil.construct_session_configs(
+        args.intra_op_threads, args.inter_op_threads, args.optimizer_levels,
+        args.xla_jit)
+
+    config_results = savedmodel.benchmark_model_with_session_configs(
+        session_configs,
+        batch_size_list=args.batch_sizes,
+        benchmark_engine=benchmark_engine,
+        concurrency=args.concurrency,
+        target_qps=args.target_qps,
+        input_source=input_source)
+
+    config_records = []
+    for config_name, benchmark_result in config_results or []:
+      config_record = benchmark_result.to_dict()
+      config_record["config_name"] = config_name
+      config_records.append(config_record)
+
+    write_output(args, savedmodel, config_records)
+
+  else:
+    benchmark_results = savedmodel.benchmark_model_with_mock_data(
+        batch_size_list=args.batch_sizes,
+        benchmark_engine=benchmark_engine,
+        concurrency=args.concurrency,
+        target_qps=args.target_qps,
+        input_source=input_source)
+
+    write_output(args, savedmodel, [
+        benchmark_result.to_dict()
+        for benchmark_result in benchmark_results or []
+    ])
+
+
+def benchmark_model_coldstart(args):
+  logging.info("Try to benchmark the cold start of the model: {}".format(
+      args.model))
+
+  from tfmodel.coldstart_benchmark import ColdstartBenchmark
+
+  # Keep TensorFlow out of this process, the workers import it from scratch
+  savedmodel = get_savedmodel_reader(args.model)
+  if not savedmodel.model_file_exist:
+    sys.exit(1)
+
+  coldstart_benchmark = ColdstartBenchmark(
+      savedmodel.model_version_path,
+      signature_name=args.signature,
+      repeats=args.repeats,
+      steady_iterations=args.steady_iterations)
+
+  coldstart_records = coldstart_benchmark.run(args.batch_sizes)
+  ColdstartBenchmark.print_records(coldstart_records)
+
+  write_output(args, savedmodel, coldstart_records)
+
+
+def optimize_model(args):
+  logging.info("Try to optimize the model: {}".format(args.model))
+
+  from tfmodel.benchmark_engine import BenchmarkEngine
+
+  savedmodel = get_savedmodel_analyst(args.model)
+
+  benchmark_engine = BenchmarkEngine(
+      warmup_iterations=args.warmup_iterations,
+      max_iterations=args.max_iterations)
+
+  optimize_records = savedmodel.optimize_model(
+      output_version=args.output_version,
+      transforms=args.transforms,
+      batch_size_list=args.batch_sizes,
+      benchmark_engine=benchmark_engine,
+      input_source=get_input_source(args),
+      output_model_version_path=args.output_model_version_path)
+
+  if optimize_records is None:
+    sys.exit(1)
+
+  write_output(args, savedmodel, optimize_records)
+
+
+def quantize_model(args):
+  logging.info("Try to evaluate the quantization of the model: {}".format(
+      args.model))
+
+  from tfmodel.benchmark_engine import BenchmarkEngine
+
+  savedmodel = get_savedmodel_analyst(args.model)
+
+  benchmark_engine = BenchmarkEngine(
+      warmup_iterations=args.warmup_iterations,
+      max_iterations=args.max_iterations)
+
+  quantization_records = savedmodel.evaluate_quantization(
+      variants=args.variants,
+      batch_size_list=args.batch_sizes,
+      benchmark_engine=benchmark_engine,
+      input_source=get_input_source(args),
+      signature_name=args.signature,
+      fidelity_batch_size=args.fidelity_batch_size,
+      top_k=args.top_k,
+      export_path=args.export_path)
+
+  if quantization_records is None:
+    sys.exit(1)
+
+  write_output(args, savedmodel, quantization_records)
+
+
+def serve_model(args):
+  logging.info("Try to serve the model: {}".format(args.model))
+
+  from tfmodel.utils import ModelUtil
+
+  savedmodel = get_savedmodel_analyst(args.model)
+
+  session_config = None
+  if args.intra_op_threads is not None or args.inter_op_threads is not None:
+    session_config = ModelUtil.construct_session_configs(
+        [args.intra_op_threads or 0], [args.inter_op_threads or 0])[0][1]
 
-  savedmodel.benchmark_model_with_mock_data()
+  stats = savedmodel.serve_model(
+      host=args.host,
+      port=args.port,
+      max_batch_size=args.max_batch_size,
+      batch_timeout=args.batch_timeout_ms / 1000.0,
+      batch_thread_number=args.batch_threads,
+      duration=args.duration,
+      signature_name=args.signature,
+      session_config=session_config)
+
+  if stats is not None:
+    write_output(args, savedmodel, [stats])
+
+
+def generate_load(args):
+  logging.info("Try to send the requests of the model: {} to {}".format(
+      args.model, args.url))
+
+  from tfmodel.benchmark_engine import BenchmarkEngine
+  from tfmodel.model_server import LoadGenerator, ModelServer
+  from tfmodel.utils import ModelUtil
+
+  # Generate the request from the signature without loading the model
+  savedmodel = get_savedmodel_reader(args.model)
+  meta_graph = savedmodel.read_meta_graph()
+  signature_name, model_graph_signature = ModelUtil.get_signature(
+      meta_graph, args.signature)
+
+  input_items = sorted(model_graph_signature.inputs.items())
+  feed_dict_map = get_input_source(args).get_batch(input_items, args.batch_size)
+
+  load_generator = LoadGenerator(
+      args.url, LoadGenerator.construct_request_body(input_items, feed_dict_map))
+
+  benchmark_engine = BenchmarkEngine(
+      warmup_iterations=args.warmup_iterations,
+      max_iterations=args.requests)
+
+  benchmark_result = load_generator.run(
+      benchmark_engine,
+      batch_size=args.batch_size,
+      concurrency=args.concurrency,
+      target_qps=args.target_qps)
+  benchmark_result.signature_name = signature_name
+
+  # The batch sizes formed by the server for these requests and the others
+  server_stats = load_generator.get_server_stats()
+  ModelServer.print_stats(server_stats)
+
+  load_record = benchmark_result.to_dict()
+  load_record.update({
+      "error_number": load_generator.error_number,
+      "server_mean_batch_size": server_stats["mean_batch_size"],
+      "server_p99_queueing_delay": server_stats["p99_queueing_delay"]
+  })
+  write_output(args, savedmodel, [load_record])
+
+  if load_generator.error_number > 0:
+    sys.exit(1)
+
+
+def soak_test_model(args):
+  logging.info("Try to soak test the model: {}".format(args.model))
+
+  from tfmodel.benchmark_engine import BenchmarkEngine
+
+  if args.duration is None and args.requests is None:
+    logging.error("Set the duration or the requests to stop")
+    sys.exit(1)
+
+  savedmodel = get_savedmodel_analyst(args.model)
+
+  benchmark_engine = BenchmarkEngine(
+      warmup_iterations=args.warmup_iterations,
+      input_pool_size=args.input_pool_size)
+
+  soak_result = savedmodel.soak_test_model(
+      duration=args.duration,
+      max_requests=args.requests,
+      window_seconds=args.window_seconds,
+      batch_size=args.batch_size,
+      drift_threshold=args.drift_threshold,
+      memory_growth_threshold=args.memory_growth_threshold,
+      alpha=args.alpha,
+      benchmark_engine=benchmark_engine,
+      signature_name=args.signature,
+      input_source=get_input_source(args))
+
+  if soak_result is None:
+    sys.exit(1)
+
+  window_records, trend_records = soak_result
+  write_output(args, savedmodel, window_records + trend_records)
+
+  if any(trend_record["flagged"] for trend_record in trend_records):
+    sys.exit(1)
+
+
+def predict_model(args):
+  logging.info("Try to predict the data: {} with the model: {}".format(
+      args.input_path, args.model))
+
+  savedmodel = get_savedmodel_analyst(args.model)
+
+  predict_stats = savedmodel.predict_model(
+      args.input_path,
+      args.predictions_path,
+      batch_size=args.batch_size,
+      queue_size=args.queue_size,
+      compression_type=args.compression_type,
+      signature_name=args.signature)
+
+  if predict_stats is None:
+    sys.exit(1)
+
+  write_output(args, savedmodel, [predict_stats])
+
+
+def verify_model(args):
+  logging.info("Try to verify the outputs of the model: {}".format(args.model))
+
+  from tfmodel.utils import ModelUtil
+
+  savedmodel = get_savedmodel_analyst(args.model)
+
+  session_configs = None
+  if (args.intra_op_threads or args.inter_op_threads or
+      args.optimizer_levels or args.xla_jit):
+    session_configs = ModelUtil.construct_session_configs(
+        args.intra_op_threads, args.inter_op_threads, args.optimizer_levels,
+        args.xla_jit)
+
+  verify_records = savedmodel.verify_model(
+      session_configs=session_configs,
+      batch_size=args.batch_size,
+      split_sizes=args.split_sizes,
+      repeats=args.repeats,
+      tolerance=args.tolerance,
+      input_source=get_input_source(args),
+      signature_name=args.signature)
+
+  if verify_records is None:
+    sys.exit(1)
+
+  write_output(args, savedmodel, verify_records)
+
+  if not all(record["consistent"] for record in verify_records):
+    sys.exit(1)
+
+
+def inspect_checkpoint(args):
+  logging.info("Try to inspect the checkpoint of the model: {}".format(
+      args.model))
+
+  from tfmodel.checkpoint_reader import CheckpointReader
+
+  # Read the index and the memory-mapped shards without TensorFlow
+  savedmodel = get_savedmodel_reader(args.model)
+  if not savedmodel.model_file_exist:
+    return
+
+  checkpoint_prefix = os.path.join(savedmodel.model_version_path, "variables",
+                                   "variables")
+  if not os.path.exists(checkpoint_prefix + ".index"):
+    logging.error("The model has no variables: {}".format(
+        savedmodel.model_version_path))
+    return
+
+  checkpoint_reader = CheckpointReader(
+      checkpoint_prefix, chunk_size=args.chunk_size)
+
+  variable_records = checkpoint_reader.analyze(top_number=args.top_number)
+
+  write_output(args, savedmodel, variable_records)
+
+
+def analyze_parallelism(args):
+  logging.info("Try to analyze the parallelism of the model: {}".format(
+      args.model))
+
+  savedmodel = get_savedmodel_analyst(args.model)
+
+  critical_path_record = savedmodel.analyze_critical_path(
+      batch_size=args.batch_size,
+      cost_source=args.cost_source,
+      iterations=args.iterations,
+      top_number=args.top_number,
+      signature_name=args.signature,
+      input_source=get_input_source(args))
+
+  if critical_path_record is not None:
+    write_output(args, savedmodel, [critical_path_record])
+
+
+def prefetch_model(args):
+  logging.info("Try to prefetch the model: {}".format(args.model))
+
+  model_cache = ModelCache(
+      cache_path=args.cache_path, thread_number=args.prefetch_threads)
+
+  model_versions = args.model_versions
+  if not model_versions:
+    # Prefetch the latest version like TF Serving
+    model_versions = SavedmodelReader.sort_model_versions(
+        model_cache.file_system.list_directory(args.model))[-1:]
+
+  prefetch_records = []
+  for model_version in model_versions:
+    local_path = model_cache.stage(join_path(args.model, model_version))
+    prefetch_records.append({
+        "model_version": model_version,
+        "local_path": local_path
+    })
+
+  write_output(args, None, prefetch_records)
+
+
+def profile_model(args):
+  logging.info("Try to profile the model: {}".format(args.model))
+
+  savedmodel = get_savedmodel_analyst(args.model)
+
+  op_profiler = savedmodel.profile_model(
+      batch_size=args.batch_size,
+      iterations=args.iterations,
+      top_number=args.top_number,
+      chrome_trace_path=args.chrome_trace,
+      signature_name=args.signature,
+      input_source=get_input_source(args))
+
+  if op_profiler is not None:
+    write_output(args, savedmodel, op_profiler.get_op_records())
+
+
+def estimate_model(args):
+  logging.info("Try to estimate the model: {}".format(args.model))
+
+  savedmodel = get_savedmodel_analyst(args.model)
+
+  cost_record = savedmodel.estimate_model_cost(
+      batch_size=args.batch_size,
+      top_number=args.top_number,
+      signature_name=args.signature)
+
+  if cost_record is not None:
+    write_output(args, savedmodel, [cost_record])
 
 
 def export_model_tensorboard(args):
@@ -60,10 +625,30 @@ def export_model_tensorboard(args):
   logging.info("Try to export the model: {}, tensorboard file; {}".format(
       args.model, tensorboard_path))
 
-  savedmodel = SavedmodelAnalyst(args.model)
+  savedmodel = get_savedmodel_analyst(args.model)
 
   savedmodel.export_tensorboard_files(tensorboard_path)
 
+  write_output(args, savedmodel, [{"tensorboard_path": tensorboard_path}])
+
+
+def compare_results(args):
+  logging.info("Try to compare the results: {} and {}".format(
+      args.baseline, args.candidate))
+
+  regressed_records = ReportUtil.compare_reports(
+      args.baseline,
+      args.candidate,
+      threshold=args.threshold,
+      alpha=args.alpha)
+
+  if regressed_records:
+    logging.error("Get {} significant regressions".format(
+        len(regressed_records)))
+    sys.exit(1)
+  else:
+    logging.info("No significant regression")
+
 
 def main():
   parser = argparse.ArgumentParser()
@@ -77,25 +662,719 @@ def main():
 
   main_subparser = parser.add_subparsers(dest="command_group", help="Commands")
 
+  # The common arguments to write the structured output
+  output_parser = argparse.ArgumentParser(add_help=False)
+  output_parser.add_argument(
+      "--output_path",
+      dest="output_path",
+      help="Write the results to this JSON or CSV file")
+  output_parser.add_argument(
+      "--output_format",
+      dest="output_format",
+      choices=["json", "csv"],
+      help="The format of the output, infer from the extension by default")
+
+  # The common arguments to generate the inputs
+  input_parser = argparse.ArgumentParser(add_help=False)
+  input_parser.add_argument(
+      "--input_type",
+      dest="input_type",
+      choices=["constant", "random", "numpy", "tfrecord"],
+      default="constant",
+      help="The source of the inputs to feed")
+  input_parser.add_argument(
+      "--input_path",
+      dest="input_path",
+      help="The .npy, .npz or TFRecord file for the numpy and tfrecord inputs")
+  input_parser.add_argument(
+      "--seed", dest="seed", type=int, help="The seed of the random inputs")
+  input_parser.add_argument(
+      "--compression_type",
+      dest="compression_type",
+      choices=["GZIP", "ZLIB"],
+      help="The compression type of the TFRecord file")
+
   # subcommand: validate
-  validate_parser = main_subparser.add_parser("validate")
+  validate_parser = main_subparser.add_parser(
+      "validate", parents=[output_parser])
   validate_parser.add_argument("model", help="Path of the model")
+  validate_parser.add_argument(
+      "--structural",
+      dest="structural",
+      action="store_true",
+      help="Validate the files and signatures without loading the model")
+  validate_parser.add_argument(
+      "--repository",
+      dest="repository",
+      action="store_true",
+      help="Validate all the model versions under the path")
+  validate_parser.add_argument(
+      "--processes",
+      dest="processes",
+      type=int,
+      help="The number of worker processes, use the CPU count by default")
+  validate_parser.add_argument(
+      "--memory_limit_mb",
+      dest="memory_limit_mb",
+      type=int,
+      help="The address space limit of each worker process")
+  validate_parser.add_argument(
+      "--timeout",
+      dest="timeout",
+      type=float,
+      help="Fail the model version which takes longer than the seconds")
+  validate_parser.add_argument(
+      "--max_tasks_per_worker",
+      dest="max_tasks_per_worker",
+      type=int,
+      default=10,
+      help="Restart the worker process after validating the versions")
   validate_parser.set_defaults(func=validate_model)
 
   # subcommand: inspect
-  inspect_parser = main_subparser.add_parser("inspect")
+  inspect_parser = main_subparser.add_parser(
+      "inspect", parents=[output_parser])
   inspect_parser.add_argument("model", help="Path of the model")
   inspect_parser.set_defaults(func=inspect_model)
 
   # subcommand: benchmark
-  benchmark_parser = main_subparser.add_parser("benchmark")
+  benchmark_parser = main_subparser.add_parser(
+      "benchmark", parents=[output_parser, input_parser])
   benchmark_parser.add_argument("model", help="Path of the model")
+  benchmark_parser.add_argument(
+      "--batch_sizes",
+      dest="batch_sizes",
+      type=int,
+      nargs="+",
+      help="The batch sizes to benchmark, example: 1 10 1000")
+  benchmark_parser.add_argument(
+      "--warmup_iterations",
+      dest="warmup_iterations",
+      type=int,
+      default=5,
+      help="The untimed iterations before measuring")
+  benchmark_parser.add_argument(
+      "--min_iterations",
+      dest="min_iterations",
+      type=int,
+      default=10,
+      help="The minimal timed iterations before early stopping")
+  benchmark_parser.add_argument(
+      "--max_iterations",
+      dest="max_iterations",
+      type=int,
+      default=100,
+      help="The maximal timed iterations")
+  benchmark_parser.add_argument(
+      "--rse_threshold",
+      dest="rse_threshold",
+      type=float,
+      default=0.01,
+      help="Stop early when the relative standard error of the mean latency is below this")
+  benchmark_parser.add_argument(
+      "--input_pool_size",
+      dest="input_pool_size",
+      type=int,
+      default=4,
+      help="The batches staged before timing, 0 to get a batch in each run")
+  benchmark_parser.add_argument(
+      "--use_callable",
+      dest="use_callable",
+      action="store_true",
+      help="Run with session.make_callable to cut the per-call overhead")
+  benchmark_parser.add_argument(
+      "--trace_memory",
+      dest="trace_memory",
+      action="store_true",
+      help="Trace one more run of each batch size for the allocator peak")
+  benchmark_parser.add_argument(
+      "--concurrency",
+      dest="concurrency",
+      type=int,
+      default=1,
+      help="The number of threads to send requests with the shared session")
+  benchmark_parser.add_argument(
+      "--target_qps",
+      dest="target_qps",
+      type=float,
+      help="Send requests at this fixed rate in open loop")
+  benchmark_parser.add_argument(
+      "--intra_op_threads",
+      dest="intra_op_threads",
+      type=int,
+      nargs="+",
+      help="The intra_op_parallelism_threads to sweep, example: 1 2 4")
+  benchmark_parser.add_argument(
+      "--inter_op_threads",
+      dest="inter_op_threads",
+      type=int,
+      nargs="+",
+      help="The inter_op_parallelism_threads to sweep, example: 1 2")
+  benchmark_parser.add_argument(
+      "--optimizer_levels",
+      dest="optimizer_levels",
+      nargs="+",
+      choices=["L0", "L1"],
+      help="The graph optimizer levels to sweep")
+  benchmark_parser.add_argument(
+      "--xla_jit",
+      dest="xla_jit",
+      type=lambda value: value.lower() in ["true", "on", "1"],
+      nargs="+",
+      help="Sweep the XLA JIT, example: off on")
+  benchmark_parser.add_argument(
+      "--search_batch_size",
+      dest="search_batch_size",
+      action="store_true",
+      help="Search the batch size with the max throughput")
+  benchmark_parser.add_argument(
+      "--latency_budget_ms",
+      dest="latency_budget_ms",
+      type=float,
+      default=100.0,
+      help="The p99 latency budget for searching batch size, the max latency with fewer than 100 iterations")
+  benchmark_parser.add_argument(
+      "--memory_limit_mb",
+      dest="memory_limit_mb",
+      type=int,
+      help="Stop searching batch size when the process RSS approaches this")
+  benchmark_parser.add_argument(
+      "--max_batch_size",
+      dest="max_batch_size",
+      type=int,
+      default=1048576,
+      help="The max batch size for searching batch size")
+  benchmark_parser.add_argument(
+      "--versions",
+      dest="versions",
+      nargs="+",
+      help="The model versions to compare with the first one, example: 1 2 or all")
+  benchmark_parser.add_argument(
+      "--signatures",
+      dest="signatures",
+      nargs="+",
+      help="The signatures to benchmark, use all signatures by default")
+  benchmark_parser.add_argument(
+      "--regression_threshold",
+      dest="regression_threshold",
+      type=float,
+      help="Exit with non-zero code if any version regresses more, example: 0.1")
   benchmark_parser.set_defaults(func=benchmark_model)
 
+  # subcommand: coldstart
+  coldstart_parser = main_subparser.add_parser(
+      "coldstart", parents=[output_parser])
+  coldstart_parser.add_argument("model", help="Path of the model")
+  coldstart_parser.add_argument(
+      "--batch_sizes",
+      dest="batch_sizes",
+      type=int,
+      nargs="+",
+      help="The batch sizes of the first inference, example: 1 10 1000")
+  coldstart_parser.add_argument(
+      "--repeats",
+      dest="repeats",
+      type=int,
+      default=3,
+      help="The number of fresh processes for each batch size")
+  coldstart_parser.add_argument(
+      "--steady_iterations",
+      dest="steady_iterations",
+      type=int,
+      default=10,
+      help="The runs after the first inference to get the steady latency")
+  coldstart_parser.add_argument(
+      "--signature",
+      dest="signature",
+      help="The signature to run, use serving_default by default")
+  coldstart_parser.set_defaults(func=benchmark_model_coldstart)
+
+  # subcommand: optimize
+  optimize_parser = main_subparser.add_parser(
+      "optimize", parents=[output_parser, input_parser])
+  optimize_parser.add_argument("model", help="Path of the model")
+  optimize_parser.add_argument(
+      "--output_version",
+      dest="output_version",
+      help="The version to write the optimized model, use the next number by default")
+  optimize_parser.add_argument(
+      "--output_model_version_path",
+      dest="output_model_version_path",
+      help="The local path to write the optimized version, required for the remote model, example: ./optimized_model/3")
+  optimize_parser.add_argument(
+      "--transforms",
+      dest="transforms",
+      nargs="+",
+      help="The graph transforms after freezing, example: fold_constants fold_batch_norms")
+  optimize_parser.add_argument(
+      "--batch_sizes",
+      dest="batch_sizes",
+      type=int,
+      nargs="+",
+      help="The batch sizes to benchmark both models, example: 1 10 1000")
+  optimize_parser.add_argument(
+      "--warmup_iterations",
+      dest="warmup_iterations",
+      type=int,
+      default=5,
+      help="The untimed iterations before measuring")
+  optimize_parser.add_argument(
+      "--max_iterations",
+      dest="max_iterations",
+      type=int,
+      default=100,
+      help="The maximal timed iterations")
+  optimize_parser.set_defaults(func=optimize_model)
+
+  # subcommand: quantize
+  quantize_parser = main_subparser.add_parser(
+      "quantize", parents=[output_parser, input_parser])
+  quantize_parser.add_argument("model", help="Path of the model")
+  quantize_parser.add_argument(
+      "--variants",
+      dest="variants",
+      nargs="+",
+      choices=["float16_weights", "int8_weights", "int8_full"],
+      help="The quantized variants to evaluate, use all by default")
+  quantize_parser.add_argument(
+      "--batch_sizes",
+      dest="batch_sizes",
+      type=int,
+      nargs="+",
+      help="The batch sizes to benchmark the variants, example: 1 10 1000")
+  quantize_parser.add_argument(
+      "--warmup_iterations",
+      dest="warmup_iterations",
+      type=int,
+      default=5,
+      help="The untimed iterations before measuring")
+  quantize_parser.add_argument(
+      "--max_iterations",
+      dest="max_iterations",
+      type=int,
+      default=100,
+      help="The maximal timed iterations")
+  quantize_parser.add_argument(
+      "--fidelity_batch_size",
+      dest="fidelity_batch_size",
+      type=int,
+      default=100,
+      help="The batch size of the inputs to compare the outputs")
+  quantize_parser.add_argument(
+      "--top_k",
+      dest="top_k",
+      type=int,
+      default=5,
+      help="The k of the top-k agreement of the [batch, classes] outputs")
+  quantize_parser.add_argument(
+      "--export_path",
+      dest="export_path",
+      help="Keep the variants in this directory, use a temporary one by default")
+  quantize_parser.add_argument(
+      "--signature",
+      dest="signature",
+      help="The signature to evaluate, use serving_default by default")
+  quantize_parser.set_defaults(func=quantize_model)
+
+  # subcommand: serve
+  serve_parser = main_subparser.add_parser("serve", parents=[output_parser])
+  serve_parser.add_argument("model", help="Path of the model")
+  serve_parser.add_argument(
+      "--host",
+      dest="host",
+      default="localhost",
+      help="The host to listen, use 0.0.0.0 for all interfaces")
+  serve_parser.add_argument(
+      "--port", dest="port", type=int, default=8500, help="The port to listen")
+  serve_parser.add_argument(
+      "--max_batch_size",
+      dest="max_batch_size",
+      type=int,
+      default=32,
+      help="The max rows of the merged requests in one session run")
+  serve_parser.add_argument(
+      "--batch_timeout_ms",
+      dest="batch_timeout_ms",
+      type=float,
+      default=1.0,
+      help="The max time to wait for more requests after the first one")
+  serve_parser.add_argument(
+      "--batch_threads",
+      dest="batch_threads",
+      type=int,
+      default=1,
+      help="The number of threads to run the batches concurrently")
+  serve_parser.add_argument(
+      "--intra_op_threads",
+      dest="intra_op_threads",
+      type=int,
+      help="The intra_op_parallelism_threads of the session")
+  serve_parser.add_argument(
+      "--inter_op_threads",
+      dest="inter_op_threads",
+      type=int,
+      help="The inter_op_parallelism_threads of the session")
+  serve_parser.add_argument(
+      "--duration",
+      dest="duration",
+      type=float,
+      help="Stop serving after the seconds, serve until interrupted by default")
+  serve_parser.add_argument(
+      "--signature",
+      dest="signature",
+      help="The signature to serve, use serving_default by default")
+  serve_parser.set_defaults(func=serve_model)
+
+  # subcommand: loadgen
+  loadgen_parser = main_subparser.add_parser(
+      "loadgen", parents=[output_parser, input_parser])
+  loadgen_parser.add_argument(
+      "model", help="Path of the model to generate the requests")
+  loadgen_parser.add_argument(
+      "--url",
+      dest="url",
+      default="http://localhost:8500",
+      help="The address of the model server")
+  loadgen_parser.add_argument(
+      "--batch_size",
+      dest="batch_size",
+      type=int,
+      default=1,
+      help="The rows of each request")
+  loadgen_parser.add_argument(
+      "--requests",
+      dest="requests",
+      type=int,
+      default=1000,
+      help="The number of timed requests")
+  loadgen_parser.add_argument(
+      "--warmup_iterations",
+      dest="warmup_iterations",
+      type=int,
+      default=5,
+      help="The untimed requests before measuring")
+  loadgen_parser.add_argument(
+      "--concurrency",
+      dest="concurrency",
+      type=int,
+      default=8,
+      help="The number of threads to send requests")
+  loadgen_parser.add_argument(
+      "--target_qps",
+      dest="target_qps",
+      type=float,
+      help="Send requests at this fixed rate in open loop")
+  loadgen_parser.add_argument(
+      "--signature",
+      dest="signature",
+      help="The signature of the server, use serving_default by default")
+  loadgen_parser.set_defaults(func=generate_load)
+
+  # subcommand: soak
+  soak_parser = main_subparser.add_parser(
+      "soak", parents=[output_parser, input_parser])
+  soak_parser.add_argument("model", help="Path of the model")
+  soak_parser.add_argument(
+      "--duration",
+      dest="duration",
+      type=float,
+      help="The seconds to run, example: 3600")
+  soak_parser.add_argument(
+      "--requests",
+      dest="requests",
+      type=int,
+      help="The number of requests to run")
+  soak_parser.add_argument(
+      "--window_seconds",
+      dest="window_seconds",
+      type=float,
+      default=60.0,
+      help="The seconds of each window to sample the latencies and RSS")
+  soak_parser.add_argument(
+      "--batch_size",
+      dest="batch_size",
+      type=int,
+      default=1,
+      help="The batch size of each request")
+  soak_parser.add_argument(
+      "--warmup_iterations",
+      dest="warmup_iterations",
+      type=int,
+      default=5,
+      help="The untimed iterations before the first window")
+  soak_parser.add_argument(
+      "--input_pool_size",
+      dest="input_pool_size",
+      type=int,
+      default=4,
+      help="The batches staged before running, 0 to get a batch in each run")
+  soak_parser.add_argument(
+      "--drift_threshold",
+      dest="drift_threshold",
+      type=float,
+      default=0.1,
+      help="The relative change of latency or throughput to flag")
+  soak_parser.add_argument(
+      "--memory_growth_threshold",
+      dest="memory_growth_threshold",
+      type=float,
+      default=0.05,
+      help="The relative growth of RSS to flag")
+  soak_parser.add_argument(
+      "--alpha",
+      dest="alpha",
+      type=float,
+      default=0.05,
+      help="The significance level of the trend test")
+  soak_parser.add_argument(
+      "--signature",
+      dest="signature",
+      help="The signature to run, use serving_default by default")
+  soak_parser.set_defaults(func=soak_test_model)
+
+  # subcommand: predict
+  predict_parser = main_subparser.add_parser(
+      "predict", parents=[output_parser])
+  predict_parser.add_argument("model", help="Path of the model")
+  predict_parser.add_argument(
+      "input_path", help="The .csv, .npy, .npz or TFRecord file to predict")
+  predict_parser.add_argument(
+      "predictions_path", help="Write the outputs to this .csv or .jsonl file")
+  predict_parser.add_argument(
+      "--batch_size",
+      dest="batch_size",
+      type=int,
+      default=128,
+      help="The rows of each session run")
+  predict_parser.add_argument(
+      "--queue_size",
+      dest="queue_size",
+      type=int,
+      default=4,
+      help="The max batches waiting between the read, run and write stages")
+  predict_parser.add_argument(
+      "--compression_type",
+      dest="compression_type",
+      choices=["GZIP", "ZLIB"],
+      help="The compression type of the TFRecord file")
+  predict_parser.add_argument(
+      "--signature",
+      dest="signature",
+      help="The signature to run, use serving_default by default")
+  predict_parser.set_defaults(func=predict_model)
+
+  # subcommand: verify
+  verify_parser = main_subparser.add_parser(
+      "verify", parents=[output_parser, input_parser])
+  verify_parser.add_argument("model", help="Path of the model")
+  verify_parser.add_argument(
+      "--batch_size",
+      dest="batch_size",
+      type=int,
+      default=32,
+      help="The batch size of the reference run")
+  verify_parser.add_argument(
+      "--split_sizes",
+      dest="split_sizes",
+      type=int,
+      nargs="+",
+      default=[1],
+      help="Run the batch in the chunks of these sizes, example: 1 7")
+  verify_parser.add_argument(
+      "--repeats",
+      dest="repeats",
+      type=int,
+      default=3,
+      help="The number of repeated runs with the same session")
+  verify_parser.add_argument(
+      "--tolerance",
+      dest="tolerance",
+      type=float,
+      default=0.0,
+      help="The max abs difference to be consistent, 0 for identical outputs")
+  verify_parser.add_argument(
+      "--intra_op_threads",
+      dest="intra_op_threads",
+      type=int,
+      nargs="+",
+      help="The intra_op_parallelism_threads to compare, example: 1 4")
+  verify_parser.add_argument(
+      "--inter_op_threads",
+      dest="inter_op_threads",
+      type=int,
+      nargs="+",
+      help="The inter_op_parallelism_threads to compare, example: 1 2")
+  verify_parser.add_argument(
+      "--optimizer_levels",
+      dest="optimizer_levels",
+      nargs="+",
+      choices=["L0", "L1"],
+      help="The graph optimizer levels to compare")
+  verify_parser.add_argument(
+      "--xla_jit",
+      dest="xla_jit",
+      type=lambda value: value.lower() in ["true", "on", "1"],
+      nargs="+",
+      help="Compare the XLA JIT, example: off on")
+  verify_parser.add_argument(
+      "--signature",
+      dest="signature",
+      help="The signature to verify, use serving_default by default")
+  verify_parser.set_defaults(func=verify_model)
+
+  # subcommand: checkpoint
+  checkpoint_parser = main_subparser.add_parser(
+      "checkpoint", parents=[output_parser])
+  checkpoint_parser.add_argument("model", help="Path of the model")
+  checkpoint_parser.add_argument(
+      "--top_number",
+      dest="top_number",
+      type=int,
+      default=None,
+      help="The number of the largest variables to print, print all by default")
+  checkpoint_parser.add_argument(
+      "--chunk_size",
+      dest="chunk_size",
+      type=int,
+      default=16 * 1024 * 1024,
+      help="The number of values to read from the data shards at a time")
+  checkpoint_parser.set_defaults(func=inspect_checkpoint)
+
+  # subcommand: parallelism
+  parallelism_parser = main_subparser.add_parser(
+      "parallelism", parents=[output_parser, input_parser])
+  parallelism_parser.add_argument("model", help="Path of the model")
+  parallelism_parser.add_argument(
+      "--batch_size",
+      dest="batch_size",
+      type=int,
+      default=1,
+      help="The batch size to infer the shapes or run the model")
+  parallelism_parser.add_argument(
+      "--cost_source",
+      dest="cost_source",
+      choices=["flops", "profile"],
+      default="flops",
+      help="Use the estimated FLOPs or the measured time of each op")
+  parallelism_parser.add_argument(
+      "--iterations",
+      dest="iterations",
+      type=int,
+      default=10,
+      help="The number of traced runs with the profile cost source")
+  parallelism_parser.add_argument(
+      "--top_number",
+      dest="top_number",
+      type=int,
+      default=20,
+      help="The number of the costliest levels to print")
+  parallelism_parser.add_argument(
+      "--signature",
+      dest="signature",
+      help="The signature to analyze, use serving_default by default")
+  parallelism_parser.set_defaults(func=analyze_parallelism)
+
+  # subcommand: prefetch
+  prefetch_parser = main_subparser.add_parser(
+      "prefetch", parents=[output_parser])
+  prefetch_parser.add_argument(
+      "model", help="Path or URI of the model, example: gs://bucket/model")
+  prefetch_parser.add_argument(
+      "--model_versions",
+      dest="model_versions",
+      nargs="+",
+      help="The model versions to prefetch, use the latest one by default")
+  prefetch_parser.add_argument(
+      "--cache_path",
+      dest="cache_path",
+      help="The local cache directory, use $TFMODEL_CACHE_PATH or ~/.cache/tfmodel by default")
+  prefetch_parser.add_argument(
+      "--prefetch_threads",
+      dest="prefetch_threads",
+      type=int,
+      default=8,
+      help="The number of threads to copy the files in parallel")
+  prefetch_parser.set_defaults(func=prefetch_model)
+
+  # subcommand: profile
+  profile_parser = main_subparser.add_parser(
+      "profile", parents=[output_parser, input_parser])
+  profile_parser.add_argument("model", help="Path of the model")
+  profile_parser.add_argument(
+      "--batch_size",
+      dest="batch_size",
+      type=int,
+      default=1,
+      help="The batch size of the mock data")
+  profile_parser.add_argument(
+      "--iterations",
+      dest="iterations",
+      type=int,
+      default=10,
+      help="The number of traced runs to aggregate")
+  profile_parser.add_argument(
+      "--top_number",
+      dest="top_number",
+      type=int,
+      default=20,
+      help="The number of the hottest ops to print")
+  profile_parser.add_argument(
+      "--chrome_trace",
+      dest="chrome_trace",
+      help="Write the Chrome trace JSON to this path")
+  profile_parser.add_argument(
+      "--signature",
+      dest="signature",
+      help="The signature to profile, use serving_default by default")
+  profile_parser.set_defaults(func=profile_model)
+
+  # subcommand: estimate
+  estimate_parser = main_subparser.add_parser(
+      "estimate", parents=[output_parser])
+  estimate_parser.add_argument("model", help="Path of the model")
+  estimate_parser.add_argument(
+      "--batch_size",
+      dest="batch_size",
+      type=int,
+      default=1,
+      help="The batch size to infer the activation shapes")
+  estimate_parser.add_argument(
+      "--top_number",
+      dest="top_number",
+      type=int,
+      default=20,
+      help="The number of the largest ops and variables to print")
+  estimate_parser.add_argument(
+      "--signature",
+      dest="signature",
+      help="The signature to estimate, use serving_default by default")
+  estimate_parser.set_defaults(func=estimate_model)
+
   # subcommand: tensorboard
-  tensorboard_parser = main_subparser.add_parser("tensorboard")
+  tensorboard_parser = main_subparser.add_parser(
+      "tensorboard", parents=[output_parser])
   tensorboard_parser.add_argument("model", help="Path of the model")
   tensorboard_parser.set_defaults(func=export_model_tensorboard)
+
+  # subcommand: compare
+  compare_parser = main_subparser.add_parser("compare")
+  compare_parser.add_argument(
+      "baseline", help="Path of the baseline result file")
+  compare_parser.add_argument(
+      "candidate", help="Path of the candidate result file")
+  compare_parser.add_argument(
+      "--threshold",
+      dest="threshold",
+      type=float,
+      default=0.05,
+      help="The relative regression of latency or throughput to flag")
+  compare_parser.add_argument(
+      "--alpha",
+      dest="alpha",
+      type=float,
+      default=0.05,
+      help="The significance level of Welch's t-test")
+  compare_parser.set_defaults(func=compare_results)
   """
   # subcommand: study describe
   study_describe_parser = study_subparser.add_parser(
@@ -111,10 +1390,24 @@ def main():
 
   # Display help information by default
   if len(sys.argv) == 1:
-    args = parser.parse_args(["-h"])
-  else:
-    args = parser.parse_args(sys.argv[1:])
-  args.func(args)
+    parser.parse_args(["-h"])
+
+  # Chain the subcommands with "+" to load the model once, example: "validate ./model + benchmark ./model"
+  chained_argvs = [[]]
+  for arg in sys.argv[1:]:
+    if arg == CHAIN_SEPARATOR:
+      chained_argvs.append([])
+    else:
+      chained_argvs[-1].append(arg)
+
+  # Parse all the subcommands before running any of them
+  chained_args = [parser.parse_args(argv) for argv in chained_argvs]
+
+  try:
+    for args in chained_args:
+      args.func(args)
+  finally:
+    close_savedmodel_analysts()
 
 
 if __name__ == "__main__":
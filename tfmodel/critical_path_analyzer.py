@@ -0,0 +1,196 @@
+import logging
+import math
+from prettytable import PrettyTable
+
+
+class CriticalPathAnalyzer(object):
+  """
+  The analyzer of the critical path and the parallelism of the dependency DAG.
+
+  The total cost of all the ops is the work and the cost of the longest path
+  is the span. No matter how many inter_op threads are used, the latency is
+  bounded by the span, so work / span is the upper bound of the speedup.
+  """
+
+  def __init__(self, pruned_ops, op_cost_map, cost_unit="FLOPs"):
+    """
+    Build the DAG of the ops in topological order, example: GraphCostEstimator.get_pruned_ops().
+
+    The cost of the op is from the map, example: {"MatMul": 2048}, and the ops
+    not in the map cost 0.
+    """
+
+    self.pruned_ops = pruned_ops
+    self.op_cost_map = op_cost_map
+    self.cost_unit = cost_unit
+
+    pruned_op_set = set(pruned_ops)
+
+    # Example: {<tf.Operation 'MatMul'>: [<tf.Operation 'Placeholder'>]}
+    self.predecessor_map = {}
+    for op in pruned_ops:
+      predecessors = set()
+      for input_op in [tensor.op for tensor in op.inputs] + list(
+          op.control_inputs):
+        # Skip the back edges of the while loops like get_pruned_ops
+        if input_op in pruned_op_set and input_op.type != "NextIteration":
+          predecessors.add(input_op)
+      self.predecessor_map[op] = predecessors
+
+  def get_op_cost(self, op):
+    return self.op_cost_map.get(op.name, 0) or 0
+
+  def get_critical_path(self):
+    """
+    Get the ops of the longest path by cost and its total cost.
+    """
+
+    # The cost of the longest path ending with the op
+    finish_cost_map = {}
+    # The predecessor on the longest path, example: {<MatMul>: <Placeholder>}
+    critical_predecessor_map = {}
+
+    for op in self.pruned_ops:
+      critical_predecessor = None
+      start_cost = 0
+      for predecessor in self.predecessor_map[op]:
+        if critical_predecessor is None or finish_cost_map[
+            predecessor] > start_cost:
+          critical_predecessor = predecessor
+          start_cost = finish_cost_map[predecessor]
+
+      finish_cost_map[op] = start_cost + self.get_op_cost(op)
+      critical_predecessor_map[op] = critical_predecessor
+
+    if not finish_cost_map:
+      return [], 0
+
+    op = max(self.pruned_ops, key=lambda op: finish_cost_map[op])
+    critical_path_cost = finish_cost_map[op]
+
+    critical_path = []
+    while op is not None:
+      critical_path.append(op)
+      op = critical_predecessor_map[op]
+    critical_path.reverse()
+
+    return critical_path, critical_path_cost
+
+  def get_level_records(self):
+    """
+    Get the ops of each level which can run at the same time, example: [{"level": 0, "op_number": 3, ...}].
+
+    The level of the op is the longest number of edges from the ops without
+    inputs, so the ops of the same level have no dependency on each other.
+    """
+
+    level_map = {}
+    for op in self.pruned_ops:
+      level_map[op] = max(
+          [level_map[predecessor] + 1
+           for predecessor in self.predecessor_map[op]] or [0])
+
+    level_number = max(level_map.values()) + 1 if level_map else 0
+    level_records = [{
+        "level": level,
+        "op_number": 0,
+        "costly_op_number": 0,
+        "cost": 0
+    } for level in range(level_number)]
+
+    for op, level in level_map.items():
+      op_cost = self.get_op_cost(op)
+      level_records[level]["op_number"] += 1
+      level_records[level]["cost"] += op_cost
+      # The cheap ops like Const and Identity do not need another thread
+      if op_cost > 0:
+        level_records[level]["costly_op_number"] += 1
+
+    return level_records
+
+  def analyze(self, top_number=20):
+    """
+    Print the critical path and the parallelism width of each level, return the summary record.
+    """
+
+    critical_path, critical_path_cost = self.get_critical_path()
+    level_records = self.get_level_records()
+
+    total_cost = sum(self.get_op_cost(op) for op in self.pruned_ops)
+    if critical_path_cost > 0:
+      parallelism = float(total_cost) / critical_path_cost
+    else:
+      parallelism = 1.0
+    max_width = max(
+        [record["costly_op_number"] for record in level_records] or [0])
+
+    table = PrettyTable()
+    table.field_names = [
+        "OpName", "OpType", self.cost_unit, "Percentage", "Cumulative"
+    ]
+    cumulative_cost = 0
+    # Skip the cheap ops on the path like Identity which are usually the majority
+    for op in critical_path:
+      op_cost = self.get_op_cost(op)
+      cumulative_cost += op_cost
+      if op_cost <= 0:
+        continue
+      table.add_row([
+          op.name, op.type, op_cost, "{:.2%}".format(
+              float(op_cost) / max(critical_path_cost, 1)), cumulative_cost
+      ])
+    print(table)
+
+    table = PrettyTable()
+    table.field_names = [
+        "Level", "OpNumber", "CostlyOpNumber", self.cost_unit, "Percentage"
+    ]
+    # Print the costliest levels in the order of execution
+    top_level_records = sorted(
+        level_records, key=lambda record: record["cost"],
+        reverse=True)[:top_number]
+    for record in sorted(top_level_records, key=lambda record: record["level"]):
+      table.add_row([
+          record["level"], record["op_number"], record["costly_op_number"],
+          record["cost"], "{:.2%}".format(
+              float(record["cost"]) / max(total_cost, 1))
+      ])
+    print(table)
+
+    # More threads than the average parallelism only wait for the critical path
+    suggested_inter_op_threads = max(
+        1, min(max_width, int(math.ceil(parallelism - 1e-9))))
+
+    table = PrettyTable()
+    table.field_names = ["Metric", "Value"]
+    table.add_row(["OpNumber", len(self.pruned_ops)])
+    table.add_row(["CriticalPathOpNumber", len(critical_path)])
+    table.add_row(["LevelNumber", len(level_records)])
+    table.add_row(["Total{}".format(self.cost_unit), total_cost])
+    table.add_row(["CriticalPath{}".format(self.cost_unit), critical_path_cost])
+    table.add_row(["Parallelism", round(parallelism, 3)])
+    table.add_row(["MaxCostlyWidth", max_width])
+    table.add_row(["SuggestedInterOpThreads", suggested_inter_op_threads])
+    print(table)
+
+    if suggested_inter_op_threads <= 1:
+      logging.info(
+          "The critical path has {:.2%} of the cost, more inter_op threads cannot help".
+          format(float(critical_path_cost) / max(total_cost, 1)))
+    else:
+      logging.info(
+          "The independent ops may use up to {} inter_op threads".format(
+              suggested_inter_op_threads))
+
+    return {
+        "cost_unit": self.cost_unit,
+        "op_number": len(self.pruned_ops),
+        "level_number": len(level_records),
+        "total_cost": total_cost,
+        "critical_path_cost": critical_path_cost,
+        "parallelism": parallelism,
+        "max_costly_width": max_width,
+        "suggested_inter_op_threads": suggested_inter_op_threads,
+        "critical_path": [op.name for op in critical_path],
+        "level_widths": [record["costly_op_number"] for record in level_records]
+    }
@@ -0,0 +1,289 @@
+import logging
+import numpy as np
+import tensorflow as tf
+from prettytable import PrettyTable
+from tensorflow.python.framework import ops
+
+from tfmodel.utils import ModelUtil
+
+# The ops holding the parameters which are not counted as activations
+PARAMETER_OP_TYPES = ["Const", "VariableV2", "Variable", "VarHandleOp"]
+
+# The ops of the variables which are saved in the checkpoint
+VARIABLE_OP_TYPES = ["VariableV2", "Variable", "VarHandleOp"]
+
+
+class GraphCostEstimator(object):
+  """
+  The estimator of FLOPs, parameters and memory with the MetaGraphDef only.
+  """
+
+  def __init__(self, meta_graph_def, signature_name=None, batch_size=1):
+    """
+    Import the graph with the signature inputs of the batch size for shape inference.
+    """
+
+    self.meta_graph_def = meta_graph_def
+    self.batch_size = batch_size
+    self.signature_name, self.model_graph_signature = ModelUtil.get_signature(
+        meta_graph_def, signature_name)
+
+    self.graph = tf.Graph()
+
+    with self.graph.as_default():
+      # Replace the signature inputs with the placeholders of concrete shapes
+      input_map = {}
+      for name, tensor_info in self.model_graph_signature.inputs.items():
+        if tensor_info.tensor_shape.unknown_rank:
+          shape = None
+        else:
+          shape = ModelUtil.get_shape_with_batch(tensor_info, batch_size)
+
+        input_map[tensor_info.name] = tf.placeholder(
+            tf.as_dtype(tensor_info.dtype),
+            shape=shape,
+            name="tfmodel_estimator_input_{}".format(name))
+
+      tf.import_graph_def(
+          meta_graph_def.graph_def, input_map=input_map, name="")
+
+  def get_pruned_ops(self):
+    """
+    Get the ops reachable from the signature outputs in topological order.
+    """
+
+    output_ops = [
+        self.graph.get_tensor_by_name(tensor_info.name).op
+        for tensor_info in self.model_graph_signature.outputs.values()
+    ]
+
+    # Use the iterative depth-first search for the graphs with many nodes
+    pruned_ops = []
+    visited_ops = set()
+    stack = [(op, False) for op in output_ops]
+
+    while stack:
+      op, is_expanded = stack.pop()
+
+      if is_expanded:
+        pruned_ops.append(op)
+        continue
+      if op in visited_ops:
+        continue
+      visited_ops.add(op)
+
+      stack.append((op, True))
+      for input_op in [tensor.op for tensor in op.inputs] + op.control_inputs:
+        # Skip the back edges of the while loops
+        if input_op.type != "NextIteration" and input_op not in visited_ops:
+          stack.append((input_op, False))
+
+    return pruned_ops
+
+  @staticmethod
+  def get_tensor_bytes(tensor):
+    """
+    Get the bytes of the tensor, or None if the shape is not fully defined.
+    """
+
+    if not tensor.shape.is_fully_defined():
+      return None
+
+    try:
+      itemsize = tensor.dtype.base_dtype.size
+    except Exception:
+      itemsize = 0
+
+    return int(np.prod(tensor.shape.as_list())) * itemsize
+
+  @staticmethod
+  def get_op_flops(op):
+    """
+    Get the FLOPs of the op from the registered statistics, or None if unknown.
+    """
+
+    try:
+      return ops.get_stats_for_node_def(op.graph, op.node_def, "flops").value
+    except (ValueError, TypeError):
+      # The shapes are not fully defined
+      return None
+
+  def estimate_flops(self):
+    """
+    Get the FLOPs of each op, example: {"MatMul": 2048}.
+    """
+
+    op_flops_map = {}
+
+    for op in self.get_pruned_ops():
+      flops = self.get_op_flops(op)
+      if flops is not None:
+        op_flops_map[op.name] = flops
+
+    return op_flops_map
+
+  def estimate_peak_activation_bytes(self):
+    """
+    Simulate the execution in topological order and get the peak live bytes.
+
+    The output tensor is freed once all its consumers have run, so the peak
+    is the lower bound of the activation memory of a single inference.
+    """
+
+    pruned_ops = self.get_pruned_ops()
+    pruned_op_set = set(pruned_ops)
+
+    # Example: {<tf.Tensor 'MatMul:0'>: 2}
+    remaining_consumer_map = {}
+    for op in pruned_ops:
+      for tensor in op.outputs:
+        remaining_consumer_map[tensor] = len(
+            [consumer for consumer in tensor.consumers()
+             if consumer in pruned_op_set])
+
+    live_bytes = 0
+    peak_bytes = 0
+    unknown_tensor_number = 0
+    # Example: {<tf.Tensor 'MatMul:0'>: 4096}
+    allocated_tensor_map = {}
+
+    for op in pruned_ops:
+      if op.type not in PARAMETER_OP_TYPES:
+        for tensor in op.outputs:
+          tensor_bytes = self.get_tensor_bytes(tensor)
+          if tensor_bytes is None:
+            unknown_tensor_number += 1
+            continue
+          allocated_tensor_map[tensor] = tensor_bytes
+          live_bytes += tensor_bytes
+
+      peak_bytes = max(peak_bytes, live_bytes)
+
+      for tensor in op.inputs:
+        if tensor in remaining_consumer_map:
+          remaining_consumer_map[tensor] -= 1
+          if remaining_consumer_map[tensor] <= 0 and tensor in allocated_tensor_map:
+            live_bytes -= allocated_tensor_map.pop(tensor)
+
+    if unknown_tensor_number > 0:
+      logging.warning("Ignore {} tensors with unknown shapes".format(
+          unknown_tensor_number))
+
+    return peak_bytes
+
+  @staticmethod
+  def get_variable_sizes(checkpoint_prefix):
+    """
+    Get the shape, dtype and bytes of the variables from the checkpoint index.
+
+    Example: {"dense/kernel": ([9, 2], tf.float32, 72)}.
+    """
+
+    # The reader only parses the index file until the tensors are read
+    checkpoint_reader = tf.train.NewCheckpointReader(checkpoint_prefix)
+    variable_to_shape_map = checkpoint_reader.get_variable_to_shape_map()
+    variable_to_dtype_map = checkpoint_reader.get_variable_to_dtype_map()
+
+    variable_size_map = {}
+    for variable_name, shape in variable_to_shape_map.items():
+      dtype = variable_to_dtype_map[variable_name]
+      try:
+        itemsize = dtype.size
+      except Exception:
+        itemsize = 0
+
+      variable_size_map[variable_name] = (shape, dtype,
+                                          int(np.prod(shape)) * itemsize)
+
+    return variable_size_map
+
+  def get_used_variable_names(self):
+    """
+    Get the names of the variables reachable from the signature outputs, example: set(["dense/kernel"]).
+
+    The optimizer slots like "dense/kernel/Adagrad" and the global step are
+    in the checkpoint but not used by the inference.
+    """
+
+    used_variable_names = set()
+    for op in self.get_pruned_ops():
+      if op.type in VARIABLE_OP_TYPES:
+        used_variable_names.add(op.name)
+        # The resource variable may be saved with the shared name
+        if op.type == "VarHandleOp" and op.get_attr("shared_name"):
+          used_variable_names.add(
+              tf.compat.as_str(op.get_attr("shared_name")))
+
+    return used_variable_names
+
+  def print_report(self, checkpoint_prefix=None, top_number=20):
+    """
+    Print the tables of the hottest ops, the largest variables and the summary.
+    """
+
+    op_flops_map = self.estimate_flops()
+    total_flops = sum(op_flops_map.values())
+
+    table = PrettyTable()
+    table.field_names = ["OpName", "OpType", "FLOPs", "Percentage"]
+    for op_name, flops in sorted(
+        op_flops_map.items(), key=lambda item: item[1],
+        reverse=True)[:top_number]:
+      table.add_row([
+          op_name,
+          self.graph.get_operation_by_name(op_name).type, flops,
+          "{:.2%}".format(float(flops) / max(total_flops, 1))
+      ])
+    print(table)
+
+    parameter_number = 0
+    parameter_bytes = 0
+    unused_variable_number = 0
+    unused_variable_bytes = 0
+
+    if checkpoint_prefix is not None:
+      variable_size_map = self.get_variable_sizes(checkpoint_prefix)
+
+      # Only count the parameters of the inference, not the optimizer slots
+      used_variable_names = self.get_used_variable_names()
+      for variable_name in list(variable_size_map.keys()):
+        if variable_name not in used_variable_names:
+          unused_variable_number += 1
+          unused_variable_bytes += variable_size_map.pop(variable_name)[2]
+
+      table = PrettyTable()
+      table.field_names = ["VariableName", "DType", "Shape", "Bytes"]
+      for variable_name, (shape, dtype, variable_bytes) in sorted(
+          variable_size_map.items(), key=lambda item: item[1][2],
+          reverse=True)[:top_number]:
+        table.add_row([variable_name, dtype.name, shape, variable_bytes])
+      print(table)
+
+      for shape, dtype, variable_bytes in variable_size_map.values():
+        parameter_number += int(np.prod(shape))
+        parameter_bytes += variable_bytes
+
+    peak_activation_bytes = self.estimate_peak_activation_bytes()
+
+    table = PrettyTable()
+    table.field_names = ["Metric", "Value"]
+    table.add_row(["Signature", self.signature_name])
+    table.add_row(["BatchSize", self.batch_size])
+    table.add_row(["FLOPs", total_flops])
+    table.add_row(["Parameters", parameter_number])
+    table.add_row(["ParameterBytes", parameter_bytes])
+    table.add_row(["UnusedVariables", unused_variable_number])
+    table.add_row(["UnusedVariableBytes", unused_variable_bytes])
+    table.add_row(["PeakActivationBytes", peak_activation_bytes])
+    print(table)
+
+    return {
+        "signature_name": self.signature_name,
+        "batch_size": self.batch_size,
+        "flops": total_flops,
+        "parameter_number": parameter_number,
+        "parameter_bytes": parameter_bytes,
+        "unused_variable_number": unused_variable_number,
+        "unused_variable_bytes": unused_variable_bytes,
+        "peak_activation_bytes": peak_activation_bytes
+    }
@@ -0,0 +1,230 @@
+import logging
+import os
+import numpy as np
+import tensorflow as tf
+
+# The collections of the ops to run after restoring, example: the table initializers
+INIT_OP_COLLECTION_KEYS = ["saved_model_main_op", "legacy_init_op"]
+
+# Refer to https://github.com/tensorflow/tensorflow/tree/master/tensorflow/tools/graph_transforms
+DEFAULT_TRANSFORMS = [
+    "fold_constants(ignore_errors=true)", "fold_batch_norms",
+    "fold_old_batch_norms"
+]
+
+
+# The transforms of the quantized variants after freezing, float16 is rewritten by the optimizer
+QUANTIZATION_TRANSFORMS = {
+    "float16_weights": [],
+    "int8_weights": ["quantize_weights"],
+    "int8_full": ["quantize_weights", "quantize_nodes"]
+}
+
+
+class GraphOptimizer(object):
+  """
+  The optimizer to freeze the loaded model and rewrite it for inference.
+  """
+
+  def __init__(self, session, meta_graph, transforms=None):
+    """
+    Optimize the graph of the session, keep the tensors of all the signatures.
+    """
+
+    self.session = session
+    self.meta_graph = meta_graph
+
+    if transforms is None:
+      transforms = DEFAULT_TRANSFORMS
+    self.transforms = transforms
+
+    # Example: ["dense/BiasAdd"]
+    self.input_node_names = []
+    self.output_node_names = []
+    for signature_def in meta_graph.signature_def.values():
+      for tensor_info in signature_def.inputs.values():
+        self.input_node_names.append(self.get_node_name(tensor_info.name))
+      for tensor_info in signature_def.outputs.values():
+        self.output_node_names.append(self.get_node_name(tensor_info.name))
+
+    # Example: ["init_all_tables"]
+    self.init_op_names = []
+    for collection_key in INIT_OP_COLLECTION_KEYS:
+      for op in session.graph.get_collection(collection_key):
+        self.init_op_names.append(op.name)
+
+  @staticmethod
+  def get_node_name(tensor_name):
+    """
+    Get the node name of the tensor, example: "^dense/BiasAdd:0" -> "dense/BiasAdd".
+    """
+
+    return tensor_name.lstrip("^").split(":")[0]
+
+  def freeze_graph_def(self):
+    """
+    Replace the variables with constants and remove the unreachable nodes.
+    """
+
+    # The init ops are kept to initialize the lookup tables
+    return tf.graph_util.convert_variables_to_constants(
+        self.session, self.session.graph.as_graph_def(),
+        sorted(set(self.output_node_names + self.init_op_names)))
+
+  def remove_training_nodes(self, graph_def):
+    """
+    Remove the Identity and CheckNumerics nodes which are not the signature tensors.
+    """
+
+    protected_nodes = sorted(
+        set(self.input_node_names + self.output_node_names +
+            self.init_op_names))
+
+    try:
+      return tf.graph_util.remove_training_nodes(
+          graph_def, protected_nodes=protected_nodes)
+    except TypeError:
+      # The older TensorFlow may remove the signature tensors without protected_nodes
+      logging.warning("Skip removing training nodes which is not supported")
+      return graph_def
+
+  def transform_graph_def(self, graph_def):
+    """
+    Fold the constants and batch norms with the Graph Transform Tool.
+    """
+
+    try:
+      from tensorflow.tools.graph_transforms import TransformGraph
+    except ImportError:
+      logging.warning("Skip the transforms without the Graph Transform Tool")
+      return graph_def
+
+    return TransformGraph(graph_def, sorted(set(self.input_node_names)),
+                          sorted(set(self.output_node_names +
+                                     self.init_op_names)), self.transforms)
+
+  @staticmethod
+  def convert_weights_to_float16(graph_def, minimum_size=1024):
+    """
+    Store the large float32 constants as float16 and cast them back when running.
+
+    The const node is renamed and replaced by the Cast node with the same name,
+    so the consumers are not changed and the compute is still in float32.
+    """
+
+    converted_graph_def = tf.GraphDef()
+    converted_graph_def.versions.CopyFrom(graph_def.versions)
+    converted_graph_def.library.CopyFrom(graph_def.library)
+
+    for node in graph_def.node:
+      if node.op == "Const" and \
+          node.attr["dtype"].type == tf.float32.as_datatype_enum:
+        array = tf.make_ndarray(node.attr["value"].tensor)
+
+        if array.size >= minimum_size:
+          half_node = converted_graph_def.node.add()
+          half_node.name = node.name + "_float16"
+          half_node.op = "Const"
+          half_node.device = node.device
+          half_node.attr["dtype"].type = tf.float16.as_datatype_enum
+          half_node.attr["value"].tensor.CopyFrom(
+              tf.make_tensor_proto(array.astype(np.float16)))
+
+          cast_node = converted_graph_def.node.add()
+          cast_node.name = node.name
+          cast_node.op = "Cast"
+          cast_node.device = node.device
+          cast_node.input.append(half_node.name)
+          cast_node.attr["SrcT"].type = tf.float16.as_datatype_enum
+          cast_node.attr["DstT"].type = tf.float32.as_datatype_enum
+          continue
+
+      converted_graph_def.node.extend([node])
+
+    return converted_graph_def
+
+  def quantize(self, variant):
+    """
+    Get the frozen GraphDef of the quantized variant, example: "int8_weights".
+    """
+
+    if variant not in QUANTIZATION_TRANSFORMS:
+      raise ValueError("Unsupported quantization variant: {}".format(variant))
+
+    graph_def = self.freeze_graph_def()
+
+    if variant == "float16_weights":
+      return self.convert_weights_to_float16(graph_def)
+
+    from tensorflow.tools.graph_transforms import TransformGraph
+
+    return TransformGraph(graph_def, sorted(set(self.input_node_names)),
+                          sorted(set(self.output_node_names +
+                                     self.init_op_names)),
+                          QUANTIZATION_TRANSFORMS[variant])
+
+  def optimize(self):
+    """
+    Get the optimized GraphDef and log the node number of each step.
+    """
+
+    logging.info("Get {} nodes in the original graph".format(
+        len(self.session.graph.as_graph_def().node)))
+
+    graph_def = self.freeze_graph_def()
+    logging.info("Get {} nodes after freezing".format(len(graph_def.node)))
+
+    graph_def = self.remove_training_nodes(graph_def)
+    logging.info("Get {} nodes after removing training nodes".format(
+        len(graph_def.node)))
+
+    graph_def = self.transform_graph_def(graph_def)
+    logging.info("Get {} nodes after the transforms: {}".format(
+        len(graph_def.node), self.transforms))
+
+    return graph_def
+
+  def export(self, graph_def, export_path, tags):
+    """
+    Write the optimized GraphDef as the SavedModel without variables.
+    """
+
+    if tf.GraphKeys.ASSET_FILEPATHS in self.meta_graph.collection_def:
+      raise ValueError("The model with assets is not supported to optimize")
+
+    graph = tf.Graph()
+
+    with graph.as_default():
+      tf.import_graph_def(graph_def, name="")
+
+      legacy_init_op = None
+      if self.init_op_names:
+        legacy_init_op = tf.group(
+            *[graph.get_operation_by_name(name) for name in self.init_op_names],
+            name="tfmodel_legacy_init_op")
+
+      with tf.Session(graph=graph) as session:
+        builder = tf.saved_model.builder.SavedModelBuilder(export_path)
+        builder.add_meta_graph_and_variables(
+            session,
+            tags,
+            signature_def_map=dict(self.meta_graph.signature_def),
+            legacy_init_op=legacy_init_op,
+            clear_devices=True)
+        builder.save()
+
+    logging.info("Write the optimized model: {}".format(export_path))
+
+  @staticmethod
+  def get_directory_bytes(directory_path):
+    """
+    Get the total bytes of the files in the directory recursively.
+    """
+
+    directory_bytes = 0
+
+    for dirpath, dirnames, filenames in os.walk(directory_path):
+      for filename in filenames:
+        directory_bytes += os.path.getsize(os.path.join(dirpath, filename))
+
+    return directory_bytes
@@ -0,0 +1,343 @@
+import logging
+import threading
+import zipfile
+import numpy as np
+import tensorflow as tf
+
+from tfmodel.utils import ModelUtil
+
+
+class InputSource(object):
+  """
+  The base class to generate the feed dict of the signature inputs by batch.
+  """
+
+  def get_batch(self, input_items, batch_size=1):
+    """
+    Get the next feed dict, example: {"Placeholder:0": np.ndarray}.
+    """
+
+    raise NotImplementedError
+
+  def get_config(self):
+    """
+    Get the arguments of create_input_source to create it again in another process.
+    """
+
+    raise NotImplementedError
+
+
+class ConstantInputSource(InputSource):
+  """
+  The input source to fill every input with the constant value.
+  """
+
+  def __init__(self):
+    # Reuse the constant feed dict, example: {(1, (("features", "Placeholder:0"),)): {"Placeholder:0": np.ndarray}}
+    self.feed_dict_map_cache = {}
+
+  def get_batch(self, input_items, batch_size=1):
+    # The same source may feed the signatures or the models with other inputs
+    cache_key = (batch_size,
+                 tuple((name, tensor_info.name)
+                       for name, tensor_info in input_items))
+
+    if cache_key not in self.feed_dict_map_cache:
+      self.feed_dict_map_cache[
+          cache_key] = ModelUtil.construct_feed_dict_with_batch(
+              input_items, batch_size)
+
+    return self.feed_dict_map_cache[cache_key]
+
+  def get_config(self):
+    return {"input_type": "constant"}
+
+
+class RandomInputSource(InputSource):
+  """
+  The input source to generate random values with the distribution of each dtype.
+  """
+
+  def __init__(self, seed=None, max_int_value=100, string_length=8):
+    """
+    Set the random seed, the integers are in [0, max_int_value) to be valid ids.
+    """
+
+    self.seed = seed
+    self.random_state = np.random.RandomState(seed)
+    self.max_int_value = max_int_value
+    self.string_length = string_length
+
+  def generate_array(self, dtype, shape):
+    numpy_dtype = ModelUtil.get_numpy_dtype(dtype)
+
+    if dtype == int(tf.string):
+      # Example: b"a8k2m0zq"
+      characters = np.frombuffer(b"abcdefghijklmnopqrstuvwxyz0123456789",
+                                 dtype="S1")
+      strings = self.random_state.choice(
+          characters, size=shape + (self.string_length,)).view(
+              "S{}".format(self.string_length)).reshape(shape)
+      return strings.astype(object)
+    elif dtype == int(tf.bool):
+      return self.random_state.randint(0, 2, size=shape).astype(numpy_dtype)
+    elif numpy_dtype.kind in ["i", "u"]:
+      return self.random_state.randint(
+          0, self.max_int_value, size=shape).astype(numpy_dtype)
+    elif numpy_dtype.kind == "c":
+      return (self.random_state.standard_normal(shape) +
+              1j * self.random_state.standard_normal(shape)).astype(numpy_dtype)
+    else:
+      return self.random_state.standard_normal(shape).astype(numpy_dtype)
+
+  def get_batch(self, input_items, batch_size=1):
+    feed_dict_map = {}
+
+    for item in input_items:
+      shape = ModelUtil.get_shape_with_batch(item[1], batch_size)
+      feed_dict_map[item[1].name] = self.generate_array(item[1].dtype, shape)
+
+    return feed_dict_map
+
+  def get_config(self):
+    return {"input_type": "random", "seed": self.seed}
+
+
+class NumpyInputSource(InputSource):
+  """
+  The input source to cycle through the rows of the memory-mapped .npy or .npz file.
+
+  The .npy file is for the model with one input. The keys of the .npz file
+  are the input names of the signature. The arrays are memory-mapped so only
+  the rows of the current batch are read into memory.
+  """
+
+  def __init__(self, data_path):
+    self.data_path = data_path
+    self.position = 0
+    # The concurrent benchmark gets the batches from multiple threads
+    self.position_lock = threading.Lock()
+
+    # Example: {"features": np.memmap}
+    if data_path.endswith(".npz"):
+      self.array_map = self.load_npz_with_mmap(data_path)
+    else:
+      self.array_map = {None: np.load(data_path, mmap_mode="r")}
+
+    self.row_number = min(len(array) for array in self.array_map.values())
+    if self.row_number == 0:
+      raise ValueError("No rows in the data file: {}".format(data_path))
+
+  @staticmethod
+  def load_npz_with_mmap(data_path):
+    """
+    Memory-map the uncompressed arrays in the .npz file, which np.load does not support.
+    """
+
+    array_map = {}
+
+    with zipfile.ZipFile(data_path) as npz_file:
+      for zip_info in npz_file.infolist():
+        # Example: "features.npy"
+        name = zip_info.filename[:-len(".npy")]
+
+        if zip_info.compress_type != zipfile.ZIP_STORED:
+          logging.warning(
+              "Load the compressed array {} into memory".format(name))
+          array_map[name] = np.load(npz_file.open(zip_info))
+          continue
+
+        with open(data_path, "rb") as f:
+          # Skip the local file header, refer to the ZIP file format specification
+          f.seek(zip_info.header_offset + 26)
+          filename_length, extra_length = np.frombuffer(
+              f.read(4), dtype="<u2")
+          f.seek(zip_info.header_offset + 30 + filename_length + extra_length)
+
+          version = np.lib.format.read_magic(f)
+          if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+          else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+          offset = f.tell()
+
+        array_map[name] = np.memmap(
+            data_path,
+            dtype=dtype,
+            mode="r",
+            offset=offset,
+            shape=shape,
+            order="F" if fortran_order else "C")
+
+    return array_map
+
+  def get_batch(self, input_items, batch_size=1):
+    # Cycle through the rows, example: [98, 99, 0, 1] for 100 rows
+    with self.position_lock:
+      indices = np.arange(self.position,
+                          self.position + batch_size) % self.row_number
+      self.position = (self.position + batch_size) % self.row_number
+
+    # The same array fed to all the inputs would only fail later in TensorFlow
+    if None in self.array_map and len(input_items) > 1:
+      raise ValueError(
+          "The .npy file is for one input but the signature has {}, use the .npz file with the input names as keys: {}".
+          format(len(input_items), self.data_path))
+
+    feed_dict_map = {}
+
+    for item in input_items:
+      if None in self.array_map:
+        array = self.array_map[None]
+      elif item[0] in self.array_map:
+        array = self.array_map[item[0]]
+      else:
+        raise ValueError("The input {} is not in the data file: {}".format(
+            item[0], self.data_path))
+
+      feed_dict_map[item[1].name] = np.asarray(
+          array.take(indices, axis=0),
+          dtype=ModelUtil.get_numpy_dtype(item[1].dtype))
+
+    return feed_dict_map
+
+  def get_config(self):
+    return {"input_type": "numpy", "data_path": self.data_path}
+
+
+class TfrecordInputSource(InputSource):
+  """
+  The input source to stream tf.Example records from the TFRecord file by batch.
+
+  The model with one string input is fed with the serialized records, otherwise
+  the features with the input names are parsed and stacked.
+  """
+
+  def __init__(self, data_path, compression_type=None):
+    self.data_path = data_path
+    self.compression_type = compression_type
+    self.options = self.get_options(compression_type)
+
+    self.record_iterator = None
+    self.record_lock = threading.Lock()
+
+  @staticmethod
+  def get_options(compression_type=None):
+    """
+    Get the TFRecordOptions of the compression type, example: "GZIP".
+    """
+
+    if compression_type == "GZIP":
+      return tf.python_io.TFRecordOptions(
+          tf.python_io.TFRecordCompressionType.GZIP)
+    elif compression_type == "ZLIB":
+      return tf.python_io.TFRecordOptions(
+          tf.python_io.TFRecordCompressionType.ZLIB)
+    else:
+      return None
+
+  def get_next_record(self):
+    """
+    Read the next serialized record and restart from the beginning at the end.
+    """
+
+    for i in range(2):
+      if self.record_iterator is None:
+        self.record_iterator = tf.python_io.tf_record_iterator(
+            self.data_path, options=self.options)
+
+      try:
+        return next(self.record_iterator)
+      except StopIteration:
+        self.record_iterator = None
+
+    raise ValueError("No records in the TFRecord file: {}".format(
+        self.data_path))
+
+  @staticmethod
+  def get_feature_values(feature):
+    """
+    Get the values of the Feature, example: [1.0, 2.0].
+    """
+
+    kind = feature.WhichOneof("kind")
+    if kind == "float_list":
+      return feature.float_list.value
+    elif kind == "int64_list":
+      return feature.int64_list.value
+    elif kind == "bytes_list":
+      return feature.bytes_list.value
+    else:
+      return []
+
+  @staticmethod
+  def parse_records(input_items, records):
+    """
+    Convert the serialized tf.Example records to the feed dict of the batch.
+    """
+
+    input_items = list(input_items)
+    batch_size = len(records)
+
+    # Feed the serialized tf.Example for the models exported with parsing ops
+    if len(input_items) == 1 and input_items[0][1].dtype == int(tf.string):
+      shape = ModelUtil.get_shape_with_batch(input_items[0][1], batch_size)
+      return {
+          input_items[0][1].name:
+          np.array(records, dtype=object).reshape(shape)
+      }
+
+    examples = [tf.train.Example.FromString(record) for record in records]
+
+    feed_dict_map = {}
+
+    for item in input_items:
+      shape = ModelUtil.get_shape_with_batch(item[1], batch_size)
+      numpy_dtype = ModelUtil.get_numpy_dtype(item[1].dtype)
+
+      values = []
+      for example in examples:
+        if item[0] not in example.features.feature:
+          raise ValueError("The input {} is not in the tf.Example".format(
+              item[0]))
+        values.append(
+            TfrecordInputSource.get_feature_values(
+                example.features.feature[item[0]]))
+
+      feed_dict_map[item[1].name] = np.array(
+          values, dtype=numpy_dtype).reshape(shape)
+
+    return feed_dict_map
+
+  def get_batch(self, input_items, batch_size=1):
+    with self.record_lock:
+      records = [self.get_next_record() for i in range(batch_size)]
+
+    return self.parse_records(input_items, records)
+
+  def get_config(self):
+    return {
+        "input_type": "tfrecord",
+        "data_path": self.data_path,
+        "compression_type": self.compression_type
+    }
+
+
+def create_input_source(input_type="constant",
+                        data_path=None,
+                        seed=None,
+                        compression_type=None):
+  """
+  Create the input source with the type, example: "random".
+  """
+
+  if input_type == "constant":
+    return ConstantInputSource()
+  elif input_type == "random":
+    return RandomInputSource(seed)
+  elif input_type == "numpy":
+    return NumpyInputSource(data_path)
+  elif input_type == "tfrecord":
+    return TfrecordInputSource(data_path, compression_type)
+  else:
+    raise ValueError("Unsupported input type: {}".format(input_type))
@@ -0,0 +1,284 @@
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+# The files to fingerprint the model version, the index has the checksum of each variable
+FINGERPRINT_FILENAMES = [
+    "saved_model.pb", "saved_model.pbtxt", "variables/variables.index"
+]
+
+# Use the high resolution clock if possible, Python 2 does not have perf_counter
+timer = getattr(time, "perf_counter", time.time)
+
+
+def is_remote_path(path):
+  """
+  Check if the path is the URI for tf.gfile, example: "gs://bucket/model".
+  """
+
+  return "://" in path
+
+
+def join_path(base_path, name):
+  """
+  Join the path with the slash for both the local path and the URI.
+  """
+
+  return base_path.rstrip("/") + "/" + name
+
+
+class LocalFileSystem(object):
+  """
+  The file system of the local disk with the same methods as GfileFileSystem.
+
+  With the root path, the URI like "fake://bucket/model" is mapped to
+  "<root_path>/bucket/model", which fakes the remote storage for tests.
+  """
+
+  def __init__(self, root_path=None):
+    self.root_path = root_path
+
+  def get_local_path(self, path):
+    if self.root_path is not None and is_remote_path(path):
+      return os.path.join(self.root_path, path.split("://", 1)[1])
+    return path
+
+  def is_directory(self, path):
+    return os.path.isdir(self.get_local_path(path))
+
+  def list_directory(self, path):
+    return os.listdir(self.get_local_path(path))
+
+  def exists(self, path):
+    return os.path.exists(self.get_local_path(path))
+
+  def get_size(self, path):
+    return os.path.getsize(self.get_local_path(path))
+
+  def open(self, path):
+    return open(self.get_local_path(path), "rb")
+
+
+class GfileFileSystem(object):
+  """
+  The file system of tf.gfile which supports the URIs like "gs://", "s3://" and "hdfs://".
+  """
+
+  def __init__(self):
+    import tensorflow as tf
+
+    self.gfile = tf.gfile
+
+  def is_directory(self, path):
+    return self.gfile.IsDirectory(path)
+
+  def list_directory(self, path):
+    # The object storage may return the directories with the trailing slash
+    return [name.rstrip("/") for name in self.gfile.ListDirectory(path)]
+
+  def exists(self, path):
+    return self.gfile.Exists(path)
+
+  def get_size(self, path):
+    return self.gfile.Stat(path).length
+
+  def open(self, path):
+    return self.gfile.GFile(path, "rb")
+
+
+class ModelCache(object):
+  """
+  The local cache of the model versions on the remote storage.
+
+  The cache key is the hash of saved_model.pb and variables.index, which has
+  the checksum of each variable, so only these small files are read again
+  when the cached version is used and the data shards are skipped.
+  """
+
+  def __init__(self,
+               cache_path=None,
+               thread_number=8,
+               file_system=None,
+               chunk_size=8 * 1024 * 1024):
+    """
+    Set the cache directory, example: "~/.cache/tfmodel" by default or $TFMODEL_CACHE_PATH.
+    """
+
+    if cache_path is None:
+      cache_path = os.environ.get(
+          "TFMODEL_CACHE_PATH",
+          os.path.join(os.path.expanduser("~"), ".cache", "tfmodel"))
+    self.cache_path = cache_path
+
+    if thread_number < 1:
+      raise ValueError("Invalid thread number: {}".format(thread_number))
+    self.thread_number = thread_number
+
+    if file_system is None:
+      file_system = GfileFileSystem()
+    self.file_system = file_system
+
+    # The bytes of each read from the remote file
+    self.chunk_size = chunk_size
+
+  def list_files(self, model_version_uri, relative_path=""):
+    """
+    List the files of the model version recursively, example: [("variables/variables.index", 671)].
+    """
+
+    file_records = []
+    directory_uri = model_version_uri
+    if relative_path:
+      directory_uri = join_path(model_version_uri, relative_path)
+
+    for name in sorted(self.file_system.list_directory(directory_uri)):
+      relative_name = name
+      if relative_path:
+        relative_name = relative_path + "/" + name
+
+      uri = join_path(model_version_uri, relative_name)
+      if self.file_system.is_directory(uri):
+        file_records.extend(self.list_files(model_version_uri, relative_name))
+      else:
+        file_records.append((relative_name, self.file_system.get_size(uri)))
+
+    return file_records
+
+  def read_file(self, uri):
+    with self.file_system.open(uri) as f:
+      return f.read()
+
+  def copy_file(self, uri, local_path, expected_size):
+    """
+    Copy the remote file by chunks and check the size.
+    """
+
+    local_directory = os.path.dirname(local_path)
+    if not os.path.isdir(local_directory):
+      try:
+        os.makedirs(local_directory)
+      except OSError:
+        # The other thread may create the same directory
+        if not os.path.isdir(local_directory):
+          raise
+
+    copied_size = 0
+    with self.file_system.open(uri) as source_file:
+      with open(local_path, "wb") as target_file:
+        while True:
+          chunk = source_file.read(self.chunk_size)
+          if not chunk:
+            break
+          target_file.write(chunk)
+          copied_size += len(chunk)
+
+    if copied_size != expected_size:
+      raise IOError("Copy {} bytes of {} which has {} bytes".format(
+          copied_size, uri, expected_size))
+
+    return copied_size
+
+  def get_cache_key(self, model_version, file_records, fingerprint_map):
+    """
+    Get the hash of the fingerprint files and the sizes of the other files.
+    """
+
+    # The same files in two versions are cached separately to keep the version names
+    sha256 = hashlib.sha256(model_version.encode("utf-8"))
+
+    for relative_path, size in file_records:
+      sha256.update("{}:{}\n".format(relative_path, size).encode("utf-8"))
+      if relative_path in fingerprint_map:
+        sha256.update(fingerprint_map[relative_path])
+
+    return sha256.hexdigest()
+
+  def stage(self, model_version_uri):
+    """
+    Prefetch the model version to the cache in parallel and return the local path.
+
+    Example: "gs://bucket/model/1" -> "~/.cache/tfmodel/<hash>/1". The version
+    directory name is kept for the reports and the TF Serving layout.
+    """
+
+    start_time = timer()
+    model_version = model_version_uri.rstrip("/").split("/")[-1]
+
+    file_records = self.list_files(model_version_uri)
+    if not file_records:
+      raise IOError("The model version has no files: {}".format(
+          model_version_uri))
+
+    # Example: {"saved_model.pb": b"..."}
+    fingerprint_map = {}
+    for relative_path, size in file_records:
+      if relative_path in FINGERPRINT_FILENAMES:
+        fingerprint_map[relative_path] = self.read_file(
+            join_path(model_version_uri, relative_path))
+
+    cache_key = self.get_cache_key(model_version, file_records,
+                                   fingerprint_map)
+    cache_key_path = os.path.join(self.cache_path, cache_key)
+    local_model_version_path = os.path.join(cache_key_path, model_version)
+
+    if os.path.isdir(local_model_version_path):
+      logging.info("Use the cached model version: {} -> {}".format(
+          model_version_uri, local_model_version_path))
+      return local_model_version_path
+
+    # Write to the temporary directory and rename it when all the files are copied
+    staging_path = "{}.tmp-{}-{}".format(cache_key_path, os.getpid(),
+                                         threading.current_thread().ident)
+    staging_model_version_path = os.path.join(staging_path, model_version)
+    os.makedirs(staging_model_version_path)
+
+    try:
+      for relative_path, buffer in fingerprint_map.items():
+        local_path = os.path.join(staging_model_version_path, relative_path)
+        if not os.path.isdir(os.path.dirname(local_path)):
+          os.makedirs(os.path.dirname(local_path))
+        with open(local_path, "wb") as f:
+          f.write(buffer)
+
+      # Copy the largest files first, which are usually the variables.data shards
+      copy_records = sorted(
+          [record for record in file_records if record[0] not in fingerprint_map],
+          key=lambda record: record[1],
+          reverse=True)
+
+      pool = ThreadPool(min(self.thread_number, max(len(copy_records), 1)))
+      try:
+        copied_sizes = pool.map(
+            lambda record: self.copy_file(
+                join_path(model_version_uri, record[0]),
+                os.path.join(staging_model_version_path, record[0]), record[1]),
+            copy_records)
+      finally:
+        pool.close()
+        pool.join()
+
+      try:
+        os.rename(staging_path, cache_key_path)
+      except OSError:
+        # The other process has cached the same model version
+        if not os.path.isdir(local_model_version_path):
+          raise
+        shutil.rmtree(staging_path, ignore_errors=True)
+
+    except Exception:
+      shutil.rmtree(staging_path, ignore_errors=True)
+      raise
+
+    elapsed_time = timer() - start_time
+    copied_bytes = sum(copied_sizes)
+    logging.info(
+        "Prefetch {} files of {} MB in {}s with {} threads: {} -> {}".format(
+            len(copy_records), round(copied_bytes / 1024.0 / 1024.0, 2),
+            round(elapsed_time, 3), self.thread_number, model_version_uri,
+            local_model_version_path))
+
+    return local_model_version_path
@@ -0,0 +1,559 @@
+import collections
+import json
+import logging
+import threading
+import time
+import numpy as np
+from prettytable import PrettyTable
+
+try:
+  import queue
+  import http.client as httplib
+  from http.server import BaseHTTPRequestHandler, HTTPServer
+  from socketserver import ThreadingMixIn
+except ImportError:
+  import Queue as queue
+  import httplib
+  from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+  from SocketServer import ThreadingMixIn
+
+try:
+  from urllib.parse import urlparse
+except ImportError:
+  from urlparse import urlparse
+
+from tfmodel.benchmark_engine import BenchmarkEngine, timer
+from tfmodel.utils import ModelUtil
+
+
+class BatchRequest(object):
+  """
+  The request waiting in the queue, it is done when the outputs or the error is set.
+  """
+
+  def __init__(self, feed_dict_map, row_number):
+    # Example: {"Placeholder:0": np.ndarray}
+    self.feed_dict_map = feed_dict_map
+    self.row_number = row_number
+    self.enqueue_time = timer()
+
+    self.outputs = None
+    self.error = None
+    self.done_event = threading.Event()
+
+
+class DynamicBatcher(object):
+  """
+  The batcher to merge the concurrent requests into one session run like TF Serving.
+  """
+
+  def __init__(self,
+               run_function,
+               max_batch_size=32,
+               batch_timeout=0.001,
+               batch_thread_number=1,
+               max_queue_size=1000):
+    """
+    Each batch thread takes the first request, then waits up to batch_timeout
+    seconds for more requests until the batch has max_batch_size rows.
+    """
+
+    # The function to run the merged feed dict and return the output list
+    self.run_function = run_function
+    self.max_batch_size = max_batch_size
+    self.batch_timeout = batch_timeout
+    self.batch_thread_number = batch_thread_number
+
+    self.request_queue = queue.Queue(max_queue_size)
+    self.is_running = False
+    self.batch_threads = []
+
+    # Example: {8: 120}, the number of batches with each batch size
+    self.batch_size_counter = collections.Counter()
+    self.queueing_delays = []
+    self.stats_lock = threading.Lock()
+
+  def start(self):
+    self.is_running = True
+
+    for i in range(self.batch_thread_number):
+      thread = threading.Thread(target=self.run_batch_loop)
+      thread.daemon = True
+      thread.start()
+      self.batch_threads.append(thread)
+
+  def stop(self):
+    self.is_running = False
+
+    for thread in self.batch_threads:
+      thread.join()
+    self.batch_threads = []
+
+  def submit(self, feed_dict_map, row_number):
+    """
+    Put the request into the queue and wait for the outputs of its rows.
+    """
+
+    if not self.is_running:
+      raise RuntimeError("The batcher is not running")
+
+    batch_request = BatchRequest(feed_dict_map, row_number)
+    # Fail fast instead of blocking when the server is overloaded
+    self.request_queue.put_nowait(batch_request)
+
+    batch_request.done_event.wait()
+    if batch_request.error is not None:
+      raise batch_request.error
+
+    return batch_request.outputs
+
+  def get_batch_requests(self):
+    """
+    Get the requests of the next batch, or an empty list if no request.
+    """
+
+    try:
+      batch_requests = [self.request_queue.get(timeout=0.1)]
+    except queue.Empty:
+      return []
+
+    row_number = batch_requests[0].row_number
+    deadline = timer() + self.batch_timeout
+
+    while row_number < self.max_batch_size:
+      remaining_time = deadline - timer()
+      if remaining_time <= 0:
+        break
+
+      try:
+        batch_request = self.request_queue.get(timeout=remaining_time)
+      except queue.Empty:
+        break
+
+      batch_requests.append(batch_request)
+      row_number += batch_request.row_number
+
+    return batch_requests
+
+  def run_batch_loop(self):
+    while self.is_running:
+      batch_requests = self.get_batch_requests()
+      if batch_requests:
+        self.run_batch(batch_requests)
+
+  @staticmethod
+  def get_shape_key(batch_request):
+    """
+    Get the input names and shapes without the batch dimension, example: (("Placeholder:0", (9,)),).
+    """
+
+    return tuple(
+        sorted((tensor_name, np.shape(value)[1:])
+               for tensor_name, value in batch_request.feed_dict_map.items()))
+
+  def run_batch(self, batch_requests):
+    """
+    Run the requests with the same input shapes together, the others can not be concatenated.
+    """
+
+    # Example: {(("Placeholder:0", (9,)),): [BatchRequest]}
+    request_group_map = collections.OrderedDict()
+    for request in batch_requests:
+      request_group_map.setdefault(self.get_shape_key(request),
+                                   []).append(request)
+
+    for requests in request_group_map.values():
+      self.run_merged_requests(requests)
+
+  def run_merged_requests(self, batch_requests):
+    """
+    Run the merged requests and split the outputs by the rows of each request.
+    """
+
+    batch_start_time = timer()
+    row_number = sum(request.row_number for request in batch_requests)
+
+    try:
+      feed_dict_map = {}
+      for tensor_name in batch_requests[0].feed_dict_map.keys():
+        feed_dict_map[tensor_name] = np.concatenate(
+            [request.feed_dict_map[tensor_name] for request in batch_requests])
+
+      outputs = self.run_function(feed_dict_map)
+
+      start_row = 0
+      for request in batch_requests:
+        end_row = start_row + request.row_number
+        # The outputs without the batch dimension are shared by all requests
+        request.outputs = [
+            output[start_row:end_row]
+            if np.ndim(output) > 0 and len(output) == row_number else output
+            for output in outputs
+        ]
+        start_row = end_row
+
+    except Exception as e:
+      for request in batch_requests:
+        request.error = e
+
+    with self.stats_lock:
+      self.batch_size_counter[row_number] += 1
+      for request in batch_requests:
+        self.queueing_delays.append(batch_start_time - request.enqueue_time)
+
+    for request in batch_requests:
+      request.done_event.set()
+
+  def get_stats(self):
+    """
+    Get the batch size distribution and the queueing delays, example: {"batch_number": 10, ...}.
+    """
+
+    with self.stats_lock:
+      batch_number = sum(self.batch_size_counter.values())
+      row_number = sum(batch_size * count
+                       for batch_size, count in self.batch_size_counter.items())
+
+      stats = {
+          "batch_number": batch_number,
+          "request_number": len(self.queueing_delays),
+          "mean_batch_size": float(row_number) / max(batch_number, 1),
+          # The JSON keys must be strings, example: {"8": 120}
+          "batch_size_counts": dict((str(batch_size), count)
+                                    for batch_size, count in
+                                    self.batch_size_counter.items()),
+          "p50_queueing_delay": None,
+          "p99_queueing_delay": None
+      }
+
+      if self.queueing_delays:
+        stats["p50_queueing_delay"] = float(
+            np.percentile(self.queueing_delays, 50))
+        stats["p99_queueing_delay"] = float(
+            np.percentile(self.queueing_delays, 99))
+
+    return stats
+
+
+class ModelRequestHandler(BaseHTTPRequestHandler):
+  """
+  The handler of the REST API like TF Serving, example: POST /v1/models/default:predict.
+  """
+
+  # Use the persistent connections of the load generator
+  protocol_version = "HTTP/1.1"
+  # Send the small responses without waiting for the delayed ACK
+  disable_nagle_algorithm = True
+
+  def log_message(self, format, *args):
+    logging.debug("{} - {}".format(self.address_string(), format % args))
+
+  def send_json(self, status, body):
+    content = json.dumps(body).encode("utf-8")
+
+    self.send_response(status)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(content)))
+    self.end_headers()
+    self.wfile.write(content)
+
+  def do_GET(self):
+    model_server = self.server.model_server
+
+    if self.path == "/stats":
+      self.send_json(200, model_server.batcher.get_stats())
+    elif self.path.startswith("/v1/models"):
+      self.send_json(200, model_server.get_metadata())
+    else:
+      self.send_json(404, {"error": "Unknown path: {}".format(self.path)})
+
+  def do_POST(self):
+    model_server = self.server.model_server
+
+    content_length = int(self.headers.get("Content-Length", 0))
+    body = self.rfile.read(content_length)
+
+    if not self.path.endswith(":predict"):
+      self.send_json(404, {"error": "Unknown path: {}".format(self.path)})
+      return
+
+    try:
+      request = json.loads(body.decode("utf-8"))
+      self.send_json(200, model_server.predict(request))
+    except queue.Full:
+      self.send_json(503, {"error": "The request queue is full"})
+    except (KeyError, TypeError, ValueError) as e:
+      self.send_json(400, {"error": "{}: {}".format(type(e).__name__, e)})
+    except Exception as e:
+      self.send_json(500, {"error": "{}: {}".format(type(e).__name__, e)})
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+  daemon_threads = True
+
+
+class ModelServer(object):
+  """
+  The local HTTP server of the loaded model with the dynamic batching.
+  """
+
+  def __init__(self,
+               session,
+               model_graph_signature,
+               signature_name,
+               host="localhost",
+               port=8500,
+               max_batch_size=32,
+               batch_timeout=0.001,
+               batch_thread_number=1,
+               max_queue_size=1000):
+    self.session = session
+    self.model_graph_signature = model_graph_signature
+    self.signature_name = signature_name
+    self.host = host
+    self.port = port
+
+    # Example: [("features", TensorInfo)]
+    self.input_items = sorted(model_graph_signature.inputs.items())
+    self.output_items = sorted(model_graph_signature.outputs.items())
+    output_tensor_names = [item[1].name for item in self.output_items]
+
+    self.batcher = DynamicBatcher(
+        lambda feed_dict_map: session.run(output_tensor_names, feed_dict=feed_dict_map),
+        max_batch_size=max_batch_size,
+        batch_timeout=batch_timeout,
+        batch_thread_number=batch_thread_number,
+        max_queue_size=max_queue_size)
+
+    self.http_server = None
+
+  def get_metadata(self):
+    return {
+        "signature_name": self.signature_name,
+        "inputs": [item[0] for item in self.input_items],
+        "outputs": [item[0] for item in self.output_items],
+        "max_batch_size": self.batcher.max_batch_size,
+        "batch_timeout": self.batcher.batch_timeout,
+        "batch_thread_number": self.batcher.batch_thread_number
+    }
+
+  def get_feed_dict(self, request):
+    """
+    Convert the request in the row format {"instances": [...]} or the columnar format {"inputs": {...}}.
+    """
+
+    if "instances" in request:
+      instances = request["instances"]
+      if len(self.input_items) == 1 and not isinstance(instances[0], dict):
+        # The instances are the values of the only input
+        columns = {self.input_items[0][0]: instances}
+      else:
+        columns = dict((item[0], [instance[item[0]] for instance in instances])
+                       for item in self.input_items)
+    else:
+      columns = request["inputs"]
+      if not isinstance(columns, dict):
+        columns = {self.input_items[0][0]: columns}
+
+    feed_dict_map = {}
+    row_number = None
+
+    for name, tensor_info in self.input_items:
+      array = np.asarray(
+          columns[name], dtype=ModelUtil.get_numpy_dtype(tensor_info.dtype))
+      if array.ndim == 0:
+        raise ValueError("The input {} has no batch dimension".format(name))
+
+      if row_number is None:
+        row_number = len(array)
+      elif len(array) != row_number:
+        raise ValueError("The inputs have different rows: {} and {}".format(
+            row_number, len(array)))
+
+      feed_dict_map[tensor_info.name] = array
+
+    return feed_dict_map, row_number
+
+  def predict(self, request):
+    """
+    Run the request with the batcher, example: {"predictions": [{"scores": [0.1, 0.9]}]}.
+    """
+
+    feed_dict_map, row_number = self.get_feed_dict(request)
+    outputs = self.batcher.submit(feed_dict_map, row_number)
+
+    output_map = {}
+    for item, output in zip(self.output_items, outputs):
+      if isinstance(output, np.ndarray) and output.dtype.kind in ["O", "S"]:
+        output = np.vectorize(
+            lambda value: value.decode("utf-8", "replace")
+            if isinstance(value, bytes) else value,
+            otypes=[object])(output)
+      output_map[item[0]] = np.asarray(output).tolist()
+
+    if "instances" in request:
+      # Use the row format like TF Serving, the outputs without batch dimension are repeated
+      predictions = []
+      for row in range(row_number):
+        prediction = {}
+        for name, values in output_map.items():
+          if isinstance(values, list) and len(values) == row_number:
+            prediction[name] = values[row]
+          else:
+            prediction[name] = values
+        predictions.append(prediction)
+      return {"predictions": predictions}
+
+    return {"outputs": output_map}
+
+  def serve(self, duration=None):
+    """
+    Serve until interrupted or for the duration in seconds, then print the batch stats.
+    """
+
+    self.http_server = ThreadingHTTPServer((self.host, self.port),
+                                           ModelRequestHandler)
+    self.http_server.model_server = self
+
+    self.batcher.start()
+
+    server_thread = threading.Thread(target=self.http_server.serve_forever)
+    server_thread.daemon = True
+    server_thread.start()
+
+    logging.info(
+        "Serve the signature {} in http://{}:{}/v1/models/default:predict".
+        format(self.signature_name, self.host, self.port))
+
+    try:
+      if duration is None:
+        while True:
+          time.sleep(1)
+      else:
+        time.sleep(duration)
+    except KeyboardInterrupt:
+      logging.info("Stop the server")
+    finally:
+      self.http_server.shutdown()
+      self.http_server.server_close()
+      self.batcher.stop()
+
+    self.print_stats(self.batcher.get_stats())
+
+  @staticmethod
+  def print_stats(stats):
+    """
+    Print the table of the batch size distribution.
+    """
+
+    table = PrettyTable()
+    table.field_names = ["BatchSize", "Batches", "Percentage"]
+    for batch_size, count in sorted(
+        stats["batch_size_counts"].items(), key=lambda item: int(item[0])):
+      table.add_row([
+          int(batch_size), count,
+          "{:.2%}".format(float(count) / max(stats["batch_number"], 1))
+      ])
+    print(table)
+
+    logging.info(
+        "Run {} batches of {} requests, mean batch size: {}, p99 queueing delay: {}s".
+        format(stats["batch_number"], stats["request_number"],
+               round(stats["mean_batch_size"], 2), stats["p99_queueing_delay"]))
+
+
+class LoadGenerator(object):
+  """
+  The client to send the predict requests to the model server concurrently.
+  """
+
+  def __init__(self, url, request_body):
+    """
+    Send the same JSON body, example: {"instances": [{"features": [1.0, 1.0]}]}.
+    """
+
+    # Example: "http://localhost:8500"
+    parsed_url = urlparse(url)
+    self.host = parsed_url.hostname
+    self.port = parsed_url.port or 80
+    self.predict_path = "/v1/models/default:predict"
+
+    self.request_content = json.dumps(request_body).encode("utf-8")
+
+    # Reuse one connection in each worker thread
+    self.thread_local = threading.local()
+
+    self.error_number = 0
+    self.error_lock = threading.Lock()
+
+  @staticmethod
+  def construct_request_body(input_items, feed_dict_map):
+    """
+    Convert the feed dict to the columnar request, example: {"inputs": {"features": [[1.0, 1.0]]}}.
+    """
+
+    inputs = {}
+    for name, tensor_info in input_items:
+      array = np.asarray(feed_dict_map[tensor_info.name])
+      if array.dtype.kind in ["O", "S"]:
+        array = np.vectorize(
+            lambda value: value.decode("utf-8", "replace")
+            if isinstance(value, bytes) else value,
+            otypes=[object])(array)
+      inputs[name] = array.tolist()
+
+    return {"inputs": inputs}
+
+  def request(self, method, path, content=None):
+    if getattr(self.thread_local, "connection", None) is None:
+      self.thread_local.connection = httplib.HTTPConnection(
+          self.host, self.port)
+    connection = self.thread_local.connection
+
+    headers = {"Content-Type": "application/json"}
+    try:
+      connection.request(method, path, content, headers)
+      response = connection.getresponse()
+      response_content = response.read()
+    except Exception:
+      # Reconnect in the next request
+      connection.close()
+      self.thread_local.connection = None
+      raise
+
+    if response.status != 200:
+      raise RuntimeError("Get the response {}: {}".format(
+          response.status, response_content[:200]))
+
+    return json.loads(response_content.decode("utf-8"))
+
+  def send_predict_request(self):
+    try:
+      return self.request("POST", self.predict_path, self.request_content)
+    except Exception as e:
+      # Count the failed requests and raise so the latency is not recorded
+      with self.error_lock:
+        self.error_number += 1
+      logging.debug("Fail to send the request: {}".format(e))
+      raise
+
+  def get_server_stats(self):
+    return self.request("GET", "/stats")
+
+  def run(self, benchmark_engine, batch_size=1, concurrency=1,
+          target_qps=None):
+    """
+    Send the requests with the benchmark engine and return the ConcurrentBenchmarkResult.
+    """
+
+    benchmark_result = benchmark_engine.run_concurrent(
+        self.send_predict_request, batch_size, concurrency, target_qps)
+
+    BenchmarkEngine.print_concurrent_results([benchmark_result])
+
+    if self.error_number > 0:
+      logging.error("Fail {} requests of {}".format(
+          self.error_number, benchmark_result.iterations +
+          benchmark_engine.warmup_iterations + self.error_number))
+
+    return benchmark_result
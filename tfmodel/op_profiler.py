@@ -0,0 +1,232 @@
+import logging
+from prettytable import PrettyTable
+from tensorflow.python.client import timeline
+
+
+class OpProfiler(object):
+  """
+  The profiler to aggregate the per-op time and memory from RunMetadata.
+  """
+
+  def __init__(self, graph):
+    self.graph = graph
+    self.run_number = 0
+
+    # Example: {"MatMul": {"op_type": "MatMul", "count": 10, "compute_micros": 1200, "memory_bytes": 4096}}
+    self.op_stats_map = {}
+
+    # Keep the last RunMetadata to generate the Chrome trace
+    self.last_run_metadata = None
+
+  def get_op_type(self, node_name):
+    """
+    Get the op type of the node, example: "MatMul:MatMul" -> "MatMul".
+    """
+
+    # The node name may have the suffix like "MatMul:MatMul" in the step stats
+    op_name = node_name.split(":")[0]
+    try:
+      return self.graph.get_operation_by_name(op_name).type
+    except (KeyError, ValueError):
+      # The internal nodes like "_SOURCE" are not in the graph
+      return op_name
+
+  @staticmethod
+  def get_device_stats_list(run_metadata):
+    """
+    Get the stats of the plain devices, example: "/job:localhost/replica:0/task:0/device:GPU:0".
+
+    The GPU ops are traced again in the "/device:GPU:0/stream:*" and the
+    "/device:GPU:0/memcpy" entries, which are only kept if the plain entry of
+    the same device is missing.
+    """
+
+    def get_device_name(device):
+      # Example: "/device:GPU:0/stream:all" -> "device:GPU:0"
+      for part in device.split("/"):
+        if part.startswith("device:"):
+          return part
+      return device
+
+    def is_plain_device(device):
+      return "/stream:" not in device and not device.endswith("/memcpy")
+
+    dev_stats = run_metadata.step_stats.dev_stats
+    plain_device_names = set(
+        get_device_name(device_stats.device)
+        for device_stats in dev_stats
+        if is_plain_device(device_stats.device))
+
+    return [
+        device_stats for device_stats in dev_stats
+        if is_plain_device(device_stats.device) or
+        get_device_name(device_stats.device) not in plain_device_names
+    ]
+
+  def add_run_metadata(self, run_metadata):
+    """
+    Aggregate the node stats of all devices in the RunMetadata.
+    """
+
+    self.run_number += 1
+    self.last_run_metadata = run_metadata
+
+    for device_stats in self.get_device_stats_list(run_metadata):
+      for node_stats in device_stats.node_stats:
+        op_name = node_stats.node_name.split(":")[0]
+
+        if op_name not in self.op_stats_map:
+          self.op_stats_map[op_name] = {
+              "op_type": self.get_op_type(op_name),
+              "device": device_stats.device,
+              "count": 0,
+              "compute_micros": 0,
+              "memory_bytes": 0
+          }
+        op_stats = self.op_stats_map[op_name]
+
+        op_stats["count"] += 1
+        op_stats["compute_micros"] += (
+            node_stats.op_end_rel_micros - node_stats.op_start_rel_micros)
+
+        # The total bytes allocated by the op in each allocator
+        for memory in node_stats.memory:
+          op_stats["memory_bytes"] += memory.total_bytes
+
+  @staticmethod
+  def get_allocator_peak_bytes(run_metadata):
+    """
+    Get the peak bytes in use of each allocator, example: {"cpu": 4096}.
+
+    The allocator_bytes_in_use is only recorded by the newer TensorFlow, fall
+    back to the largest peak of the single op otherwise.
+    """
+
+    allocator_peak_bytes_map = {}
+
+    for device_stats in run_metadata.step_stats.dev_stats:
+      for node_stats in device_stats.node_stats:
+        for memory in node_stats.memory:
+          peak_bytes = max(
+              getattr(memory, "allocator_bytes_in_use", 0), memory.peak_bytes)
+          allocator_peak_bytes_map[memory.allocator_name] = max(
+              allocator_peak_bytes_map.get(memory.allocator_name, 0),
+              peak_bytes)
+
+    return allocator_peak_bytes_map
+
+  def get_op_type_stats_map(self):
+    """
+    Get the stats aggregated by op type, example: {"MatMul": {"count": 20, ...}}.
+    """
+
+    op_type_stats_map = {}
+
+    for op_stats in self.op_stats_map.values():
+      op_type = op_stats["op_type"]
+      if op_type not in op_type_stats_map:
+        op_type_stats_map[op_type] = {
+            "op_number": 0,
+            "count": 0,
+            "compute_micros": 0,
+            "memory_bytes": 0
+        }
+      op_type_stats = op_type_stats_map[op_type]
+
+      op_type_stats["op_number"] += 1
+      op_type_stats["count"] += op_stats["count"]
+      op_type_stats["compute_micros"] += op_stats["compute_micros"]
+      op_type_stats["memory_bytes"] += op_stats["memory_bytes"]
+
+    return op_type_stats_map
+
+  def get_op_records(self):
+    """
+    Get the average compute time and memory of each op per run.
+    """
+
+    op_records = []
+
+    for op_name, op_stats in self.op_stats_map.items():
+      op_records.append({
+          "op_name": op_name,
+          "op_type": op_stats["op_type"],
+          "device": op_stats["device"],
+          "compute_micros": float(op_stats["compute_micros"]) / self.run_number,
+          "memory_bytes": op_stats["memory_bytes"] // self.run_number
+      })
+
+    return op_records
+
+  def print_hot_ops(self, top_number=20):
+    """
+    Print the tables of the hottest ops and op types by the compute time.
+    """
+
+    if self.run_number == 0:
+      logging.warning("No RunMetadata to print")
+      return
+
+    total_compute_micros = sum(
+        op_stats["compute_micros"] for op_stats in self.op_stats_map.values())
+    total_compute_micros = max(total_compute_micros, 1)
+
+    # The average compute time and memory of each run
+    table = PrettyTable()
+    table.field_names = [
+        "OpName", "OpType", "Device", "AvgTime(us)", "Percentage",
+        "AvgMemory(bytes)"
+    ]
+
+    for op_name, op_stats in sorted(
+        self.op_stats_map.items(),
+        key=lambda item: item[1]["compute_micros"],
+        reverse=True)[:top_number]:
+      table.add_row([
+          op_name, op_stats["op_type"], op_stats["device"],
+          round(float(op_stats["compute_micros"]) / self.run_number, 2),
+          "{:.2%}".format(
+              float(op_stats["compute_micros"]) / total_compute_micros),
+          op_stats["memory_bytes"] // self.run_number
+      ])
+
+    print(table)
+
+    table = PrettyTable()
+    table.field_names = [
+        "OpType", "OpNumber", "AvgTime(us)", "Percentage", "AvgMemory(bytes)"
+    ]
+
+    for op_type, op_type_stats in sorted(
+        self.get_op_type_stats_map().items(),
+        key=lambda item: item[1]["compute_micros"],
+        reverse=True)[:top_number]:
+      table.add_row([
+          op_type, op_type_stats["op_number"],
+          round(float(op_type_stats["compute_micros"]) / self.run_number, 2),
+          "{:.2%}".format(
+              float(op_type_stats["compute_micros"]) / total_compute_micros),
+          op_type_stats["memory_bytes"] // self.run_number
+      ])
+
+    print(table)
+
+  def export_chrome_trace(self, chrome_trace_path):
+    """
+    Write the last RunMetadata as the Chrome trace JSON for chrome://tracing.
+    """
+
+    if self.last_run_metadata is None:
+      logging.warning(
+          "No traced run to export the Chrome trace: {}".format(
+              chrome_trace_path))
+      return
+
+    chrome_trace = timeline.Timeline(
+        self.last_run_metadata.step_stats).generate_chrome_trace_format(
+            show_memory=True)
+
+    with open(chrome_trace_path, "w") as f:
+      f.write(chrome_trace)
+
+    logging.info("Write the Chrome trace file: {}".format(chrome_trace_path))
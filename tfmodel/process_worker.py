@@ -0,0 +1,86 @@
+import importlib
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import traceback
+
+
+def run_in_process(function_name, kwargs, quiet=False):
+  """
+  Run the function in a fresh Python process and return its result, example: "tfmodel.coldstart_benchmark.run_coldstart_worker".
+
+  TensorFlow creates the thread pools and the allocators once per process,
+  so the settings which only take effect in a new runtime are measured in
+  the child process. The arguments and the result are passed by pickle.
+  The quiet child has its output dropped, otherwise its tables and logs are
+  shown with the ones of this process.
+  """
+
+  worker_path = tempfile.mkdtemp(prefix="tfmodel_worker_")
+  args_path = os.path.join(worker_path, "args.pkl")
+  result_path = os.path.join(worker_path, "result.pkl")
+
+  try:
+    with open(args_path, "wb") as f:
+      pickle.dump((function_name, kwargs), f, protocol=2)
+
+    # Make sure the child process imports the same tfmodel package
+    env = dict(os.environ)
+    package_parent_path = os.path.dirname(
+        os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(
+        [package_parent_path] +
+        [path for path in [env.get("PYTHONPATH")] if path])
+
+    output = subprocess.PIPE if quiet else None
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "tfmodel.process_worker", args_path,
+            result_path
+        ],
+        stdout=output,
+        stderr=output,
+        env=env)
+    _, stderr = process.communicate()
+
+    if not os.path.exists(result_path):
+      last_lines = []
+      if stderr:
+        last_lines = stderr.decode("utf-8", "replace").strip().splitlines()[-1:]
+      raise RuntimeError("The worker process exits with code {}: {}".format(
+          process.returncode, last_lines))
+
+    with open(result_path, "rb") as f:
+      is_succeeded, result = pickle.load(f)
+
+    if not is_succeeded:
+      raise RuntimeError("The worker process fails with error: {}".format(
+          result))
+    return result
+
+  finally:
+    shutil.rmtree(worker_path, ignore_errors=True)
+
+
+def run_worker(args_path, result_path):
+  with open(args_path, "rb") as f:
+    function_name, kwargs = pickle.load(f)
+
+  module_name, attribute_name = function_name.rsplit(".", 1)
+
+  try:
+    function = getattr(importlib.import_module(module_name), attribute_name)
+    result = (True, function(**kwargs))
+  except Exception:
+    result = (False, traceback.format_exc().strip().splitlines()[-1])
+
+  with open(result_path, "wb") as f:
+    pickle.dump(result, f, protocol=2)
+
+
+if __name__ == "__main__":
+  # Example: python -m tfmodel.process_worker /tmp/args.pkl /tmp/result.pkl
+  run_worker(sys.argv[1], sys.argv[2])
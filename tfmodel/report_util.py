@@ -0,0 +1,349 @@
+import csv
+import json
+import logging
+import math
+import multiprocessing
+import pkg_resources
+import platform
+import socket
+import sys
+import time
+from prettytable import PrettyTable
+
+# The fields to compare the matched records, the t-test needs the stddev and the iterations
+COMPARED_FIELDS = ["mean_latency", "stddev_latency", "iterations", "throughput"]
+
+# The fields to match the records of two reports, example: ("serving_default", 1)
+RECORD_KEY_FIELDS = [
+    "signature_name", "config_name", "variant", "batch_size", "concurrency",
+    "target_qps", "op_name"
+]
+
+
+class ReportUtil(object):
+  """
+  The utils class to write, read and compare the structured reports.
+  """
+
+  @staticmethod
+  def get_cpu_name():
+    """
+    Get the CPU model name, example: "Intel(R) Xeon(R) CPU E5-2682 v4 @ 2.50GHz".
+    """
+
+    try:
+      with open("/proc/cpuinfo") as f:
+        for line in f:
+          if line.startswith("model name"):
+            return line.split(":", 1)[1].strip()
+    except (IOError, OSError):
+      pass
+
+    return platform.processor()
+
+  @staticmethod
+  def get_environment_info():
+    """
+    Get the host and software information of the report.
+    """
+
+    # Avoid importing TensorFlow for the subcommands which do not run the graph
+    if "tensorflow" in sys.modules:
+      tensorflow_version = sys.modules["tensorflow"].__version__
+    else:
+      try:
+        tensorflow_version = pkg_resources.get_distribution(
+            "tensorflow").version
+      except pkg_resources.DistributionNotFound:
+        tensorflow_version = None
+
+    return {
+        "hostname": socket.gethostname(),
+        "platform": platform.platform(),
+        "cpu_name": ReportUtil.get_cpu_name(),
+        "cpu_count": multiprocessing.cpu_count(),
+        "python_version": platform.python_version(),
+        "tensorflow_version": tensorflow_version
+    }
+
+  @staticmethod
+  def construct_report(command, model_path, records, config=None,
+                       model_version=None):
+    """
+    Construct the report with the metadata and the metric records.
+    """
+
+    return {
+        "command": command,
+        "model_path": model_path,
+        "model_version": model_version,
+        "timestamp": time.time(),
+        "environment": ReportUtil.get_environment_info(),
+        "config": config or {},
+        "records": records
+    }
+
+  @staticmethod
+  def write_report(report, output_path, output_format=None):
+    """
+    Write the report as JSON or CSV, infer the format from the file extension.
+    """
+
+    if output_format is None:
+      if output_path.endswith(".csv"):
+        output_format = "csv"
+      else:
+        output_format = "json"
+
+    if output_format == "json":
+      with open(output_path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True, default=str)
+
+    elif output_format == "csv":
+      # Flatten the metadata into the columns of each record
+      metadata = {
+          "command": report["command"],
+          "model_path": report["model_path"],
+          "model_version": report["model_version"],
+          "timestamp": report["timestamp"]
+      }
+      metadata.update(report["environment"])
+      for key, value in report["config"].items():
+        metadata["config_" + key] = value
+
+      rows = []
+      for record in report["records"]:
+        row = dict(metadata)
+        row.update(record)
+        rows.append(row)
+
+      field_names = sorted(set(key for row in rows for key in row.keys()))
+
+      with open(output_path, "w") as f:
+        writer = csv.DictWriter(f, fieldnames=field_names)
+        writer.writeheader()
+        for row in rows:
+          writer.writerow(row)
+
+    else:
+      raise ValueError("Unsupported output format: {}".format(output_format))
+
+    logging.info("Write the {} report: {}".format(output_format, output_path))
+
+  @staticmethod
+  def read_records(report_path):
+    """
+    Read the metric records from the JSON or CSV report.
+    """
+
+    if report_path.endswith(".csv"):
+      records = []
+      with open(report_path) as f:
+        for row in csv.DictReader(f):
+          record = {}
+          for key, value in row.items():
+            # Convert the numeric cells back
+            try:
+              record[key] = float(value)
+            except (TypeError, ValueError):
+              record[key] = value
+          records.append(record)
+      return records
+
+    with open(report_path) as f:
+      return json.load(f)["records"]
+
+  @staticmethod
+  def get_record_key(record):
+    """
+    Get the key to match the records, example: ("serving_default", None, None, 1.0, None, None, None).
+    """
+
+    key = []
+    for field in RECORD_KEY_FIELDS:
+      value = record.get(field)
+      # The CSV cells are strings or floats
+      if value == "":
+        value = None
+      elif isinstance(value, int) and not isinstance(value, bool):
+        value = float(value)
+      key.append(value)
+    return tuple(key)
+
+  @staticmethod
+  def incomplete_beta(a, b, x):
+    """
+    Compute the regularized incomplete beta function with the continued fraction.
+    """
+
+    if x <= 0:
+      return 0.0
+    if x >= 1:
+      return 1.0
+
+    # Use the symmetry relation for the faster convergence
+    if x > float(a + 1) / (a + b + 2):
+      return 1.0 - ReportUtil.incomplete_beta(b, a, 1 - x)
+
+    log_beta = math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+    front = math.exp(log_beta + a * math.log(x) + b * math.log(1 - x))
+
+    # Lentz's algorithm, refer to Numerical Recipes 6.4
+    tiny = 1e-30
+    c = 1.0
+    d = 1.0 - (a + b) * x / (a + 1)
+    if abs(d) < tiny:
+      d = tiny
+    d = 1.0 / d
+    result = d
+
+    for m in range(1, 200):
+      for numerator in [
+          m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))
+      ]:
+        d = 1.0 + numerator * d
+        if abs(d) < tiny:
+          d = tiny
+        c = 1.0 + numerator / c
+        if abs(c) < tiny:
+          c = tiny
+        d = 1.0 / d
+        delta = c * d
+        result *= delta
+
+      if abs(delta - 1.0) < 1e-10:
+        break
+
+    return front * result / a
+
+  @staticmethod
+  def welch_t_test(mean1, stddev1, number1, mean2, stddev2, number2):
+    """
+    Get the two-sided p-value of Welch's t-test with the summary statistics.
+    """
+
+    if number1 < 2 or number2 < 2:
+      return 1.0
+
+    variance1 = stddev1**2 / (number1 - 1)
+    variance2 = stddev2**2 / (number2 - 1)
+    standard_error = math.sqrt(variance1 + variance2)
+
+    if standard_error == 0:
+      return 0.0 if mean1 != mean2 else 1.0
+
+    t = (mean1 - mean2) / standard_error
+    freedom = (variance1 + variance2)**2 / (
+        variance1**2 / (number1 - 1) + variance2**2 / (number2 - 1))
+
+    return ReportUtil.incomplete_beta(freedom / 2.0, 0.5,
+                                      freedom / (freedom + t * t))
+
+  @staticmethod
+  def linear_trend(values):
+    """
+    Fit the values over their indexes and test if the slope is non-zero.
+
+    Return the slope, the intercept and the two-sided p-value of the t-test
+    of the slope, the p-value is 1.0 with less than 3 values.
+    """
+
+    number = len(values)
+    if number < 3:
+      return 0.0, float(values[0]) if values else 0.0, 1.0
+
+    mean_x = (number - 1) / 2.0
+    mean_y = float(sum(values)) / number
+
+    sum_xx = sum((x - mean_x)**2 for x in range(number))
+    sum_xy = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values))
+    slope = sum_xy / sum_xx
+    intercept = mean_y - slope * mean_x
+
+    residual_sum = sum((y - intercept - slope * x)**2
+                       for x, y in enumerate(values))
+    freedom = number - 2
+    standard_error = math.sqrt(residual_sum / freedom / sum_xx)
+
+    if standard_error == 0:
+      return slope, intercept, 0.0 if slope != 0 else 1.0
+
+    t = slope / standard_error
+    p_value = ReportUtil.incomplete_beta(freedom / 2.0, 0.5,
+                                         freedom / (freedom + t * t))
+
+    return slope, intercept, p_value
+
+  @staticmethod
+  def compare_reports(baseline_path, candidate_path, threshold=0.05,
+                      alpha=0.05):
+    """
+    Compare the records of two reports and return the regressed records.
+
+    The record regresses if the mean latency increases or the throughput
+    drops more than the threshold, and Welch's t-test of the latencies is
+    significant at the alpha level.
+    """
+
+    baseline_record_map = dict(
+        (ReportUtil.get_record_key(record), record)
+        for record in ReportUtil.read_records(baseline_path))
+    candidate_records = ReportUtil.read_records(candidate_path)
+
+    table = PrettyTable()
+    table.field_names = [
+        "Signature", "BatchSize", "Config", "MeanLatencyDelta",
+        "ThroughputDelta", "PValue", "Regression"
+    ]
+
+    regressed_records = []
+
+    for candidate_record in candidate_records:
+      baseline_record = baseline_record_map.get(
+          ReportUtil.get_record_key(candidate_record))
+      if baseline_record is None:
+        continue
+
+      # The records from the old reports or the other subcommands may lack the stats
+      missing_fields = [
+          field for field in COMPARED_FIELDS
+          if candidate_record.get(field) in [None, ""] or
+          baseline_record.get(field) in [None, ""]
+      ]
+      if missing_fields:
+        logging.warning("Skip the record {} without the fields: {}".format(
+            ReportUtil.get_record_key(candidate_record), missing_fields))
+        continue
+      # The deltas are relative to the baseline
+      if not baseline_record["mean_latency"] or not baseline_record[
+          "throughput"]:
+        continue
+
+      latency_delta = (candidate_record["mean_latency"] -
+                       baseline_record["mean_latency"]
+                      ) / baseline_record["mean_latency"]
+      throughput_delta = (candidate_record["throughput"] -
+                          baseline_record["throughput"]
+                         ) / baseline_record["throughput"]
+      p_value = ReportUtil.welch_t_test(
+          candidate_record["mean_latency"], candidate_record["stddev_latency"],
+          candidate_record["iterations"], baseline_record["mean_latency"],
+          baseline_record["stddev_latency"], baseline_record["iterations"])
+
+      is_regressed = p_value < alpha and (latency_delta > threshold or
+                                          -throughput_delta > threshold)
+      if is_regressed:
+        regressed_records.append(candidate_record)
+
+      table.add_row([
+          candidate_record.get("signature_name"),
+          candidate_record.get("batch_size"),
+          candidate_record.get("config_name", ""),
+          "{:+.2%}".format(latency_delta), "{:+.2%}".format(throughput_delta),
+          round(p_value, 4), is_regressed
+      ])
+
+    print(table)
+
+    return regressed_records
@@ -0,0 +1,290 @@
+import collections
+import logging
+import multiprocessing
+import os
+import resource
+import time
+from prettytable import PrettyTable
+
+from tfmodel.model_cache import is_remote_path
+from tfmodel.savedmodel_reader import SavedmodelReader, SERVING_TAG
+
+# The files which mark the directory as the SavedModel version
+SAVEDMODEL_FILENAMES = ["saved_model.pb", "saved_model.pbtxt"]
+
+
+def validate_model_version(model_version_path, tags, structural=False):
+  """
+  Validate the model version and return the result without raising exceptions.
+  """
+
+  start_time = time.time()
+  errors = []
+  signature_names = []
+
+  try:
+    savedmodel = SavedmodelReader(os.path.dirname(model_version_path), tags)
+
+    # The text format saved_model.pbtxt can only be validated by loading
+    is_binary = os.path.exists(
+        os.path.join(model_version_path, "saved_model.pb"))
+
+    if is_binary:
+      errors = savedmodel.validate_structure(model_version_path)
+      if not errors:
+        signature_names = sorted(
+            savedmodel.read_meta_graph(model_version_path).signature_def.keys())
+
+    if (not structural or not is_binary) and not errors:
+      # Import TensorFlow in the worker process only
+      from tfmodel.savedmodel_analyst import SavedmodelAnalyst
+
+      with SavedmodelAnalyst(os.path.dirname(model_version_path),
+                             tags) as savedmodel_analyst:
+        session, meta_graph = savedmodel_analyst.load_model(
+            model_version_path)
+        signature_names = sorted(meta_graph.signature_def.keys())
+
+  except Exception as e:
+    errors.append("{}: {}".format(type(e).__name__, e))
+
+  return {
+      "model_version_path": model_version_path,
+      "validated": not errors,
+      "errors": errors,
+      "signature_names": signature_names,
+      "elapsed_time": time.time() - start_time
+  }
+
+
+def run_validation_worker(connection, tags, structural, memory_limit):
+  """
+  Receive the model version paths from the connection and send back the results.
+  """
+
+  # Bound the address space so the large model fails instead of the host
+  if memory_limit is not None:
+    resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+  while True:
+    model_version_path = connection.recv()
+    if model_version_path is None:
+      return
+
+    connection.send(
+        validate_model_version(model_version_path, tags, structural))
+
+
+class RepositoryValidator(object):
+  """
+  The validator to check all the SavedModel versions under the root directory.
+  """
+
+  def __init__(self,
+               repository_path,
+               tags=None,
+               structural=False,
+               process_number=None,
+               memory_limit=None,
+               timeout=None,
+               max_tasks_per_worker=None):
+    """
+    Set the worker processes, each one validates one model version at a time.
+
+    The worker is restarted after max_tasks_per_worker versions to release
+    the memory, and the version fails if it takes longer than timeout.
+    """
+
+    # The versions are found by walking the local directories
+    if is_remote_path(repository_path):
+      raise ValueError(
+          "The repository validation only supports the local path, prefetch the versions first: {}".
+          format(repository_path))
+    self.repository_path = repository_path
+
+    if tags is None:
+      tags = [SERVING_TAG]
+    self.tags = tags
+
+    self.structural = structural
+    self.process_number = process_number or multiprocessing.cpu_count()
+    self.memory_limit = memory_limit
+    self.timeout = timeout
+    self.max_tasks_per_worker = max_tasks_per_worker
+
+  def find_model_versions(self):
+    """
+    Find the SavedModel version directories, example: ["./models/mnist/1"].
+    """
+
+    model_version_paths = []
+
+    for dirpath, dirnames, filenames in os.walk(self.repository_path):
+      if any(filename in filenames for filename in SAVEDMODEL_FILENAMES):
+        model_version_paths.append(dirpath)
+        # Do not walk into the variables and assets of the version
+        dirnames[:] = []
+      else:
+        dirnames.sort()
+
+    return model_version_paths
+
+  def start_worker(self):
+    # Spawn the clean worker, forking the TensorFlow threads of the chained subcommands may deadlock
+    if hasattr(multiprocessing, "get_context"):
+      context = multiprocessing.get_context("spawn")
+    else:
+      # Python 2 only forks
+      context = multiprocessing
+
+    parent_connection, child_connection = context.Pipe()
+
+    process = context.Process(
+        target=run_validation_worker,
+        args=(child_connection, self.tags, self.structural,
+              self.memory_limit))
+    process.daemon = True
+    process.start()
+    # Close the child end in the parent so the crashed worker gets EOF instead of hanging
+    child_connection.close()
+
+    # Example: {"process": Process, "connection": Connection, "task": None, "start_time": 0, "task_number": 0}
+    return {
+        "process": process,
+        "connection": parent_connection,
+        "task": None,
+        "start_time": None,
+        "task_number": 0
+    }
+
+  @staticmethod
+  def get_failed_result(worker, error):
+    return {
+        "model_version_path": worker["task"],
+        "validated": False,
+        "errors": [error],
+        "signature_names": [],
+        "elapsed_time": time.time() - worker["start_time"]
+    }
+
+  @staticmethod
+  def stop_worker(worker):
+    try:
+      worker["connection"].send(None)
+    except (IOError, OSError):
+      pass
+
+    worker["process"].join(1)
+    if worker["process"].is_alive():
+      worker["process"].terminate()
+
+  def validate(self):
+    """
+    Validate the versions with the worker processes and yield the results.
+
+    The crashed or timeout worker makes its version fail and is replaced.
+    """
+
+    pending_tasks = collections.deque(self.find_model_versions())
+    logging.info("Find {} model versions in: {}".format(
+        len(pending_tasks), self.repository_path))
+
+    workers = [
+        self.start_worker()
+        for i in range(min(self.process_number, len(pending_tasks)))
+    ]
+
+    try:
+      while workers:
+        for index, worker in enumerate(workers):
+          result = None
+
+          if worker["task"] is None:
+            if not pending_tasks:
+              self.stop_worker(worker)
+              workers[index] = None
+              continue
+
+            worker["task"] = pending_tasks.popleft()
+            worker["start_time"] = time.time()
+            worker["connection"].send(worker["task"])
+
+          elif worker["connection"].poll():
+            try:
+              result = worker["connection"].recv()
+            except EOFError:
+              # The pipe is closed when the worker exits without the result
+              worker["process"].join()
+              result = self.get_failed_result(
+                  worker, "The worker exits with code {}".format(
+                      worker["process"].exitcode))
+
+          elif not worker["process"].is_alive():
+            result = self.get_failed_result(
+                worker, "The worker exits with code {}".format(
+                    worker["process"].exitcode))
+
+          elif self.timeout is not None and \
+              time.time() - worker["start_time"] > self.timeout:
+            worker["process"].terminate()
+            worker["process"].join()
+            result = self.get_failed_result(
+                worker, "Timeout after {}s".format(self.timeout))
+
+          if result is None:
+            continue
+
+          yield result
+
+          worker["task"] = None
+          worker["task_number"] += 1
+
+          if not worker["process"].is_alive():
+            workers[index] = self.start_worker()
+          elif self.max_tasks_per_worker is not None and \
+              worker["task_number"] >= self.max_tasks_per_worker:
+            self.stop_worker(worker)
+            workers[index] = self.start_worker()
+
+        workers = [worker for worker in workers if worker is not None]
+        time.sleep(0.01)
+
+    finally:
+      for worker in workers:
+        if worker is not None:
+          self.stop_worker(worker)
+
+  def validate_and_print(self):
+    """
+    Validate the repository, log each result and print the summary table.
+    """
+
+    results = []
+
+    for result in self.validate():
+      if result["validated"]:
+        logging.info("Validated model: {}, signatures: {}, time: {}s".format(
+            result["model_version_path"], result["signature_names"],
+            round(result["elapsed_time"], 3)))
+      else:
+        logging.error("Invalid model: {}, errors: {}".format(
+            result["model_version_path"], result["errors"]))
+      results.append(result)
+
+    results.sort(key=lambda result: result["model_version_path"])
+
+    table = PrettyTable()
+    table.field_names = ["ModelVersionPath", "Validated", "Time(s)", "Errors"]
+    for result in results:
+      table.add_row([
+          result["model_version_path"], result["validated"],
+          round(result["elapsed_time"], 3), "; ".join(result["errors"])
+      ])
+    print(table)
+
+    validated_number = len(
+        [result for result in results if result["validated"]])
+    logging.info("Validated {} of {} model versions".format(
+        validated_number, len(results)))
+
+    return results
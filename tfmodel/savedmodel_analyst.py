@@ -1,11 +1,49 @@
+import itertools
 import os
 import logging
-import time
+import shutil
+import tempfile
 import numpy as np
 import tensorflow as tf
 from prettytable import PrettyTable
 
-from utils import ModelUtil
+from tfmodel.batch_predictor import BatchPredictor, create_batch_reader, create_prediction_writer
+from tfmodel.benchmark_engine import BenchmarkEngine
+from tfmodel.critical_path_analyzer import CriticalPathAnalyzer
+from tfmodel.graph_estimator import GraphCostEstimator
+from tfmodel.graph_optimizer import GraphOptimizer, QUANTIZATION_TRANSFORMS
+from tfmodel.input_source import ConstantInputSource, create_input_source
+from tfmodel.model_cache import LocalFileSystem, ModelCache, is_remote_path, join_path
+from tfmodel.model_server import ModelServer
+from tfmodel.op_profiler import OpProfiler
+from tfmodel.process_worker import run_in_process
+from tfmodel.report_util import ReportUtil
+from tfmodel.savedmodel_reader import SavedmodelReader
+from tfmodel.utils import MemoryUtil, ModelUtil
+
+# The no-op in the separate graph to measure the framework overhead
+OVERHEAD_OP_NAME = "tfmodel_overhead_no_op"
+
+
+def run_analyst_worker(savedmodel_path,
+                       method_name,
+                       method_kwargs,
+                       tags=None,
+                       session_config_string=None,
+                       input_source_config=None):
+  """
+  Run the method of the analyst in the worker process, refer to SavedmodelAnalyst.run_method_in_process.
+  """
+
+  method_kwargs = dict(method_kwargs)
+  if session_config_string is not None:
+    method_kwargs["session_config"] = tf.ConfigProto.FromString(
+        session_config_string)
+  if input_source_config is not None:
+    method_kwargs["input_source"] = create_input_source(**input_source_config)
+
+  with SavedmodelAnalyst(savedmodel_path, tags) as savedmodel:
+    return getattr(savedmodel, method_name)(**method_kwargs)
 
 
 class SavedmodelAnalyst(object):
@@ -13,26 +51,63 @@ class SavedmodelAnalyst(object):
   The helper class to access TensorFlow Savedmodel.
   """
 
-  def __init__(self, savedmodel_path):
+  def __init__(self, savedmodel_path, tags=None, cache_path=None,
+               prefetch_threads=8, file_system=None):
     """
     Get the base model path and get the model versions.
+
+    The remote path like "gs://bucket/model" is read with tf.gfile and each
+    version is prefetched to the local cache before loading.
     """
 
     self.savedmodel_path = savedmodel_path
 
-    is_model_directory_exist = os.path.isdir(self.savedmodel_path)
+    # The tag set to load, example: ["serve"]
+    if tags is None:
+      tags = [tf.saved_model.tag_constants.SERVING]
+    self.tags = tags
+
+    # The loaded models, example: {("./model/1", ("serve",), None): (session, meta_graph)}
+    self.loaded_model_map = {}
+
+    # The memory of each model load with the same keys, example: {("./model/1", ("serve",), None): {"variable_bytes": 72, ...}}
+    self.load_memory_map = {}
+
+    # The sessions to time the overhead by the input dtypes, example: {(1, 3): (session, no_op, placeholders)}
+    self.overhead_session_map = {}
+
+    # The p50 latency of the no-op by the input shapes and dtypes, example: {((((1, 9), 1),), False): 0.0001}
+    self.overhead_latency_map = {}
+
+    # The cache of the remote model versions, None for the local model
+    self.model_cache = None
+    if is_remote_path(self.savedmodel_path) or file_system is not None:
+      self.model_cache = ModelCache(cache_path, prefetch_threads, file_system)
+      file_system = self.model_cache.file_system
+    else:
+      file_system = LocalFileSystem()
+
+    is_model_directory_exist = file_system.is_directory(self.savedmodel_path)
 
     # Check if the directory exists or not
     if is_model_directory_exist:
-      # Get model version, example: ["1", "2"]
-      self.model_version_list = os.listdir(self.savedmodel_path)
+      # Get model version in numeric order, example: ["1", "2"]
+      self.model_version_list = SavedmodelReader.sort_model_versions(
+          file_system.list_directory(self.savedmodel_path))
       logging.info("Get model versions: {}".format(self.model_version_list))
 
-      # Use the first model version, example: "./model/1"
-      self.model_version_path = os.path.join(self.savedmodel_path,
-                                             self.model_version_list[0])
-
-      self.model_file_exist = True
+      # Use the latest model version like TF Serving, example: "./model/2"
+      try:
+        if not self.model_version_list:
+          raise IOError("No model version in: {}".format(
+              self.savedmodel_path))
+        self.model_version_path = self.get_model_version_path(
+            self.model_version_list[-1])
+        self.model_file_exist = True
+      except Exception as e:
+        # The remote model version may fail to prefetch
+        logging.error("Fail to prefetch the model and get error: {}".format(e))
+        self.model_file_exist = False
 
     else:
       # Set false if model does not exist
@@ -40,7 +115,187 @@ class SavedmodelAnalyst(object):
       logging.error("The model path does not exist: {}".format(
           self.savedmodel_path))
 
-  def validate(self):
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
+
+  def get_model_version_path(self, model_version):
+    """
+    Get the local path of the model version, the remote version is prefetched to the cache.
+    """
+
+    if self.model_cache is None:
+      return os.path.join(self.savedmodel_path, model_version)
+
+    # Example: "gs://bucket/model/1" -> "~/.cache/tfmodel/<hash>/1"
+    return self.model_cache.stage(join_path(self.savedmodel_path,
+                                            model_version))
+
+  def run_method_in_process(self,
+                            method_name,
+                            method_kwargs,
+                            session_config=None,
+                            input_source=None):
+    """
+    Run the method with the session config in a fresh process and return its result.
+
+    TensorFlow creates the intra_op and inter_op thread pools once per process
+    with the config of the first session, so the thread settings of the
+    later sessions in this process are ignored.
+    """
+
+    session_config_string = None
+    if session_config is not None:
+      session_config_string = session_config.SerializeToString()
+
+    input_source_config = None
+    if input_source is not None:
+      input_source_config = input_source.get_config()
+
+    # The child process loads the local version directly, example: "./model" for "./model/1"
+    return run_in_process(
+        "tfmodel.savedmodel_analyst.run_analyst_worker", {
+            "savedmodel_path": os.path.dirname(self.model_version_path),
+            "method_name": method_name,
+            "method_kwargs": method_kwargs,
+            "tags": self.tags,
+            "session_config_string": session_config_string,
+            "input_source_config": input_source_config
+        })
+
+  def get_model_key(self, model_version_path=None, tags=None,
+                    session_config=None):
+    """
+    Get the key of the loaded model cache with the default path and tags.
+    """
+
+    if model_version_path is None:
+      model_version_path = self.model_version_path
+    if tags is None:
+      tags = self.tags
+
+    # The ConfigProto is not hashable so use the serialized bytes
+    if session_config is not None:
+      session_config = session_config.SerializeToString()
+
+    # Example: ("./model/1", ("serve",), None)
+    return (model_version_path, tuple(sorted(tags)), session_config)
+
+  def load_model(self, model_version_path=None, tags=None,
+                 session_config=None):
+    """
+    Load the model once and return the cached session and meta graph.
+    """
+
+    model_key = self.get_model_key(model_version_path, tags, session_config)
+    model_version_path, tags = model_key[0], list(model_key[1])
+
+    if model_key not in self.loaded_model_map:
+      rss_before_load_bytes = MemoryUtil.get_rss_bytes()
+      peak_rss_before_load_bytes = MemoryUtil.get_peak_rss_bytes()
+
+      session = tf.Session(graph=tf.Graph(), config=session_config)
+      try:
+        meta_graph = tf.saved_model.loader.load(session, tags,
+                                                model_version_path)
+      except Exception:
+        session.close()
+        raise
+
+      self.load_memory_map[model_key] = {
+          "rss_before_load_bytes": rss_before_load_bytes,
+          "rss_after_load_bytes": MemoryUtil.get_rss_bytes(),
+          "peak_rss_before_load_bytes": peak_rss_before_load_bytes,
+          "peak_rss_after_load_bytes": MemoryUtil.get_peak_rss_bytes(),
+          "variable_bytes": self.get_variable_bytes(model_version_path)
+      }
+
+      logging.info(
+          "Succeed to load model in: {}, RSS increase: {} MB, variables: {} MB".
+          format(model_version_path,
+                 MemoryUtil.get_megabytes(
+                     self.load_memory_map[model_key]["rss_after_load_bytes"] -
+                     rss_before_load_bytes),
+                 MemoryUtil.get_megabytes(
+                     self.load_memory_map[model_key]["variable_bytes"])))
+      self.loaded_model_map[model_key] = (session, meta_graph)
+
+    return self.loaded_model_map[model_key]
+
+  def evict_model(self, model_version_path=None, tags=None,
+                  session_config=None):
+    """
+    Close the session of the loaded model and remove it from the cache.
+    """
+
+    model_key = self.get_model_key(model_version_path, tags, session_config)
+
+    if model_key in self.loaded_model_map:
+      session, _ = self.loaded_model_map.pop(model_key)
+      session.close()
+      self.load_memory_map.pop(model_key, None)
+      logging.info("Evict the loaded model in: {}".format(model_key[0]))
+
+  def close(self):
+    """
+    Close all the sessions of the loaded models.
+    """
+
+    for model_key in list(self.loaded_model_map.keys()):
+      session, _ = self.loaded_model_map.pop(model_key)
+      session.close()
+    self.load_memory_map.clear()
+
+    for overhead_key in list(self.overhead_session_map.keys()):
+      session, _, _ = self.overhead_session_map.pop(overhead_key)
+      session.close()
+    self.overhead_latency_map.clear()
+
+  @staticmethod
+  def get_variable_bytes(model_version_path):
+    """
+    Get the total bytes of the variables restored from the checkpoint of the version.
+    """
+
+    checkpoint_prefix = os.path.join(model_version_path, "variables",
+                                     "variables")
+
+    # The model without variables has no checkpoint
+    if not os.path.exists(checkpoint_prefix + ".index"):
+      return 0
+
+    return sum(variable_bytes
+               for shape, dtype, variable_bytes in GraphCostEstimator.
+               get_variable_sizes(checkpoint_prefix).values())
+
+  def get_load_memory(self, model_version_path=None, tags=None,
+                      session_config=None):
+    """
+    Get the memory recorded when loading the model, or an empty dict if not loaded.
+    """
+
+    model_key = self.get_model_key(model_version_path, tags, session_config)
+    return dict(self.load_memory_map.get(model_key, {}))
+
+  @staticmethod
+  def print_load_memory(load_memory):
+    """
+    Print the table of the memory before and after loading the model in MB.
+    """
+
+    table = PrettyTable()
+    table.field_names = ["Metric", "Memory(MB)"]
+    for metric, key in [("RSSBeforeLoad", "rss_before_load_bytes"),
+                        ("RSSAfterLoad", "rss_after_load_bytes"),
+                        ("PeakRSSBeforeLoad", "peak_rss_before_load_bytes"),
+                        ("PeakRSSAfterLoad", "peak_rss_after_load_bytes"),
+                        ("Variables", "variable_bytes")]:
+      table.add_row([metric, MemoryUtil.get_megabytes(load_memory.get(key))])
+    print(table)
+
+  def validate(self, session_config=None, model_version_path=None):
     """
     Validate the model.
     """
@@ -49,180 +304,1307 @@ class SavedmodelAnalyst(object):
       return False
 
     try:
-      session = tf.Session(graph=tf.Graph())
-      tf.saved_model.loader.load(session,
-                                 [tf.saved_model.tag_constants.SERVING],
-                                 self.model_version_path)
+      self.load_model(model_version_path, session_config=session_config)
       return True
     except Exception as e:
       logging.error("Fail to validate and get error: {}".format(e))
       return False
 
-  def inspect_model(self):
+  def inspect_model(self, model_version_path=None):
     """
-    Inspect the model to print the model signature.    
+    Inspect the model to print the model signatures.    
     """
 
-    if self.validate() == False:
+    if self.validate(model_version_path=model_version_path) == False:
       logging.error("Fail to load the model")
       return
 
-    try:
-      session = tf.Session(graph=tf.Graph())
-      meta_graph = tf.saved_model.loader.load(
-          session, [tf.saved_model.tag_constants.SERVING],
-          self.model_version_path)
-      logging.info("Succeed to load model in: {}".format(
-          self.model_version_path))
+    session, meta_graph = self.load_model(model_version_path)
 
-    except Exception as e:
-      logging.info("Fail to inspect model and error: {}".format(e))
+    # Example: [{"signature_name": "serving_default", "tensor_type": "input", ...}]
+    tensor_records = []
+
+    # Print all the model signatures, example: ["serving_default"]
+    for signature_name in sorted(meta_graph.signature_def.keys()):
+      tensor_records.extend(
+          SavedmodelReader.print_signature(
+              signature_name, meta_graph.signature_def[signature_name]))
+
+    return tensor_records
+
+  def get_overhead_session(self, input_items):
+    """
+    Get the session of the no-op with the placeholders of the input dtypes.
+
+    The no-op is in a separate graph so the loaded model graph is not changed
+    for the optimizing and exporting subcommands.
+    """
+
+    overhead_key = tuple(tensor_info.dtype for _, tensor_info in input_items)
 
-    # Print the model signature
-    signature_name = list(meta_graph.signature_def.items())[0][0]
-    model_graph_signature = list(meta_graph.signature_def.items())[0][1]
+    if overhead_key not in self.overhead_session_map:
+      graph = tf.Graph()
+      with graph.as_default():
+        placeholders = [
+            tf.placeholder(tf.as_dtype(tensor_info.dtype))
+            for _, tensor_info in input_items
+        ]
+        overhead_op = tf.no_op(name=OVERHEAD_OP_NAME)
+      self.overhead_session_map[overhead_key] = (tf.Session(graph=graph),
+                                                 overhead_op, placeholders)
+
+    return self.overhead_session_map[overhead_key]
+
+  def construct_run_functions(self, session, model_graph_signature, batch_size,
+                              benchmark_engine, input_source=None):
+    """
+    Get the functions to run the signature, run the no-op and get the feed dict.
+    """
+
+    # Generate output op names for infernece
+    output_op_names = []
+    for item in model_graph_signature.outputs.items():
+      output_op_name = item[1].name
+      output_op_names.append(output_op_name)
+
+    input_items = list(model_graph_signature.inputs.items())
+    # Example: ["Placeholder:0", "Placeholder_1:0"]
+    input_tensor_names = [item[1].name for item in input_items]
+
+    if input_source is None:
+      input_source = ConstantInputSource()
+
+    def get_input_arrays():
+      feed_dict_map = input_source.get_batch(input_items, batch_size)
+      return [
+          np.ascontiguousarray(feed_dict_map[input_tensor_name])
+          for input_tensor_name in input_tensor_names
+      ]
+
+    if benchmark_engine.input_pool_size:
+      # Stage the batches before timing to exclude the feed construction
+      input_pool = [
+          get_input_arrays()
+          for i in range(benchmark_engine.input_pool_size)
+      ]
+      input_pool_iterator = itertools.cycle(input_pool)
+      get_inputs = lambda: next(input_pool_iterator)
+    else:
+      get_inputs = get_input_arrays
+
+    get_feed_dict = lambda: dict(zip(input_tensor_names, get_inputs()))
+
+    # The no-op fetch measures the framework overhead of feeding the same inputs
+    overhead_session, overhead_op, overhead_placeholders = self.get_overhead_session(
+        input_items)
+
+    if benchmark_engine.use_callable:
+      session_callable = session.make_callable(
+          output_op_names, feed_list=input_tensor_names)
+      overhead_callable = overhead_session.make_callable(
+          overhead_op, feed_list=overhead_placeholders)
+
+      run_function = lambda: session_callable(*get_inputs())
+      overhead_function = lambda: overhead_callable(*get_inputs())
+    else:
+      # Example: [array([[1., 1.], [1., 1.]], dtype=float32), array([[1], [1]], dtype=int32), array([1, 1])]
+      run_function = lambda: session.run(
+          output_op_names, feed_dict=get_feed_dict())
+      overhead_function = lambda: overhead_session.run(
+          overhead_op, feed_dict=dict(zip(overhead_placeholders, get_inputs())))
+
+    return run_function, overhead_function, get_feed_dict
+
+  def benchmark_with_batch_size(self,
+                                session,
+                                model_graph_signature,
+                                batch_size,
+                                benchmark_engine,
+                                concurrency=1,
+                                target_qps=None,
+                                input_source=None,
+                                trace_memory=None):
+    """
+    Generate mock data with the batch size and benchmark the signature once.
+
+    The overhead is only timed for the first signature with the same input
+    shapes and dtypes. The traced run for the allocator peak is added if
+    trace_memory, which defaults to the option of the benchmark engine.
+    """
 
-    logging.info("Print the signature of the model")
-    logging.info("Model signature name: {}, method: {}".format(
-        signature_name, model_graph_signature.method_name))
+    run_function, overhead_function, get_feed_dict = self.construct_run_functions(
+        session, model_graph_signature, batch_size, benchmark_engine,
+        input_source)
+
+    if concurrency > 1 or target_qps:
+      # Drive the shared session from the thread pool
+      benchmark_result = benchmark_engine.run_concurrent(
+          run_function, batch_size, concurrency, target_qps)
+    else:
+      benchmark_result = benchmark_engine.run(run_function, batch_size)
+
+    # The no-op cost only depends on the fed inputs, not on the model
+    input_key = tuple(
+        (ModelUtil.get_shape_with_batch(tensor_info, batch_size),
+         tensor_info.dtype)
+        for _, tensor_info in sorted(model_graph_signature.inputs.items()))
+    overhead_key = (input_key, benchmark_engine.use_callable)
+    if overhead_key not in self.overhead_latency_map:
+      self.overhead_latency_map[overhead_key] = benchmark_engine.run(
+          overhead_function, batch_size).p50_latency
+
+    benchmark_result.overhead_latency = self.overhead_latency_map[overhead_key]
+    benchmark_result.compute_latency = max(
+        benchmark_result.p50_latency - benchmark_result.overhead_latency, 0.0)
+
+    if trace_memory is None:
+      trace_memory = benchmark_engine.trace_memory
+
+    if trace_memory:
+      # Trace one more run for the allocator stats, which slows down the timed runs
+      run_options = tf.RunOptions(trace_level=tf.RunOptions.FULL_TRACE)
+      run_metadata = tf.RunMetadata()
+      session.run(
+          [item[1].name for item in model_graph_signature.outputs.items()],
+          feed_dict=get_feed_dict(),
+          options=run_options,
+          run_metadata=run_metadata)
+
+      allocator_peak_bytes_map = OpProfiler.get_allocator_peak_bytes(
+          run_metadata)
+      if allocator_peak_bytes_map:
+        benchmark_result.allocator_peak_bytes = sum(
+            allocator_peak_bytes_map.values())
+    benchmark_result.rss_bytes = MemoryUtil.get_rss_bytes()
+    benchmark_result.peak_rss_bytes = MemoryUtil.get_peak_rss_bytes()
+
+    logging.info(
+        "Inference batch size: {}, p50: {}s, tail: {}s, throughput: {} examples/s".
+        format(batch_size, benchmark_result.p50_latency,
+               benchmark_result.tail_latency, benchmark_result.throughput))
+
+    return benchmark_result
+
+  def benchmark_model_with_mock_data(self,
+                                     batch_size_list=None,
+                                     benchmark_engine=None,
+                                     concurrency=1,
+                                     target_qps=None,
+                                     session_config=None,
+                                     model_version_path=None,
+                                     signature_name=None,
+                                     input_source=None):
+    """
+    Generate mock data to benchmark the model and print performance.
+    """
+
+    if self.validate(session_config, model_version_path) == False:
+      logging.error("Fail to load the model")
+      return
+
+    session, meta_graph = self.load_model(
+        model_version_path, session_config=session_config)
+
+    # Get the model signature
+    signature_name, model_graph_signature = ModelUtil.get_signature(
+        meta_graph, signature_name)
+
+    if batch_size_list is None:
+      batch_size_list = [1, 10, 1000, 10000, 100000]
+
+    if benchmark_engine is None:
+      benchmark_engine = BenchmarkEngine()
+
+    benchmark_results = []
+
+    if model_version_path is None:
+      model_version_path = self.model_version_path
+
+    load_memory = self.get_load_memory(
+        model_version_path, session_config=session_config)
+    self.print_load_memory(load_memory)
+
+    for batch_size in batch_size_list:
+      benchmark_result = self.benchmark_with_batch_size(
+          session, model_graph_signature, batch_size, benchmark_engine,
+          concurrency, target_qps, input_source)
+      benchmark_result.model_version = os.path.basename(model_version_path)
+      benchmark_result.signature_name = signature_name
+      benchmark_result.load_memory = load_memory
+      benchmark_results.append(benchmark_result)
+
+    if concurrency > 1 or target_qps:
+      BenchmarkEngine.print_concurrent_results(benchmark_results)
+    else:
+      BenchmarkEngine.print_results(benchmark_results)
+
+    return benchmark_results
+
+  def benchmark_model_with_session_configs(self,
+                                           session_configs,
+                                           batch_size_list=None,
+                                           benchmark_engine=None,
+                                           concurrency=1,
+                                           target_qps=None,
+                                           input_source=None):
+    """
+    Benchmark the model with each session config and print the ranked table.
+    """
+
+    if self.model_file_exist == False:
+      logging.error("The model path does not exist: {}".format(
+          self.savedmodel_path))
+      return
+
+    # Example: [("intra_op: 1, inter_op: 1", BenchmarkResult)]
+    config_results = []
+
+    for config_name, session_config in session_configs:
+      logging.info("Benchmark with session config in a fresh process: {}".
+                   format(config_name))
+
+      # The thread pools of the config only take effect in a new process
+      benchmark_results = self.run_method_in_process(
+          "benchmark_model_with_mock_data", {
+              "batch_size_list": batch_size_list,
+              "benchmark_engine": benchmark_engine,
+              "concurrency": concurrency,
+              "target_qps": target_qps,
+              "model_version_path": self.model_version_path
+          },
+          session_config=session_config,
+          input_source=input_source)
+
+      if benchmark_results is None:
+        return
+
+      for benchmark_result in benchmark_results:
+        config_results.append((config_name, benchmark_result))
+
+    # Rank by the throughput of each batch size
+    config_results.sort(
+        key=lambda item: (item[1].batch_size, -item[1].throughput))
+
+    logging.info("Each session config is benchmarked in a separate process")
 
-    # Print the table of input tensors
     table = PrettyTable()
-    table.field_names = ["InputName", "OpName", "DType", "Shape"]
-
-    for item in model_graph_signature.inputs.items():
-      """ Example:
-      ( 'features', 
-        name: "Placeholder:0"
-        dtype: DT_FLOAT
-        tensor_shape {
-          dim {
-            size: -1
-          }
-          dim {
-            size: 9
-          }
-        }
-      )
+    table.field_names = [
+        "BatchSize", "Rank", "SessionConfig", "Examples/s", "Tail(ms)"
+    ]
+
+    rank = 0
+    last_batch_size = None
+    for config_name, benchmark_result in config_results:
+      if benchmark_result.batch_size != last_batch_size:
+        rank = 0
+        last_batch_size = benchmark_result.batch_size
+      rank += 1
+
+      table.add_row([
+          benchmark_result.batch_size, rank, config_name,
+          round(benchmark_result.throughput, 2),
+          round(benchmark_result.tail_latency * 1000, 3)
+      ])
+
+    print(table)
+
+    return config_results
+
+  def search_batch_size(self,
+                        latency_budget,
+                        memory_limit=None,
+                        max_batch_size=1048576,
+                        tolerance=0.05,
+                        benchmark_engine=None,
+                        session_config=None,
+                        input_source=None):
+    """
+    Search the batch size with the max throughput within the tail latency budget.
+
+    The tail latency is the p99, or the max latency with fewer than 100
+    timed iterations.
+
+    Grow the batch size geometrically until it exceeds the latency budget or
+    the memory limit in bytes, then bisect between the last feasible and the
+    first infeasible batch sizes.
+
+    The process RSS never drops after the allocator grows, so the memory of
+    each batch size is estimated by the RSS before the search, the inputs and
+    the peak of the TensorFlow allocators in the traced run of the size. It
+    is an upper bound because the variables are also in the allocators. The
+    run is only traced with the memory limit or the trace_memory option.
+    """
+
+    if self.validate(session_config) == False:
+      logging.error("Fail to load the model")
+      return
+
+    session, meta_graph = self.load_model(session_config=session_config)
+
+    # Get the model signature
+    signature_name, model_graph_signature = ModelUtil.get_signature(meta_graph)
+    input_items = model_graph_signature.inputs.items()
+
+    if benchmark_engine is None:
+      benchmark_engine = BenchmarkEngine()
+
+    # Example: [(batch_size, BenchmarkResult or None, "ok", 1048576)]
+    search_records = []
+
+    # The memory of the loaded model which is shared by all the batch sizes
+    base_rss_bytes = MemoryUtil.get_rss_bytes()
+
+    def try_batch_size(batch_size):
       """
-      name = item[0]
-      op_name = item[1].name
-      """ TODO: refer to https://github.com/tensorflow/tensorflow/blob/master/tensorflow/core/framework/types.proto
-      DT_FLOAT = 1;
-      DT_DOUBLE = 2;
-      DT_INT32 = 3;
-      DT_UINT8 = 4;
-      DT_INT16 = 5;
-      DT_INT8 = 6;
-      DT_STRING = 7;
-      DT_COMPLEX64 = 8;
-      DT_INT64 = 9;
-      DT_BOOL = 10;
+      Return the result if the batch size is feasible, otherwise return None.
       """
-      dtype_int = item[1].dtype
-      if dtype_int == 1:
-        dtype = "DT_FLOAT"
-      elif dtype_int == 2:
-        dtype = "DT_DOUBLE"
-      elif dtype_int == 3:
-        dtype = "DT_INT32"
-      elif dtype_int == 4:
-        dtype = "DT_UINT8"
-      elif dtype_int == 5:
-        dtype = "DT_INT16"
-      elif dtype_int == 6:
-        dtype = "DT_INT8"
-      elif dtype_int == 7:
-        dtype = "DT_STRING"
-      elif dtype_int == 8:
-        dtype = "DT_COMPLEX64"
-      elif dtype_int == 9:
-        dtype = "DT_INT64"
-      elif dtype_int == 10:
-        dtype = "DT_BOOL"
+
+      feed_bytes = ModelUtil.get_feed_dict_bytes(input_items, batch_size)
+
+      # The feed data and its copy in TensorFlow before running
+      memory_bytes = base_rss_bytes + 2 * feed_bytes
+      if memory_limit is not None and memory_bytes > memory_limit:
+        search_records.append((batch_size, None, "memory limit", memory_bytes))
+        return None
+
+      try:
+        benchmark_result = self.benchmark_with_batch_size(
+            session,
+            model_graph_signature,
+            batch_size,
+            benchmark_engine,
+            input_source=input_source,
+            trace_memory=benchmark_engine.trace_memory or
+            memory_limit is not None)
+      except (tf.errors.ResourceExhaustedError, MemoryError) as e:
+        logging.warning("Out of memory with batch size {}: {}".format(
+            batch_size, e))
+        search_records.append((batch_size, None, "oom", None))
+        return None
+
+      if benchmark_result.allocator_peak_bytes is not None:
+        memory_bytes = (base_rss_bytes + feed_bytes +
+                        benchmark_result.allocator_peak_bytes)
+
+      if memory_limit is not None and memory_bytes > memory_limit:
+        search_records.append((batch_size, benchmark_result, "memory limit",
+                               memory_bytes))
+        return None
+      elif benchmark_result.tail_latency > latency_budget:
+        search_records.append((batch_size, benchmark_result, "latency budget",
+                               memory_bytes))
+        return None
       else:
-        dtype = dtype_int
-      # Example: [-1, 9]
-      shape = [dim.size for dim in item[1].tensor_shape.dim]
-      #logging.info("Name: {}, Op: {}, Type: {}, Shape: {}".format(name, op_name, dtype, shape))
+        search_records.append((batch_size, benchmark_result, "ok",
+                               memory_bytes))
+        return benchmark_result
 
-      table.add_row([name, op_name, dtype, shape])
+    best_result = None
+    last_feasible_batch_size = None
+    first_infeasible_batch_size = None
 
-    print(table)
+    batch_size = 1
+    while batch_size <= max_batch_size:
+      benchmark_result = try_batch_size(batch_size)
+      if benchmark_result is None:
+        first_infeasible_batch_size = batch_size
+        break
+
+      last_feasible_batch_size = batch_size
+      if best_result is None or \
+          benchmark_result.throughput > best_result.throughput:
+        best_result = benchmark_result
+      batch_size *= 2
+
+    if last_feasible_batch_size is not None and \
+        first_infeasible_batch_size is not None:
+      low = last_feasible_batch_size
+      high = first_infeasible_batch_size
+
+      while high - low > max(1, int(low * tolerance)):
+        middle = (low + high) // 2
+        benchmark_result = try_batch_size(middle)
+
+        if benchmark_result is None:
+          high = middle
+        else:
+          low = middle
+          if benchmark_result.throughput > best_result.throughput:
+            best_result = benchmark_result
 
-    # Print the table of output tensors
     table = PrettyTable()
-    table.field_names = ["OutputName", "OpName", "DType", "Shape"]
+    table.field_names = [
+        "BatchSize", "Tail(ms)", "Examples/s", "Memory(MB)", "Status"
+    ]
+    for batch_size, benchmark_result, status, memory_bytes in search_records:
+      if benchmark_result is None:
+        table.add_row([
+            batch_size, None, None,
+            MemoryUtil.get_megabytes(memory_bytes), status
+        ])
+      else:
+        table.add_row([
+            batch_size,
+            round(benchmark_result.tail_latency * 1000, 3),
+            round(benchmark_result.throughput, 2),
+            MemoryUtil.get_megabytes(memory_bytes), status
+        ])
+    print(table)
 
-    for item in model_graph_signature.outputs.items():
-      """ Example:
-      ( 'softmax', 
-        name: "Softmax_2:0"
-        dtype: DT_FLOAT
-        tensor_shape {
-          dim {
-            size: -1
-          }
-          dim {
-            size: 2
-          }
-        }
-      )
-      """
-      name = item[0]
-      op_name = item[1].name
-      dtype_int = item[1].dtype
-      if dtype_int == 1:
-        dtype = "DT_FLOAT"
-      elif dtype_int == 2:
-        dtype = "DT_DOUBLE"
-      elif dtype_int == 3:
-        dtype = "DT_INT32"
-      elif dtype_int == 4:
-        dtype = "DT_UINT8"
-      elif dtype_int == 5:
-        dtype = "DT_INT16"
-      elif dtype_int == 6:
-        dtype = "DT_INT8"
-      elif dtype_int == 7:
-        dtype = "DT_STRING"
-      elif dtype_int == 8:
-        dtype = "DT_COMPLEX64"
-      elif dtype_int == 9:
-        dtype = "DT_INT64"
-      elif dtype_int == 10:
-        dtype = "DT_BOOL"
+    # Example: [{"batch_size": 128, "status": "ok", "recommended": True, ...}]
+    search_result_records = []
+    for batch_size, benchmark_result, status, memory_bytes in search_records:
+      if benchmark_result is None:
+        search_result_record = {"batch_size": batch_size}
+      else:
+        search_result_record = benchmark_result.to_dict()
+      search_result_record["status"] = status
+      search_result_record["memory_bytes"] = memory_bytes
+      # The skipped records have no result and are never recommended
+      search_result_record["recommended"] = (
+          best_result is not None and benchmark_result is best_result)
+      search_result_records.append(search_result_record)
+
+    if best_result is None:
+      logging.error("No batch size meets the latency budget and memory limit")
+      return search_result_records
+
+    # Example: "max_batch_size { value: 128 }" in batching_parameters.txt
+    logging.info(
+        "Recommended TF Serving batching config: max_batch_size {{ value: {} }}".
+        format(best_result.batch_size))
+
+    return search_result_records
+
+  def benchmark_model_versions(self,
+                               model_versions=None,
+                               signature_names=None,
+                               batch_size_list=None,
+                               benchmark_engine=None,
+                               regression_threshold=None,
+                               input_source=None):
+    """
+    Benchmark the versions and signatures and compare them with the first version.
+
+    Return the records with the relative deltas, and mark the regression if
+    the latency or throughput regresses more than the regression threshold,
+    example: 0.1 for 10%. Return None if any version fails to load.
+    """
+
+    if self.model_file_exist == False:
+      logging.error("The model path does not exist: {}".format(
+          self.savedmodel_path))
+      return
+
+    if not model_versions:
+      model_versions = self.model_version_list
+
+    # Example: {("1", "serving_default", 1): BenchmarkResult}
+    version_results = {}
+    # Example: [("1", "serving_default")]
+    version_signatures = []
+
+    for model_version in model_versions:
+      model_version_path = self.get_model_version_path(model_version)
+
+      if self.validate(model_version_path=model_version_path) == False:
+        logging.error("Fail to load the model version: {}".format(
+            model_version_path))
+        return
+
+      session, meta_graph = self.load_model(model_version_path)
+
+      if signature_names:
+        version_signature_names = signature_names
       else:
-        dtype = dtype_int
-      # Example: [-1, 9]
-      shape = [dim.size for dim in item[1].tensor_shape.dim]
+        version_signature_names = sorted(meta_graph.signature_def.keys())
+
+      for signature_name in version_signature_names:
+        if signature_name not in meta_graph.signature_def:
+          logging.warning("Skip the signature {} which is not in {}".format(
+              signature_name, model_version_path))
+          continue
+
+        logging.info("Benchmark the model version: {}, signature: {}".format(
+            model_version, signature_name))
+
+        benchmark_results = self.benchmark_model_with_mock_data(
+            batch_size_list=batch_size_list,
+            benchmark_engine=benchmark_engine,
+            model_version_path=model_version_path,
+            signature_name=signature_name,
+            input_source=input_source)
+
+        version_signatures.append((model_version, signature_name))
+        for benchmark_result in benchmark_results:
+          version_results[(model_version, signature_name,
+                           benchmark_result.batch_size)] = benchmark_result
+
+      # Free the session before loading the next version
+      self.evict_model(model_version_path)
 
-      table.add_row([name, op_name, dtype, shape])
+    baseline_version = model_versions[0]
+    is_regressed = False
+
+    # Example: [{"model_version": "2", "tail_latency_delta": 0.05, "regression": False, ...}]
+    version_records = []
+
+    table = PrettyTable()
+    table.field_names = [
+        "Version", "Signature", "BatchSize", "Tail(ms)", "Examples/s",
+        "TailDelta", "ThroughputDelta", "Regression"
+    ]
+
+    for model_version, signature_name, batch_size in sorted(
+        version_results.keys(),
+        key=lambda key: (version_signatures.index(key[:2]), key[2])):
+      benchmark_result = version_results[(model_version, signature_name,
+                                          batch_size)]
+      baseline_result = version_results.get((baseline_version, signature_name,
+                                             batch_size))
+
+      latency_delta = None
+      throughput_delta = None
+      is_row_regressed = False
+
+      if baseline_result is not None and model_version != baseline_version:
+        # The relative deltas, positive latency or negative throughput is worse
+        latency_delta = (benchmark_result.tail_latency -
+                         baseline_result.tail_latency
+                        ) / baseline_result.tail_latency
+        throughput_delta = (benchmark_result.throughput -
+                            baseline_result.throughput
+                           ) / baseline_result.throughput
+
+        if regression_threshold is not None and (
+            latency_delta > regression_threshold or
+            -throughput_delta > regression_threshold):
+          is_row_regressed = True
+          is_regressed = True
+
+      table.add_row([
+          model_version, signature_name, batch_size,
+          round(benchmark_result.tail_latency * 1000, 3),
+          round(benchmark_result.throughput, 2),
+          "" if latency_delta is None else "{:+.2%}".format(latency_delta),
+          "" if throughput_delta is None else "{:+.2%}".format(throughput_delta),
+          is_row_regressed
+      ])
+
+      version_record = benchmark_result.to_dict()
+      version_record.update({
+          "baseline_version": baseline_version,
+          "tail_latency_delta": latency_delta,
+          "throughput_delta": throughput_delta,
+          "regression": is_row_regressed
+      })
+      version_records.append(version_record)
 
     print(table)
 
-  def benchmark_model_with_mock_data(self):
+    if is_regressed:
+      logging.error("The model regresses more than {:.2%} from version {}".
+                    format(regression_threshold, baseline_version))
+
+    return version_records
+
+  def optimize_model(self,
+                     output_version=None,
+                     transforms=None,
+                     batch_size_list=None,
+                     benchmark_engine=None,
+                     input_source=None,
+                     output_model_version_path=None):
     """
-    Generate mock data to benchmark the model and print performance.
+    Write the frozen and optimized model as a new version, then benchmark both.
+
+    Return the records of the speedup and size reduction of each batch size.
+    The new version is the next number by default, which TF Serving loads as
+    the latest one, so choose another output version to compare only. The
+    remote model is not written, so it needs the local output path instead,
+    example: "./optimized_model/3".
+    """
+
+    if self.validate() == False:
+      logging.error("Fail to load the model")
+      return
+
+    session, meta_graph = self.load_model()
+
+    if output_model_version_path is not None:
+      optimized_model_version_path = output_model_version_path
+      output_version = os.path.basename(
+          optimized_model_version_path.rstrip("/"))
+
+    elif self.model_cache is not None:
+      logging.error(
+          "Set the local output path to optimize the remote model: {}".format(
+              self.savedmodel_path))
+      return
+
+    else:
+      if output_version is None:
+        numeric_versions = [
+            int(version) for version in self.model_version_list
+            if version.isdigit()
+        ]
+        output_version = str(max(numeric_versions + [0]) + 1)
+
+      optimized_model_version_path = os.path.join(self.savedmodel_path,
+                                                  output_version)
+
+    if os.path.exists(optimized_model_version_path):
+      logging.error("The model version already exists: {}".format(
+          optimized_model_version_path))
+      return
+
+    graph_optimizer = GraphOptimizer(session, meta_graph, transforms)
+    optimized_graph_def = graph_optimizer.optimize()
+    graph_optimizer.export(optimized_graph_def, optimized_model_version_path,
+                           self.tags)
+
+    # Only the new version in the local model directory is seen by the next subcommands
+    output_parent_path = os.path.dirname(
+        os.path.abspath(optimized_model_version_path))
+    if self.model_cache is None and output_parent_path == os.path.abspath(
+        self.savedmodel_path):
+      self.model_version_list.append(output_version)
+
+    # Example: {"./model/1": [BenchmarkResult]}
+    version_results = {}
+    for model_version_path in [
+        self.model_version_path, optimized_model_version_path
+    ]:
+      logging.info("Benchmark the model version: {}".format(model_version_path))
+      version_results[model_version_path] = self.benchmark_model_with_mock_data(
+          batch_size_list=batch_size_list,
+          benchmark_engine=benchmark_engine,
+          model_version_path=model_version_path,
+          input_source=input_source)
+
+      if version_results[model_version_path] is None:
+        return
+
+    original_bytes = GraphOptimizer.get_directory_bytes(self.model_version_path)
+    optimized_bytes = GraphOptimizer.get_directory_bytes(
+        optimized_model_version_path)
+    size_reduction = 1.0 - float(optimized_bytes) / max(original_bytes, 1)
+
+    # Example: [{"batch_size": 1, "speedup": 1.2, "size_reduction": 0.3, ...}]
+    optimize_records = []
+
+    table = PrettyTable()
+    table.field_names = [
+        "BatchSize", "OriginalP50(ms)", "OptimizedP50(ms)", "Speedup",
+        "OriginalExamples/s", "OptimizedExamples/s"
+    ]
+
+    for original_result, optimized_result in zip(
+        version_results[self.model_version_path],
+        version_results[optimized_model_version_path]):
+      speedup = original_result.p50_latency / max(optimized_result.p50_latency,
+                                                   1e-9)
+
+      table.add_row([
+          original_result.batch_size,
+          round(original_result.p50_latency * 1000, 3),
+          round(optimized_result.p50_latency * 1000, 3),
+          round(speedup, 3),
+          round(original_result.throughput, 2),
+          round(optimized_result.throughput, 2)
+      ])
+
+      optimize_records.append({
+          "signature_name": original_result.signature_name,
+          "batch_size": original_result.batch_size,
+          "original_version": original_result.model_version,
+          "optimized_version": optimized_result.model_version,
+          "original_p50_latency": original_result.p50_latency,
+          "optimized_p50_latency": optimized_result.p50_latency,
+          "original_throughput": original_result.throughput,
+          "optimized_throughput": optimized_result.throughput,
+          "speedup": speedup,
+          "original_bytes": original_bytes,
+          "optimized_bytes": optimized_bytes,
+          "size_reduction": size_reduction
+      })
+
+    print(table)
+
+    table = PrettyTable()
+    table.field_names = ["Metric", "Original", "Optimized"]
+    table.add_row(["Version", os.path.basename(self.model_version_path),
+                   output_version])
+    table.add_row([
+        "Nodes",
+        len(meta_graph.graph_def.node),
+        len(optimized_graph_def.node)
+    ])
+    table.add_row(["Bytes", original_bytes, optimized_bytes])
+    table.add_row(["SizeReduction", "", "{:.2%}".format(size_reduction)])
+    print(table)
+
+    return optimize_records
+
+  def evaluate_quantization(self,
+                            variants=None,
+                            batch_size_list=None,
+                            benchmark_engine=None,
+                            input_source=None,
+                            signature_name=None,
+                            fidelity_batch_size=100,
+                            top_k=5,
+                            export_path=None):
+    """
+    Benchmark the quantized variants and compare their outputs with the float model.
+
+    The variants are written under the export path, or a temporary directory
+    which is removed at the end. Return the records of the speed, size and
+    fidelity of each variant and batch size, the original is "float32".
     """
 
     if self.validate() == False:
       logging.error("Fail to load the model")
       return
 
+    session, meta_graph = self.load_model()
+    signature_name, model_graph_signature = ModelUtil.get_signature(
+        meta_graph, signature_name)
+
+    if variants is None:
+      variants = sorted(QUANTIZATION_TRANSFORMS.keys())
+
+    if input_source is None:
+      input_source = ConstantInputSource()
+
+    is_temporary_path = export_path is None
+    if is_temporary_path:
+      export_path = tempfile.mkdtemp(prefix="tfmodel_quantization_")
+
     try:
-      session = tf.Session(graph=tf.Graph())
-      meta_graph = tf.saved_model.loader.load(
-          session, [tf.saved_model.tag_constants.SERVING],
-          self.model_version_path)
-      logging.info("Succeed to load model in: {}".format(
-          self.model_version_path))
+      # Example: [("float32", "./model/1"), ("int8_weights", "/tmp/tfmodel_quantization_x/int8_weights")]
+      variant_paths = [("float32", self.model_version_path)]
 
-    except Exception as e:
-      logging.info("Fail to benchmark model and error: {}".format(e))
+      graph_optimizer = GraphOptimizer(session, meta_graph)
+      for variant in variants:
+        variant_path = os.path.join(export_path, variant)
+        try:
+          graph_optimizer.export(
+              graph_optimizer.quantize(variant), variant_path, self.tags)
+          variant_paths.append((variant, variant_path))
+        except Exception as e:
+          # The full integer quantization does not support all the ops
+          logging.warning("Skip the variant {} and get error: {}".format(
+              variant, e))
+
+      # Run all the variants with the same inputs
+      input_items = list(model_graph_signature.inputs.items())
+      output_items = sorted(model_graph_signature.outputs.items())
+      feed_dict_map = input_source.get_batch(input_items, fidelity_batch_size)
+      expected_arrays = session.run(
+          [item[1].name for item in output_items], feed_dict=feed_dict_map)
+
+      quantization_records = []
+      baseline_results = None
+
+      table = PrettyTable()
+      table.field_names = [
+          "Variant", "BatchSize", "P50(ms)", "Speedup", "Examples/s",
+          "Bytes", "SizeRatio", "MaxAbsError", "TopKAgreement"
+      ]
+
+      for variant, variant_path in variant_paths:
+        # The exported variant may still fail to load or run with the ops the runtime rejects
+        try:
+          variant_session, _ = self.load_model(variant_path)
+          actual_arrays = variant_session.run(
+              [item[1].name for item in output_items], feed_dict=feed_dict_map)
+
+          # Use the worst output of the signature
+          max_abs_error = 0.0
+          top_k_agreement = None
+          for item, expected_array, actual_array in zip(
+              output_items, expected_arrays, actual_arrays):
+            difference = ModelUtil.get_output_difference(
+                expected_array, actual_array, top_k)
+            logging.info("Variant: {}, output: {}, difference: {}".format(
+                variant, item[0], difference))
+
+            max_abs_error = max(max_abs_error, difference["max_abs_error"])
+            if difference["top_k_agreement"] is not None:
+              top_k_agreement = min(
+                  difference["top_k_agreement"],
+                  1.0 if top_k_agreement is None else top_k_agreement)
+
+          variant_bytes = GraphOptimizer.get_directory_bytes(variant_path)
+
+          benchmark_results = self.benchmark_model_with_mock_data(
+              batch_size_list=batch_size_list,
+              benchmark_engine=benchmark_engine,
+              model_version_path=variant_path,
+              signature_name=signature_name,
+              input_source=input_source)
+          if benchmark_results is None:
+            raise RuntimeError("Fail to benchmark the variant")
+          if baseline_results is None and variant != "float32":
+            raise RuntimeError("No benchmark results of the float32 model")
+
+        except Exception as e:
+          logging.warning("Skip the variant {} and get error: {}".format(
+              variant, e))
+          continue
+
+        finally:
+          # Free the session of the variant before loading the next one
+          if variant_path != self.model_version_path:
+            self.evict_model(variant_path)
+
+        if baseline_results is None:
+          baseline_results = benchmark_results
+          baseline_bytes = variant_bytes
+
+        for baseline_result, benchmark_result in zip(baseline_results,
+                                                     benchmark_results):
+          speedup = baseline_result.p50_latency / max(
+              benchmark_result.p50_latency, 1e-9)
+          size_ratio = float(variant_bytes) / max(baseline_bytes, 1)
+
+          table.add_row([
+              variant, benchmark_result.batch_size,
+              round(benchmark_result.p50_latency * 1000, 3),
+              round(speedup, 3),
+              round(benchmark_result.throughput, 2), variant_bytes,
+              round(size_ratio, 3), max_abs_error, top_k_agreement
+          ])
+
+          quantization_record = benchmark_result.to_dict()
+          quantization_record.update({
+              "variant": variant,
+              "speedup": speedup,
+              "bytes": variant_bytes,
+              "size_ratio": size_ratio,
+              "max_abs_error": max_abs_error,
+              "top_k": top_k,
+              "top_k_agreement": top_k_agreement
+          })
+          quantization_records.append(quantization_record)
+
+      print(table)
+
+    finally:
+      if is_temporary_path:
+        shutil.rmtree(export_path, ignore_errors=True)
+
+    return quantization_records
+
+  def serve_model(self,
+                  host="localhost",
+                  port=8500,
+                  max_batch_size=32,
+                  batch_timeout=0.001,
+                  batch_thread_number=1,
+                  duration=None,
+                  signature_name=None,
+                  session_config=None):
+    """
+    Serve the signature of the loaded model over HTTP with the dynamic batching.
+    """
+
+    if self.validate(session_config) == False:
+      logging.error("Fail to load the model")
+      return
+
+    session, meta_graph = self.load_model(session_config=session_config)
+    signature_name, model_graph_signature = ModelUtil.get_signature(
+        meta_graph, signature_name)
+
+    model_server = ModelServer(
+        session,
+        model_graph_signature,
+        signature_name,
+        host=host,
+        port=port,
+        max_batch_size=max_batch_size,
+        batch_timeout=batch_timeout,
+        batch_thread_number=batch_thread_number)
+    model_server.serve(duration)
+
+    return model_server.batcher.get_stats()
+
+  def soak_test_model(self,
+                      duration=None,
+                      max_requests=None,
+                      window_seconds=60.0,
+                      batch_size=1,
+                      drift_threshold=0.1,
+                      memory_growth_threshold=0.05,
+                      alpha=0.05,
+                      benchmark_engine=None,
+                      signature_name=None,
+                      input_source=None):
+    """
+    Run the model continuously and flag the trends across the time windows.
+
+    The latency drift, memory growth and throughput decay are flagged when
+    the slope of the linear fit is significant at the alpha level and the
+    fitted change from the first to the last window exceeds the threshold.
+    Return the window records and the trend records.
+    """
+
+    if self.validate() == False:
+      logging.error("Fail to load the model")
+      return
+
+    session, meta_graph = self.load_model()
+    signature_name, model_graph_signature = ModelUtil.get_signature(
+        meta_graph, signature_name)
+
+    if benchmark_engine is None:
+      benchmark_engine = BenchmarkEngine()
+
+    run_function, _, _ = self.construct_run_functions(
+        session, model_graph_signature, batch_size, benchmark_engine,
+        input_source)
+
+    window_records = benchmark_engine.run_soak(
+        run_function,
+        batch_size,
+        duration=duration,
+        max_requests=max_requests,
+        window_seconds=window_seconds)
+
+    for window_record in window_records:
+      window_record["signature_name"] = signature_name
+
+    table = PrettyTable()
+    table.field_names = [
+        "Window", "Start(s)", "Requests", "P50(ms)", "P99(ms)", "Max(ms)",
+        "Examples/s", "RSS(MB)"
+    ]
+    for window_record in window_records:
+      table.add_row([
+          window_record["window"],
+          round(window_record["start_time"], 1), window_record["iterations"],
+          round(window_record["p50_latency"] * 1000, 3),
+          round(window_record["p99_latency"] * 1000, 3),
+          round(window_record["max_latency"] * 1000, 3),
+          round(window_record["throughput"], 2),
+          MemoryUtil.get_megabytes(window_record["rss_bytes"])
+      ])
+    print(table)
+
+    # Example: [("p50_latency", "latency drift", 1, 0.1)], the direction 1 means increasing is worse
+    trend_metrics = [("p50_latency", "latency drift", 1, drift_threshold),
+                     ("p99_latency", "latency drift", 1, drift_threshold),
+                     ("rss_bytes", "memory growth", 1, memory_growth_threshold),
+                     ("throughput", "throughput decay", -1, drift_threshold)]
+
+    trend_records = []
+
+    table = PrettyTable()
+    table.field_names = [
+        "Metric", "Trend", "FittedStart", "FittedEnd", "Change", "PValue",
+        "Flagged"
+    ]
+
+    for metric, trend, direction, threshold in trend_metrics:
+      values = [window_record[metric] for window_record in window_records]
+      slope, intercept, p_value = ReportUtil.linear_trend(values)
+
+      fitted_end = intercept + slope * max(len(values) - 1, 0)
+      relative_change = (fitted_end - intercept) / max(abs(intercept), 1e-12)
+      is_flagged = p_value < alpha and direction * relative_change > threshold
+
+      if is_flagged:
+        logging.error("Detect the {} of {}: {:+.2%}".format(
+            trend, metric, relative_change))
+
+      table.add_row([
+          metric, trend,
+          round(intercept, 6),
+          round(fitted_end, 6), "{:+.2%}".format(relative_change),
+          round(p_value, 4), is_flagged
+      ])
+
+      trend_records.append({
+          "signature_name": signature_name,
+          "batch_size": batch_size,
+          "metric": metric,
+          "trend": trend,
+          "slope_per_window": slope,
+          "fitted_start": intercept,
+          "fitted_end": fitted_end,
+          "relative_change": relative_change,
+          "p_value": p_value,
+          "flagged": is_flagged
+      })
+
+    print(table)
+
+    return window_records, trend_records
+
+  def predict_model(self,
+                    input_path,
+                    predictions_path,
+                    batch_size=128,
+                    queue_size=4,
+                    compression_type=None,
+                    signature_name=None):
+    """
+    Stream the input file through the signature and write the outputs by batch.
+    """
+
+    if self.validate() == False:
+      logging.error("Fail to load the model")
+      return
+
+    session, meta_graph = self.load_model()
+    signature_name, model_graph_signature = ModelUtil.get_signature(
+        meta_graph, signature_name)
+
+    batch_reader = create_batch_reader(
+        input_path,
+        sorted(model_graph_signature.inputs.items()),
+        batch_size,
+        compression_type=compression_type)
+
+    batch_predictor = BatchPredictor(session, model_graph_signature,
+                                     queue_size)
+    prediction_writer = create_prediction_writer(
+        predictions_path, batch_predictor.output_names)
+
+    logging.info("Predict {} with signature: {}, batch size: {}".format(
+        input_path, signature_name, batch_size))
+    predict_stats = batch_predictor.predict(batch_reader, prediction_writer)
+    predict_stats.update({
+        "signature_name": signature_name,
+        "batch_size": batch_size,
+        "predictions_path": predictions_path
+    })
+
+    table = PrettyTable()
+    table.field_names = ["Metric", "Value"]
+    table.add_row(["Rows", predict_stats["rows"]])
+    table.add_row(["Batches", predict_stats["batches"]])
+    table.add_row(["Time(s)", round(predict_stats["elapsed_time"], 3)])
+    table.add_row(["Rows/s", round(predict_stats["rows_per_second"], 2)])
+    # The stage with the most time is the bottleneck of the pipeline
+    table.add_row(["ReadTime(s)", round(predict_stats["read_time"], 3)])
+    table.add_row(["RunTime(s)", round(predict_stats["run_time"], 3)])
+    table.add_row(["WriteTime(s)", round(predict_stats["write_time"], 3)])
+    print(table)
+
+    return predict_stats
+
+  def verify_model(self,
+                   session_configs=None,
+                   batch_size=32,
+                   split_sizes=None,
+                   repeats=3,
+                   tolerance=0.0,
+                   input_source=None,
+                   signature_name=None):
+    """
+    Compare the outputs of the same inputs across runs, session configs and batch splits.
+
+    The reference is the first run of the whole batch with the default
+    session. Each check fails if the max abs difference of any output is
+    larger than the tolerance. Return the records of each check and output.
+    The session configs are checked in separate processes, and the outputs
+    without the batch dimension are skipped in the split checks.
+    """
+
+    if self.validate() == False:
+      logging.error("Fail to load the model")
+      return
+
+    session, meta_graph = self.load_model()
+    signature_name, model_graph_signature = ModelUtil.get_signature(
+        meta_graph, signature_name)
+
+    if input_source is None:
+      input_source = ConstantInputSource()
+    if split_sizes is None:
+      split_sizes = [1]
+
+    input_items = list(model_graph_signature.inputs.items())
+    # Example: [("scores", TensorInfo)]
+    output_items = sorted(model_graph_signature.outputs.items())
+    output_tensor_names = [item[1].name for item in output_items]
+
+    # Use the same arrays in all the checks
+    feed_dict_map = dict(input_source.get_batch(input_items, batch_size))
+    expected_outputs = session.run(
+        output_tensor_names, feed_dict=feed_dict_map)
+
+    def run_with_split(run_session, split_size):
+      """
+      Run the batch in chunks of the split size and concatenate the outputs.
+      """
+
+      # Example: [(1, [np.ndarray])]
+      chunk_outputs = []
+      for start_row in range(0, batch_size, split_size):
+        chunk_row_number = min(split_size, batch_size - start_row)
+        chunk_feed_dict_map = dict(
+            (name, array[start_row:start_row + split_size])
+            for name, array in feed_dict_map.items())
+        chunk_outputs.append((chunk_row_number,
+                              run_session.run(
+                                  output_tensor_names,
+                                  feed_dict=chunk_feed_dict_map)))
+
+      outputs = []
+      for index in range(len(output_tensor_names)):
+        # Only the outputs with the batch dimension can be concatenated
+        if all(
+            np.ndim(chunk[index]) > 0 and len(chunk[index]) == chunk_row_number
+            for chunk_row_number, chunk in chunk_outputs):
+          outputs.append(
+              np.concatenate([chunk[index] for _, chunk in chunk_outputs]))
+        else:
+          outputs.append(None)
+      return outputs
+
+    # Example: [("repeat 1", [np.ndarray])]
+    check_outputs = []
+
+    for i in range(repeats):
+      check_outputs.append(("repeat {}".format(i + 1),
+                            session.run(
+                                output_tensor_names,
+                                feed_dict=feed_dict_map)))
+
+    for split_size in split_sizes:
+      check_outputs.append(("split {}".format(split_size),
+                            run_with_split(session, split_size)))
+
+    # The thread pools only take effect in a new process like the benchmark
+    for config_name, session_config in session_configs or []:
+      check_outputs.append(("config {}".format(config_name),
+                            self.run_method_in_process(
+                                "run_signature", {
+                                    "feed_dict_map": feed_dict_map,
+                                    "output_tensor_names": output_tensor_names
+                                },
+                                session_config=session_config)))
+
+    verify_records = []
+
+    table = PrettyTable()
+    table.field_names = [
+        "Check", "Output", "MaxAbsDiff", "MaxRelativeDiff", "Consistent"
+    ]
+
+    for check_name, outputs in check_outputs:
+      for item, expected_output, output in zip(output_items, expected_outputs,
+                                               outputs):
+        if output is None:
+          continue
+
+        difference = ModelUtil.get_output_difference(expected_output, output)
+        is_consistent = difference["max_abs_error"] <= tolerance
+
+        table.add_row([
+            check_name, item[0], difference["max_abs_error"],
+            difference["max_relative_error"], is_consistent
+        ])
+
+        verify_records.append({
+            "signature_name": signature_name,
+            "batch_size": batch_size,
+            "check": check_name,
+            "output_name": item[0],
+            "max_abs_difference": difference["max_abs_error"],
+            "max_relative_difference": difference["max_relative_error"],
+            "consistent": is_consistent
+        })
+
+    print(table)
+
+    inconsistent_number = len(
+        [record for record in verify_records if not record["consistent"]])
+    if inconsistent_number > 0:
+      logging.error("Get {} inconsistent outputs over the tolerance {}".format(
+          inconsistent_number, tolerance))
+    else:
+      logging.info("All the outputs are consistent within the tolerance {}".
+                   format(tolerance))
+
+    return verify_records
+
+  def run_signature(self,
+                    feed_dict_map,
+                    output_tensor_names,
+                    model_version_path=None,
+                    session_config=None):
+    """
+    Load the model with the session config and return the outputs of the feed dict.
+    """
+
+    session, _ = self.load_model(
+        model_version_path, session_config=session_config)
+    return session.run(output_tensor_names, feed_dict=feed_dict_map)
+
+  @staticmethod
+  def trace_model(session,
+                  output_op_names,
+                  input_items,
+                  batch_size=1,
+                  iterations=10,
+                  warmup_iterations=2,
+                  input_source=None):
+    """
+    Run the model with full tracing and return the OpProfiler of the runs.
+    """
+
+    if iterations < 1:
+      raise ValueError("Invalid iterations to trace: {}".format(iterations))
+
+    if input_source is None:
+      input_source = ConstantInputSource()
+
+    # Exclude the first runs which include the graph optimization cost
+    for i in range(warmup_iterations):
+      session.run(
+          output_op_names,
+          feed_dict=input_source.get_batch(input_items, batch_size))
+
+    op_profiler = OpProfiler(session.graph)
+    run_options = tf.RunOptions(trace_level=tf.RunOptions.FULL_TRACE)
+
+    for i in range(iterations):
+      run_metadata = tf.RunMetadata()
+      session.run(
+          output_op_names,
+          feed_dict=input_source.get_batch(input_items, batch_size),
+          options=run_options,
+          run_metadata=run_metadata)
+      op_profiler.add_run_metadata(run_metadata)
+
+    return op_profiler
+
+  def profile_model(self,
+                    batch_size=1,
+                    iterations=10,
+                    warmup_iterations=2,
+                    top_number=20,
+                    chrome_trace_path=None,
+                    signature_name=None,
+                    input_source=None):
+    """
+    Run the signature with full tracing and print the hottest ops.
+    """
+
+    if self.validate() == False:
+      logging.error("Fail to load the model")
+      return
+
+    session, meta_graph = self.load_model()
 
     # Get the model signature
-    model_graph_signature = list(meta_graph.signature_def.items())[0][1]
+    signature_name, model_graph_signature = ModelUtil.get_signature(
+        meta_graph, signature_name)
 
     # Generate output op names for infernece
     output_op_names = []
@@ -230,26 +1612,110 @@ class SavedmodelAnalyst(object):
       output_op_name = item[1].name
       output_op_names.append(output_op_name)
 
-    input_items = model_graph_signature.inputs.items()
+    input_items = list(model_graph_signature.inputs.items())
 
-    batch_size_list = [1, 10, 1000, 10000, 100000]
+    op_profiler = self.trace_model(session, output_op_names, input_items,
+                                   batch_size, iterations, warmup_iterations,
+                                   input_source)
 
-    for batch_size in batch_size_list:
-      feed_dict_map = ModelUtil.construct_feed_dict_with_batch(
-          input_items, batch_size)
+    logging.info("Profile signature: {}, batch size: {}, iterations: {}".format(
+        signature_name, batch_size, iterations))
+    op_profiler.print_hot_ops(top_number)
 
-      #logging.info("Generate input feed_dict: {}".format(feed_dict_map))
+    if chrome_trace_path is not None:
+      op_profiler.export_chrome_trace(chrome_trace_path)
 
-      start_time = time.time()
-      # Example: [array([[1., 1.], [1., 1.]], dtype=float32), array([[1], [1]], dtype=int32), array([1, 1])]
-      result_ndarrays = session.run(output_op_names, feed_dict=feed_dict_map)
+    return op_profiler
 
-      inference_time = time.time() - start_time
-      qps = 1.0 / inference_time
+  def estimate_model_cost(self,
+                          batch_size=1,
+                          top_number=20,
+                          signature_name=None):
+    """
+    Estimate FLOPs, parameters and peak activation memory without running the model.
+    """
+
+    if self.model_file_exist == False:
+      logging.error("The model path does not exist: {}".format(
+          self.savedmodel_path))
+      return
 
-      #logging.info("Inference resuolt: {}".format(result_ndarrays))
-      logging.info("Inference batch size: {}, time: {}s, qps: {}".format(
-          batch_size, inference_time, qps))
+    meta_graph_def = ModelUtil.read_meta_graph_def(self.model_version_path,
+                                                   self.tags)
+
+    graph_cost_estimator = GraphCostEstimator(meta_graph_def, signature_name,
+                                              batch_size)
+
+    # Example: "./model/1/variables/variables"
+    checkpoint_prefix = os.path.join(self.model_version_path, "variables",
+                                     "variables")
+    if not os.path.exists(checkpoint_prefix + ".index"):
+      checkpoint_prefix = None
+
+    return graph_cost_estimator.print_report(checkpoint_prefix, top_number)
+
+  def analyze_critical_path(self,
+                            batch_size=1,
+                            cost_source="flops",
+                            iterations=10,
+                            top_number=20,
+                            signature_name=None,
+                            input_source=None):
+    """
+    Print the critical path and the parallelism of the graph pruned to the signature outputs.
+
+    The cost of each op is the estimated FLOPs, or the measured compute time
+    with the cost source "profile" which loads and runs the model.
+    """
+
+    if cost_source not in ["flops", "profile"]:
+      raise ValueError("Unsupported cost source: {}".format(cost_source))
+
+    if self.model_file_exist == False:
+      logging.error("The model path does not exist: {}".format(
+          self.savedmodel_path))
+      return
+
+    meta_graph_def = ModelUtil.read_meta_graph_def(self.model_version_path,
+                                                   self.tags)
+
+    graph_cost_estimator = GraphCostEstimator(meta_graph_def, signature_name,
+                                              batch_size)
+    pruned_ops = graph_cost_estimator.get_pruned_ops()
+
+    if cost_source == "flops":
+      op_cost_map = graph_cost_estimator.estimate_flops()
+      cost_unit = "FLOPs"
+
+    else:
+      session, meta_graph = self.load_model()
+      signature_name, model_graph_signature = ModelUtil.get_signature(
+          meta_graph, signature_name)
+
+      output_op_names = [
+          tensor_info.name
+          for tensor_info in model_graph_signature.outputs.values()
+      ]
+      input_items = list(model_graph_signature.inputs.items())
+
+      # The loaded graph has the same op names as the imported MetaGraphDef
+      op_profiler = self.trace_model(session, output_op_names, input_items,
+                                     batch_size, iterations,
+                                     input_source=input_source)
+      op_cost_map = dict((op_record["op_name"], op_record["compute_micros"])
+                         for op_record in op_profiler.get_op_records())
+      cost_unit = "Time(us)"
+
+    logging.info("Analyze signature: {}, batch size: {}, cost source: {}".format(
+        graph_cost_estimator.signature_name, batch_size, cost_source))
+
+    critical_path_analyzer = CriticalPathAnalyzer(pruned_ops, op_cost_map,
+                                                  cost_unit)
+    critical_path_record = critical_path_analyzer.analyze(top_number)
+    critical_path_record["signature_name"] = graph_cost_estimator.signature_name
+    critical_path_record["batch_size"] = batch_size
+
+    return critical_path_record
 
   def export_tensorboard_files(self, tensorboard_path):
     """
@@ -260,18 +1726,11 @@ class SavedmodelAnalyst(object):
       logging.error("Fail to load the model")
       return
 
-    try:
-      graph = graph = tf.Graph()
-      session = tf.Session()
+    session, meta_graph = self.load_model()
 
+    try:
       #merged = tf.summary.merge_all()
 
-      meta_graph = tf.saved_model.loader.load(
-          session, [tf.saved_model.tag_constants.SERVING],
-          self.model_version_path)
-      logging.info("Succeed to load model in: {}".format(
-          self.model_version_path))
-
       tensorboard_writer = tf.summary.FileWriter(tensorboard_path,
                                                  session.graph)
       #tensorboard_writer.add_summary(summary)
@@ -281,7 +1740,7 @@ class SavedmodelAnalyst(object):
       logging.info("Fail to benchmark model and error: {}".format(e))
 
     # Get the model signature
-    model_graph_signature = list(meta_graph.signature_def.items())[0][1]
+    signature_name, model_graph_signature = ModelUtil.get_signature(meta_graph)
 
     # Generate output op names for infernece
     output_op_names = []
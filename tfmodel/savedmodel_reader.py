@@ -0,0 +1,574 @@
+import logging
+import os
+from prettytable import PrettyTable
+
+# The SavedModel tag for serving, same as tf.saved_model.tag_constants.SERVING
+SERVING_TAG = "serve"
+
+# The protobuf wire types, refer to https://developers.google.com/protocol-buffers/docs/encoding
+WIRE_TYPE_VARINT = 0
+WIRE_TYPE_FIXED64 = 1
+WIRE_TYPE_LENGTH_DELIMITED = 2
+WIRE_TYPE_FIXED32 = 5
+
+# The enum name, NumPy name and little-endian NumPy dtype of the dtype enums, refer to tensorflow/core/framework/types.proto
+DTYPE_MAP = {
+    1: ("DT_FLOAT", "float32", "<f4"),
+    2: ("DT_DOUBLE", "float64", "<f8"),
+    3: ("DT_INT32", "int32", "<i4"),
+    4: ("DT_UINT8", "uint8", "u1"),
+    5: ("DT_INT16", "int16", "<i2"),
+    6: ("DT_INT8", "int8", "i1"),
+    7: ("DT_STRING", "string", None),
+    8: ("DT_COMPLEX64", "complex64", "<c8"),
+    9: ("DT_INT64", "int64", "<i8"),
+    10: ("DT_BOOL", "bool", "?"),
+    11: ("DT_QINT8", "qint8", None),
+    12: ("DT_QUINT8", "quint8", None),
+    13: ("DT_QINT32", "qint32", None),
+    14: ("DT_BFLOAT16", "bfloat16", None),
+    15: ("DT_QINT16", "qint16", None),
+    16: ("DT_QUINT16", "quint16", None),
+    17: ("DT_UINT16", "uint16", "<u2"),
+    18: ("DT_COMPLEX128", "complex128", "<c16"),
+    19: ("DT_HALF", "float16", "<f2"),
+    20: ("DT_RESOURCE", "resource", None),
+    21: ("DT_VARIANT", "variant", None),
+    22: ("DT_UINT32", "uint32", "<u4"),
+    23: ("DT_UINT64", "uint64", "<u8")
+}
+
+# The names of the dtype enums, example: {1: "DT_FLOAT"}
+DTYPE_NAME_MAP = dict((dtype, names[0]) for dtype, names in DTYPE_MAP.items())
+
+
+class TensorShape(object):
+  """
+  The TensorShapeProto with the dims, example: [-1, 9].
+  """
+
+  def __init__(self, dim=None, unknown_rank=False):
+    self.dim = dim or []
+    self.unknown_rank = unknown_rank
+
+
+class Dim(object):
+  """
+  The dim of the TensorShapeProto.
+  """
+
+  def __init__(self, size=0, name=""):
+    self.size = size
+    self.name = name
+
+
+class CooSparse(object):
+  """
+  The tensor names of the SparseTensor in the TensorInfo.
+  """
+
+  def __init__(self):
+    self.values_tensor_name = ""
+    self.indices_tensor_name = ""
+    self.dense_shape_tensor_name = ""
+
+
+class CompositeTensor(object):
+  """
+  The component TensorInfo of the composite tensor like RaggedTensor.
+  """
+
+  def __init__(self):
+    self.components = []
+
+
+class TensorInfo(object):
+  """
+  The TensorInfo of the signature with the tensor name, dtype enum and shape.
+
+  The sparse and composite tensors have no name but the tensors in
+  coo_sparse or the components of composite_tensor.
+  """
+
+  def __init__(self, name="", dtype=0, tensor_shape=None):
+    self.name = name
+    self.dtype = dtype
+    self.tensor_shape = tensor_shape or TensorShape()
+    self.coo_sparse = CooSparse()
+    self.composite_tensor = CompositeTensor()
+
+
+class SignatureDef(object):
+  """
+  The SignatureDef with the maps of input and output TensorInfo.
+  """
+
+  def __init__(self, inputs=None, outputs=None, method_name=""):
+    self.inputs = inputs or {}
+    self.outputs = outputs or {}
+    self.method_name = method_name
+
+
+class MetaGraph(object):
+  """
+  The fields of MetaGraphDef for inspecting without the graph nodes.
+  """
+
+  def __init__(self):
+    self.tags = []
+    self.tensorflow_version = ""
+    self.signature_def = {}
+    # The node names of the GraphDef, only parsed for structural validation
+    self.node_names = set()
+    self.node_ops = set()
+
+
+class SavedmodelReader(object):
+  """
+  The reader to parse saved_model.pb as protobuf without importing TensorFlow.
+
+  It decodes only the fields for the signatures and skips the GraphDef by
+  its length, so inspecting a large model takes milliseconds.
+  """
+
+  def __init__(self, savedmodel_path, tags=None):
+    """
+    Get the base model path and get the model versions.
+    """
+
+    self.savedmodel_path = savedmodel_path
+
+    if tags is None:
+      tags = [SERVING_TAG]
+    self.tags = tags
+
+    if os.path.isdir(self.savedmodel_path):
+      # Get model version in numeric order, example: ["1", "2"]
+      self.model_version_list = self.sort_model_versions(
+          os.listdir(self.savedmodel_path))
+      logging.info("Get model versions: {}".format(self.model_version_list))
+
+      if self.model_version_list:
+        # Use the latest model version like TF Serving, example: "./model/2"
+        self.model_version_path = os.path.join(self.savedmodel_path,
+                                               self.model_version_list[-1])
+        self.model_file_exist = True
+      else:
+        self.model_file_exist = False
+        logging.error("No model version in: {}".format(self.savedmodel_path))
+
+    else:
+      # Set false if model does not exist
+      self.model_file_exist = False
+      logging.error("The model path does not exist: {}".format(
+          self.savedmodel_path))
+
+  @staticmethod
+  def sort_model_versions(model_version_list):
+    """
+    Sort the model versions in numeric order, example: ["10", "9"] -> ["9", "10"].
+    """
+
+    # TF Serving ignores the directories which are not numeric versions
+    numeric_versions = [
+        version for version in model_version_list if version.isdigit()
+    ]
+    if not numeric_versions:
+      return sorted(model_version_list)
+
+    return sorted(numeric_versions, key=int)
+
+  @staticmethod
+  def read_varint(buffer, position):
+    """
+    Read the varint from the bytearray and return the value and the next position.
+    """
+
+    result = 0
+    shift = 0
+
+    while True:
+      byte = buffer[position]
+      position += 1
+      result |= (byte & 0x7f) << shift
+      if not byte & 0x80:
+        break
+      shift += 7
+
+    # The negative int64 is encoded as ten bytes, example: -1 for unknown dims
+    if result >= 1 << 63:
+      result -= 1 << 64
+
+    return result, position
+
+  @staticmethod
+  def iterate_fields(buffer, start, end):
+    """
+    Iterate the fields of the message, example: (1, WIRE_TYPE_VARINT, 9, None).
+
+    The value of the length-delimited field is the (start, end) of its bytes.
+    """
+
+    position = start
+
+    while position < end:
+      key, position = SavedmodelReader.read_varint(buffer, position)
+      field_number = key >> 3
+      wire_type = key & 0x7
+
+      if wire_type == WIRE_TYPE_VARINT:
+        value, position = SavedmodelReader.read_varint(buffer, position)
+        yield field_number, wire_type, value
+      elif wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+        length, position = SavedmodelReader.read_varint(buffer, position)
+        yield field_number, wire_type, (position, position + length)
+        position += length
+      elif wire_type == WIRE_TYPE_FIXED64:
+        position += 8
+      elif wire_type == WIRE_TYPE_FIXED32:
+        position += 4
+      else:
+        raise ValueError("Unsupported protobuf wire type: {}".format(
+            wire_type))
+
+  @staticmethod
+  def decode_string(buffer, value_range):
+    return bytes(buffer[value_range[0]:value_range[1]]).decode("utf-8")
+
+  @staticmethod
+  def parse_tensor_shape(buffer, start, end):
+    tensor_shape = TensorShape()
+
+    for field_number, wire_type, value in SavedmodelReader.iterate_fields(
+        buffer, start, end):
+      if field_number == 2 and wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+        dim = Dim()
+        for dim_field_number, dim_wire_type, dim_value in SavedmodelReader.iterate_fields(
+            buffer, value[0], value[1]):
+          if dim_field_number == 1 and dim_wire_type == WIRE_TYPE_VARINT:
+            dim.size = dim_value
+          elif dim_field_number == 2 and dim_wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+            dim.name = SavedmodelReader.decode_string(buffer, dim_value)
+        tensor_shape.dim.append(dim)
+      elif field_number == 3 and wire_type == WIRE_TYPE_VARINT:
+        tensor_shape.unknown_rank = bool(value)
+
+    return tensor_shape
+
+  @staticmethod
+  def parse_tensor_info(buffer, start, end):
+    tensor_info = TensorInfo()
+
+    for field_number, wire_type, value in SavedmodelReader.iterate_fields(
+        buffer, start, end):
+      if field_number == 1 and wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+        tensor_info.name = SavedmodelReader.decode_string(buffer, value)
+      elif field_number == 2 and wire_type == WIRE_TYPE_VARINT:
+        tensor_info.dtype = value
+      elif field_number == 3 and wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+        tensor_info.tensor_shape = SavedmodelReader.parse_tensor_shape(
+            buffer, value[0], value[1])
+      elif field_number == 4 and wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+        tensor_info.coo_sparse = SavedmodelReader.parse_coo_sparse(
+            buffer, value[0], value[1])
+      elif field_number == 5 and wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+        # The field 1 is the TypeSpecProto and the field 2 is the components
+        for sub_field_number, sub_wire_type, sub_value in SavedmodelReader.iterate_fields(
+            buffer, value[0], value[1]):
+          if sub_field_number == 2 and sub_wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+            tensor_info.composite_tensor.components.append(
+                SavedmodelReader.parse_tensor_info(buffer, sub_value[0],
+                                                   sub_value[1]))
+
+    return tensor_info
+
+  @staticmethod
+  def parse_coo_sparse(buffer, start, end):
+    coo_sparse = CooSparse()
+
+    for field_number, wire_type, value in SavedmodelReader.iterate_fields(
+        buffer, start, end):
+      if field_number == 1 and wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+        coo_sparse.values_tensor_name = SavedmodelReader.decode_string(
+            buffer, value)
+      elif field_number == 2 and wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+        coo_sparse.indices_tensor_name = SavedmodelReader.decode_string(
+            buffer, value)
+      elif field_number == 3 and wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+        coo_sparse.dense_shape_tensor_name = SavedmodelReader.decode_string(
+            buffer, value)
+
+    return coo_sparse
+
+  @staticmethod
+  def parse_map_entry(buffer, start, end, parse_value):
+    """
+    Parse the map entry whose key is the string, example: ("features", TensorInfo).
+    """
+
+    key = ""
+    map_value = None
+
+    for field_number, wire_type, value in SavedmodelReader.iterate_fields(
+        buffer, start, end):
+      if field_number == 1 and wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+        key = SavedmodelReader.decode_string(buffer, value)
+      elif field_number == 2 and wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+        map_value = parse_value(buffer, value[0], value[1])
+
+    return key, map_value
+
+  @staticmethod
+  def parse_signature_def(buffer, start, end):
+    signature_def = SignatureDef()
+
+    for field_number, wire_type, value in SavedmodelReader.iterate_fields(
+        buffer, start, end):
+      if field_number == 1 and wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+        name, tensor_info = SavedmodelReader.parse_map_entry(
+            buffer, value[0], value[1], SavedmodelReader.parse_tensor_info)
+        signature_def.inputs[name] = tensor_info
+      elif field_number == 2 and wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+        name, tensor_info = SavedmodelReader.parse_map_entry(
+            buffer, value[0], value[1], SavedmodelReader.parse_tensor_info)
+        signature_def.outputs[name] = tensor_info
+      elif field_number == 3 and wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+        signature_def.method_name = SavedmodelReader.decode_string(
+            buffer, value)
+
+    return signature_def
+
+  @staticmethod
+  def parse_graph_def_nodes(buffer, start, end, meta_graph):
+    """
+    Parse the name and op of each NodeDef in the GraphDef.
+    """
+
+    for field_number, wire_type, value in SavedmodelReader.iterate_fields(
+        buffer, start, end):
+      if field_number == 1 and wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+        for node_field_number, node_wire_type, node_value in SavedmodelReader.iterate_fields(
+            buffer, value[0], value[1]):
+          if node_field_number == 1 and node_wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+            meta_graph.node_names.add(
+                SavedmodelReader.decode_string(buffer, node_value))
+          elif node_field_number == 2 and node_wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+            meta_graph.node_ops.add(
+                SavedmodelReader.decode_string(buffer, node_value))
+
+  @staticmethod
+  def parse_meta_graph(buffer, start, end, parse_nodes=False):
+    meta_graph = MetaGraph()
+
+    for field_number, wire_type, value in SavedmodelReader.iterate_fields(
+        buffer, start, end):
+      if wire_type != WIRE_TYPE_LENGTH_DELIMITED:
+        continue
+
+      if field_number == 1:
+        # The MetaInfoDef with the tags and the TensorFlow version
+        for info_field_number, info_wire_type, info_value in SavedmodelReader.iterate_fields(
+            buffer, value[0], value[1]):
+          if info_field_number == 4 and info_wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+            meta_graph.tags.append(
+                SavedmodelReader.decode_string(buffer, info_value))
+          elif info_field_number == 5 and info_wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+            meta_graph.tensorflow_version = SavedmodelReader.decode_string(
+                buffer, info_value)
+      elif field_number == 2 and parse_nodes:
+        SavedmodelReader.parse_graph_def_nodes(buffer, value[0], value[1],
+                                               meta_graph)
+      elif field_number == 5:
+        name, signature_def = SavedmodelReader.parse_map_entry(
+            buffer, value[0], value[1], SavedmodelReader.parse_signature_def)
+        meta_graph.signature_def[name] = signature_def
+
+    return meta_graph
+
+  def is_binary_format(self, model_version_path=None):
+    """
+    Check if the version has saved_model.pb, the text format saved_model.pbtxt needs TensorFlow to parse.
+    """
+
+    if model_version_path is None:
+      model_version_path = self.model_version_path
+
+    return os.path.exists(os.path.join(model_version_path, "saved_model.pb"))
+
+  def read_meta_graph(self, model_version_path=None, parse_nodes=False):
+    """
+    Parse the MetaGraph of the tags from saved_model.pb.
+    """
+
+    if model_version_path is None:
+      model_version_path = self.model_version_path
+
+    if not self.is_binary_format(model_version_path) and os.path.exists(
+        os.path.join(model_version_path, "saved_model.pbtxt")):
+      raise ValueError(
+          "The text format saved_model.pbtxt needs TensorFlow to parse: {}".
+          format(model_version_path))
+
+    saved_model_pb_path = os.path.join(model_version_path, "saved_model.pb")
+
+    with open(saved_model_pb_path, "rb") as f:
+      buffer = bytearray(f.read())
+
+    # The SavedModel has the repeated MetaGraphDef in field 2
+    for field_number, wire_type, value in self.iterate_fields(
+        buffer, 0, len(buffer)):
+      if field_number == 2 and wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+        meta_graph = self.parse_meta_graph(buffer, value[0], value[1],
+                                           parse_nodes)
+        if set(meta_graph.tags) == set(self.tags):
+          return meta_graph
+
+    raise ValueError("MetaGraphDef with tags {} does not exist in: {}".format(
+        self.tags, model_version_path))
+
+  def validate_structure(self, model_version_path=None):
+    """
+    Validate the files and the signatures without loading the model.
+
+    Return the list of the errors, which is empty for the valid model.
+    """
+
+    if self.model_file_exist == False:
+      return ["The model path does not exist: {}".format(self.savedmodel_path)]
+
+    if model_version_path is None:
+      model_version_path = self.model_version_path
+
+    try:
+      meta_graph = self.read_meta_graph(model_version_path, parse_nodes=True)
+    except Exception as e:
+      return ["Fail to parse saved_model.pb: {}".format(e)]
+
+    errors = []
+
+    if not meta_graph.signature_def:
+      errors.append("No signature in the MetaGraphDef")
+
+    # Check if the signature tensors exist, example: "Placeholder:0"
+    for signature_name, signature_def in meta_graph.signature_def.items():
+      for tensor_info in list(signature_def.inputs.values()) + list(
+          signature_def.outputs.values()):
+        tensor_names = self.get_tensor_names(tensor_info)
+        if not tensor_names:
+          errors.append("The tensor of signature {} has no name".format(
+              signature_name))
+
+        for tensor_name in tensor_names:
+          if tensor_name.split(":")[0] not in meta_graph.node_names:
+            errors.append("The tensor {} of signature {} is not in the graph".
+                          format(tensor_name, signature_name))
+
+    # The variables need the checkpoint index and data files to restore
+    variable_ops = set(["VariableV2", "Variable", "VarHandleOp"])
+    if meta_graph.node_ops & variable_ops:
+      variables_path = os.path.join(model_version_path, "variables")
+      if not os.path.exists(os.path.join(variables_path, "variables.index")):
+        errors.append("The variables index does not exist in: {}".format(
+            variables_path))
+      elif not [
+          filename for filename in os.listdir(variables_path)
+          if filename.startswith("variables.data-")
+      ]:
+        errors.append("The variables data does not exist in: {}".format(
+            variables_path))
+
+    return errors
+
+  def inspect_model(self, model_version_path=None):
+    """
+    Inspect the model to print the model signatures without TensorFlow.
+    """
+
+    if self.model_file_exist == False:
+      logging.error("The model path does not exist: {}".format(
+          self.savedmodel_path))
+      return
+
+    meta_graph = self.read_meta_graph(model_version_path)
+
+    tensor_records = []
+
+    # Print all the model signatures, example: ["serving_default"]
+    for signature_name in sorted(meta_graph.signature_def.keys()):
+      tensor_records.extend(
+          self.print_signature(signature_name,
+                               meta_graph.signature_def[signature_name]))
+
+    return tensor_records
+
+  @staticmethod
+  def get_tensor_names(tensor_info):
+    """
+    Get the graph tensors of the TensorInfo, example: ["Placeholder:0"].
+
+    The sparse tensor has the values, indices and dense shape tensors, and
+    the composite tensor has the components instead of the name.
+    """
+
+    tensor_names = []
+    if tensor_info.name:
+      tensor_names.append(tensor_info.name)
+
+    coo_sparse = tensor_info.coo_sparse
+    for tensor_name in [
+        coo_sparse.values_tensor_name, coo_sparse.indices_tensor_name,
+        coo_sparse.dense_shape_tensor_name
+    ]:
+      if tensor_name:
+        tensor_names.append(tensor_name)
+
+    # The old TensorFlow does not have the composite tensor
+    composite_tensor = getattr(tensor_info, "composite_tensor", None)
+    if composite_tensor is not None:
+      for component in composite_tensor.components:
+        tensor_names.extend(SavedmodelReader.get_tensor_names(component))
+
+    return tensor_names
+
+  @staticmethod
+  def print_signature(signature_name, model_graph_signature):
+    """
+    Print the tables of the input and output tensors of the signature.
+    """
+
+    tensor_records = []
+
+    logging.info("Print the signature of the model")
+    logging.info("Model signature name: {}, method: {}".format(
+        signature_name, model_graph_signature.method_name))
+
+    for tensor_type, tensor_info_map in [
+        ("input", model_graph_signature.inputs),
+        ("output", model_graph_signature.outputs)
+    ]:
+      table = PrettyTable()
+      table.field_names = [
+          "{}Name".format(tensor_type.capitalize()), "OpName", "DType", "Shape"
+      ]
+
+      # Example: ("features", TensorInfo of "Placeholder:0")
+      for name, tensor_info in tensor_info_map.items():
+        op_name = ",".join(SavedmodelReader.get_tensor_names(tensor_info))
+        dtype = DTYPE_NAME_MAP.get(tensor_info.dtype, tensor_info.dtype)
+        # Example: [-1, 9]
+        shape = [dim.size for dim in tensor_info.tensor_shape.dim]
+
+        table.add_row([name, op_name, dtype, shape])
+        tensor_records.append({
+            "signature_name": signature_name,
+            "method_name": model_graph_signature.method_name,
+            "tensor_type": tensor_type,
+            "name": name,
+            "op_name": op_name,
+            "dtype": str(dtype),
+            "shape": shape
+        })
+
+      print(table)
+
+    return tensor_records
@@ -1,5 +1,10 @@
+import itertools
+import os
+import resource
 import numpy as np
 import tensorflow as tf
+from google.protobuf import text_format
+from tensorflow.core.protobuf import saved_model_pb2
 
 
 class ModelUtil(object):
@@ -8,9 +13,101 @@ class ModelUtil(object):
   """
 
   @staticmethod
-  def construct_feed_dict_with_batch(input_items, batch_size=1):
-    #batch_size = 100000
+  def read_meta_graph_def(model_version_path, tags):
+    """
+    Parse the MetaGraphDef of the tags from the SavedModel file without the session.
+    """
+
+    saved_model = saved_model_pb2.SavedModel()
+
+    saved_model_pb_path = os.path.join(model_version_path, "saved_model.pb")
+    saved_model_pbtxt_path = os.path.join(model_version_path,
+                                          "saved_model.pbtxt")
+
+    if os.path.exists(saved_model_pb_path):
+      with open(saved_model_pb_path, "rb") as f:
+        saved_model.ParseFromString(f.read())
+    elif os.path.exists(saved_model_pbtxt_path):
+      with open(saved_model_pbtxt_path, "r") as f:
+        text_format.Merge(f.read(), saved_model)
+    else:
+      raise IOError("SavedModel file does not exist in: {}".format(
+          model_version_path))
+
+    for meta_graph_def in saved_model.meta_graphs:
+      if set(meta_graph_def.meta_info_def.tags) == set(tags):
+        return meta_graph_def
+
+    raise ValueError("MetaGraphDef with tags {} does not exist in: {}".format(
+        tags, model_version_path))
+
+  @staticmethod
+  def get_signature(meta_graph, signature_name=None):
+    """
+    Get the signature name and the SignatureDef, use the serving default by default.
+    """
+
+    # Example: "serving_default"
+    default_signature_name = tf.saved_model.signature_constants.DEFAULT_SERVING_SIGNATURE_DEF_KEY
+
+    if signature_name is None:
+      if default_signature_name in meta_graph.signature_def:
+        signature_name = default_signature_name
+      else:
+        signature_name = sorted(meta_graph.signature_def.keys())[0]
+
+    return signature_name, meta_graph.signature_def[signature_name]
+
+  @staticmethod
+  def get_numpy_dtype(dtype):
+    """
+    Get the NumPy dtype of the TensorFlow dtype enum, example: 1 -> np.float32.
+    """
+
+    # Refer to https://www.tensorflow.org/api_docs/python/tf/DType
+    return np.dtype(tf.as_dtype(dtype).as_numpy_dtype)
+
+  @staticmethod
+  def get_default_value(dtype):
+    """
+    Get the constant value to fill the mock input of the TensorFlow dtype enum.
+    """
+
+    if dtype == int(tf.string):
+      return b"A"
+    elif dtype == int(tf.bool):
+      return True
+    else:
+      # NumPy casts it to 1, 1.0 or (1+0j) for the numeric types
+      return 1
 
+  @staticmethod
+  def get_shape_with_batch(tensor_info, batch_size=1):
+    """
+    Get the concrete shape of the tensor by replacing unknown dims with batch size.
+    """
+
+    # Example: [-1, 9] -> [batch_size, 9]
+    return tuple(batch_size if dim.size == -1 else dim.size
+                 for dim in tensor_info.tensor_shape.dim)
+
+  @staticmethod
+  def get_feed_dict_bytes(input_items, batch_size=1):
+    """
+    Get the bytes of the mock inputs with the batch size without allocating them.
+    """
+
+    feed_bytes = 0
+
+    for item in input_items:
+      shape = ModelUtil.get_shape_with_batch(item[1], batch_size)
+      itemsize = ModelUtil.get_numpy_dtype(item[1].dtype).itemsize
+      feed_bytes += int(np.prod(shape)) * itemsize
+
+    return feed_bytes
+
+  @staticmethod
+  def construct_feed_dict_with_batch(input_items, batch_size=1):
     # Generate feed dict data for inference, example: {u'Softmax_2:0': [[1.0, 1.0], [1.0, 1.0]], u'Identity:0': [[1], [1]], u'ArgMax_2:0': [1, 1]}
     feed_dict_map = {}
 
@@ -18,45 +115,161 @@ class ModelUtil(object):
       # Example: "Placeholder_0"
       input_op_name = item[1].name
 
-      shape_list = [dim.size for dim in item[1].tensor_shape.dim]
-      shape_number = len(shape_list)
-
+      shape = ModelUtil.get_shape_with_batch(item[1], batch_size)
       dtype = item[1].dtype
 
-      # Use to generated the nested array
-      internal_array = None
-
-      # Travel all the dims in reverse order
-      for i in range(shape_number):
-        dim = shape_list[shape_number - 1 - i]
-
-        if dim == -1:
-          dim = batch_size
-
-        if internal_array == None:
-          # Fill with default values by the types, refer to https://www.tensorflow.org/api_docs/python/tf/DType
-          if dtype == int(tf.int8) or dtype == int(tf.uint8) or dtype == int(
-              tf.int16) or dtype == int(tf.uint16) or dtype == int(
-                  tf.int32) or dtype == int(tf.uint32) or dtype == int(
-                      tf.int64) or dtype == int(tf.uint64):
-            value = 1
-          elif dtype == int(tf.bool):
-            value = True
-          elif dtype == int(tf.string):
-            value = "A"
-          else:
-            value = 1.0
-
-          # Example: [1.0, 1.0]
-          internal_array = [value for i in range(dim)]
-          #internal_array = np.asarray(internal_array)
-
-        else:
-          # Example: [[1.0, 1.0]]
-          internal_array = [internal_array for i in range(dim)]
-
-      # TODO: Generate the numpy ndarray before using Python list
-      internal_array = np.asarray(internal_array)
-      feed_dict_map[input_op_name] = internal_array
+      # Allocate the final ndarray directly, strings share the same object
+      feed_dict_map[input_op_name] = np.full(
+          shape,
+          ModelUtil.get_default_value(dtype),
+          dtype=ModelUtil.get_numpy_dtype(dtype))
 
     return feed_dict_map
+
+  @staticmethod
+  def get_output_difference(expected_array, actual_array, top_k=None):
+    """
+    Compare the output arrays, example: {"max_abs_error": 0.01, "max_relative_error": 0.001, "top_k_agreement": 1.0}.
+
+    The top-k agreement is the mean overlap of the top-k indices of each row,
+    which is only computed for the float outputs of shape [batch, classes].
+    """
+
+    expected_array = np.asarray(expected_array)
+    actual_array = np.asarray(actual_array)
+
+    if expected_array.shape != actual_array.shape:
+      raise ValueError("Get the different output shapes: {} and {}".format(
+          expected_array.shape, actual_array.shape))
+
+    difference = {
+        "max_abs_error": None,
+        "max_relative_error": None,
+        "top_k_agreement": None
+    }
+
+    if expected_array.dtype.kind not in ["b", "i", "u", "f", "c"]:
+      # The string outputs are compared for equality only
+      difference["max_abs_error"] = float(
+          np.any(expected_array != actual_array))
+      return difference
+
+    if expected_array.size == 0:
+      difference["max_abs_error"] = 0.0
+      difference["max_relative_error"] = 0.0
+      return difference
+
+    expected_values = expected_array.astype(np.float64)
+    actual_values = actual_array.astype(np.float64)
+    # The same NaN or infinity is consistent, the NaN of one side is not
+    equal_mask = (expected_values == actual_values) | (
+        np.isnan(expected_values) & np.isnan(actual_values))
+
+    # The infinity minus the same infinity is NaN before masking
+    with np.errstate(invalid="ignore"):
+      abs_errors = np.where(equal_mask, 0.0,
+                            np.abs(actual_values - expected_values))
+      # Avoid dividing by zero with the float32 machine epsilon
+      relative_errors = np.where(
+          equal_mask, 0.0,
+          abs_errors / np.maximum(
+              np.abs(expected_values), np.finfo(np.float32).eps))
+
+    difference["max_abs_error"] = float(np.max(abs_errors))
+    difference["max_relative_error"] = float(np.max(relative_errors))
+
+    if top_k and expected_array.ndim == 2 and expected_array.dtype.kind == "f":
+      k = min(top_k, expected_array.shape[1])
+      expected_indices = np.argsort(-expected_array, axis=1)[:, :k]
+      actual_indices = np.argsort(-actual_array, axis=1)[:, :k]
+      difference["top_k_agreement"] = float(
+          np.mean([
+              len(set(expected_row) & set(actual_row)) / float(k)
+              for expected_row, actual_row in zip(expected_indices,
+                                                  actual_indices)
+          ]))
+
+    return difference
+
+  @staticmethod
+  def construct_session_configs(intra_op_threads_list=None,
+                                inter_op_threads_list=None,
+                                optimizer_level_list=None,
+                                xla_jit_list=None):
+    """
+    Construct the grid of session configs, example: [("intra_op: 1, ...", ConfigProto)].
+
+    The thread number 0 lets TensorFlow choose. The optimizer level is "L0" or
+    "L1". XLA JIT on CPU also requires TF_XLA_FLAGS=--tf_xla_cpu_global_jit.
+    """
+
+    session_configs = []
+
+    config_grid = itertools.product(
+        intra_op_threads_list or [0], inter_op_threads_list or [0],
+        optimizer_level_list or ["L1"], xla_jit_list or [False])
+
+    for intra_op_threads, inter_op_threads, optimizer_level, xla_jit in config_grid:
+      session_config = tf.ConfigProto(
+          intra_op_parallelism_threads=intra_op_threads,
+          inter_op_parallelism_threads=inter_op_threads)
+
+      optimizer_options = session_config.graph_options.optimizer_options
+      if optimizer_level == "L0":
+        optimizer_options.opt_level = tf.OptimizerOptions.L0
+      else:
+        optimizer_options.opt_level = tf.OptimizerOptions.L1
+
+      if xla_jit:
+        optimizer_options.global_jit_level = tf.OptimizerOptions.ON_1
+      else:
+        optimizer_options.global_jit_level = tf.OptimizerOptions.OFF
+
+      config_name = (
+          "intra_op: {}, inter_op: {}, optimizer: {}, xla_jit: {}"
+          .format(intra_op_threads, inter_op_threads, optimizer_level, xla_jit))
+      session_configs.append((config_name, session_config))
+
+    return session_configs
+
+
+class MemoryUtil(object):
+  """
+  The utils class to read the memory usage of the current process.
+  """
+
+  @staticmethod
+  def get_rss_bytes():
+    """
+    Get the current resident set size, use the peak one if /proc is unavailable.
+    """
+
+    try:
+      with open("/proc/self/statm") as f:
+        # Example: "2000 500 300 1 0 400 0", the second field is resident pages
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (IOError, OSError):
+      return MemoryUtil.get_peak_rss_bytes()
+
+  @staticmethod
+  def get_peak_rss_bytes():
+    """
+    Get the peak resident set size of the process.
+    """
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # The ru_maxrss is bytes in macOS and kilobytes in Linux
+    if os.uname()[0] == "Darwin":
+      return max_rss
+    return max_rss * 1024
+
+  @staticmethod
+  def get_megabytes(number_bytes):
+    """
+    Convert the bytes to megabytes for the tables, example: 1048576 -> 1.0.
+    """
+
+    if number_bytes is None:
+      return None
+    return round(number_bytes / 1048576.0, 2)